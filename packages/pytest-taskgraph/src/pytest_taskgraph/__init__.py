@@ -1,2 +1,3 @@
 from .fixtures.gen import *  # noqa
+from .fixtures.taskcluster import *  # noqa
 from .fixtures.vcs import *  # noqa
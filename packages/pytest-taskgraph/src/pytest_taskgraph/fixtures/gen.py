@@ -171,7 +171,13 @@ def parameters():
 
 @pytest.fixture
 def maketgg(monkeypatch, parameters):
-    def inner(target_tasks=None, kinds=None, params=None, enable_verifications=True):
+    def inner(
+        target_tasks=None,
+        kinds=None,
+        params=None,
+        enable_verifications=True,
+        created_tasks=None,
+    ):
         kinds = kinds or [("_fake", [])]
         params = params or {}
         FakeKind.loaded_kinds = []
@@ -192,8 +198,13 @@ def maketgg(monkeypatch, parameters):
 
         monkeypatch.setattr(generator, "load_graph_config", fake_load_graph_config)
 
+        kwargs = {}
+        if created_tasks is not None:
+            # Only passed when given, as older versions of Taskgraph don't
+            # accept it.
+            kwargs["created_tasks"] = created_tasks
         return WithFakeKind(
-            "/root", parameters, enable_verifications=enable_verifications
+            "/root", parameters, enable_verifications=enable_verifications, **kwargs
         )
 
     return inner
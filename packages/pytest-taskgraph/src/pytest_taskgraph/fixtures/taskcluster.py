@@ -0,0 +1,36 @@
+import pytest
+
+from taskgraph.util import taskcluster as tc_util
+
+from ..taskcluster_server import FakeTaskcluster
+
+
+def _clear_taskcluster_caches():
+    funcs = [
+        tc_util.get_root_url,
+        tc_util.get_taskcluster_client,
+        tc_util.get_session,
+    ]
+    # Older versions of Taskgraph don't limit the concurrency of API calls.
+    if hasattr(tc_util, "get_limiter"):
+        funcs.append(tc_util.get_limiter)
+    for func in funcs:
+        func.cache_clear()
+    tc_util._task_definitions_cache.cache.clear()
+
+
+@pytest.fixture
+def fake_taskcluster(monkeypatch):
+    """Point Taskgraph at a local `FakeTaskcluster` for the duration of the
+    test. Its latency, error rate and throttling can be changed at any time."""
+    with FakeTaskcluster() as fake:
+        monkeypatch.setenv("TASKCLUSTER_ROOT_URL", fake.root_url)
+        for name in (
+            "TASKCLUSTER_PROXY_URL",
+            "TASKCLUSTER_CLIENT_ID",
+            "TASKCLUSTER_ACCESS_TOKEN",
+        ):
+            monkeypatch.delenv(name, raising=False)
+        _clear_taskcluster_caches()
+        yield fake
+        _clear_taskcluster_caches()
@@ -0,0 +1,508 @@
+"""
+An in-process stand-in for the Taskcluster services used by Taskgraph.
+
+``FakeTaskcluster`` serves the index, queue and notify endpoints called by
+``taskgraph.util.taskcluster`` and ``taskgraph.create`` over HTTP on a local
+port, from state kept in memory. Point ``TASKCLUSTER_ROOT_URL`` at its
+``root_url`` (the ``fake_taskcluster`` fixture does this) to run
+optimization, task creation or action callbacks without a Taskcluster
+deployment, e.g. to benchmark them.
+
+Latency, errors and throttling can be simulated:
+
+- ``latency`` seconds are added to every API call.
+- A fraction ``error_rate`` of API calls fail with a 500.
+- API calls beyond ``max_rate`` calls per second, or beyond
+  ``max_concurrent`` calls in flight, fail with a 429.
+"""
+
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+DEFAULT_EXPIRES = "3000-01-01T00:00:00.000Z"
+
+
+class FakeTaskcluster:
+    """A local Taskcluster stand-in.
+
+    Args:
+        latency (float): Seconds added to every API call.
+        error_rate (float): The fraction of API calls failing with a 500.
+        max_rate (float): API calls beyond this many calls per second, with
+            bursts of up to a tenth of a second worth of calls, fail with a
+            429. Unlimited if ``None``.
+        max_concurrent (int): API calls beyond this many calls in flight
+            fail with a 429. Unlimited if ``None``.
+        page_size (int): The largest number of items in a page of results.
+        seed (int): Seed of the random errors.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        error_rate=0.0,
+        max_rate=None,
+        max_concurrent=None,
+        page_size=1000,
+        seed=0,
+    ):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_rate = max_rate
+        self.max_concurrent = max_concurrent
+        self.page_size = page_size
+        self._random = random.Random(seed)
+
+        #: Maps index namespaces to their indexed task.
+        self.index = {}
+        #: Maps task ids to their definition.
+        self.tasks = {}
+        #: Maps task ids to their status.
+        self.statuses = {}
+        #: Maps task ids to a dict mapping artifact names to their content
+        #: and content type.
+        self.artifacts = {}
+        #: Maps ``(task id, artifact name)`` to the content encoding their
+        #: stored content is served with, for compressed artifacts.
+        self.content_encodings = {}
+        #: Payloads of the emails sent with the notify service.
+        self.emails = []
+        #: The number of calls to each endpoint.
+        self.calls = Counter()
+        #: The number of responses with each status code.
+        self.responses = Counter()
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._tokens = 0.0
+        self._refilled = time.monotonic()
+        self._server = None
+        self._thread = None
+
+    @property
+    def root_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.fake = self  # type: ignore
+        # Poll often, so that stopping the server is quick.
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.01,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def add_task(self, task_id, definition=None, state="completed", artifacts=None):
+        """Add an existing task.
+
+        Args:
+            task_id (str): The id of the task.
+            definition (dict): The definition of the task.
+            state (str): The state of the task.
+            artifacts (dict): Maps artifact names to their content, as bytes
+                or JSON-able data.
+        """
+        definition = definition or {}
+        with self._lock:
+            self.tasks[task_id] = definition
+            self.statuses[task_id] = self._status(task_id, definition, state)
+        for name, data in (artifacts or {}).items():
+            self.add_artifact(task_id, name, data)
+
+    def add_artifact(
+        self, task_id, name, data, content_type=None, content_encoding=None
+    ):
+        """Add an artifact to `task_id`. `data` is bytes, or JSON-able data.
+
+        With a `content_encoding` of ``"gzip"``, the artifact is stored
+        compressed and served with that content encoding, as Taskcluster
+        does for most artifacts, so ranges are of the compressed bytes.
+        """
+        if not isinstance(data, bytes):
+            data = json.dumps(data).encode("utf-8")
+            content_type = content_type or "application/json"
+        if content_encoding == "gzip":
+            data = gzip.compress(data)
+        elif content_encoding is not None:
+            raise ValueError(f"Unsupported content encoding: {content_encoding}")
+        with self._lock:
+            if content_encoding:
+                self.content_encodings[task_id, name] = content_encoding
+            self.artifacts.setdefault(task_id, {})[name] = (
+                data,
+                content_type or "application/octet-stream",
+            )
+
+    def index_task(self, namespace, task_id, expires=DEFAULT_EXPIRES, rank=0):
+        """Index `task_id` at `namespace`."""
+        with self._lock:
+            self.index[namespace] = {
+                "namespace": namespace,
+                "taskId": task_id,
+                "rank": rank,
+                "data": {},
+                "expires": expires,
+            }
+
+    def _status(self, task_id, definition, state):
+        runs = []
+        if state not in ("unscheduled", "pending"):
+            runs.append({"runId": 0, "state": state})
+        return {
+            "taskId": task_id,
+            "provisionerId": definition.get("provisionerId"),
+            "workerType": definition.get("workerType"),
+            "taskQueueId": definition.get("taskQueueId"),
+            "schedulerId": definition.get("schedulerId", "-"),
+            "taskGroupId": definition.get("taskGroupId", task_id),
+            "deadline": definition.get("deadline", DEFAULT_EXPIRES),
+            "expires": definition.get("expires", DEFAULT_EXPIRES),
+            "retriesLeft": definition.get("retries", 5),
+            "state": state,
+            "runs": runs,
+        }
+
+    def _throttled(self):
+        # Must be called with the lock held.
+        if self.max_concurrent is not None and self._in_flight > self.max_concurrent:
+            return True
+        if self.max_rate is None:
+            return False
+        now = time.monotonic()
+        burst = max(1.0, self.max_rate / 10)
+        self._tokens = min(burst, self._tokens + (now - self._refilled) * self.max_rate)
+        self._refilled = now
+        if self._tokens < 1:
+            return True
+        self._tokens -= 1
+        return False
+
+    def _page(self, items, query):
+        start = int(query.get("continuationToken") or 0)
+        limit = min(int(query.get("limit") or self.page_size), self.page_size)
+        end = start + limit
+        return items[start:end], str(end) if end < len(items) else None
+
+    # Index
+
+    def find_task(self, request, index_path):
+        if index_path not in self.index:
+            return 404, {"message": f"Indexed task not found: {index_path}"}
+        return 200, self.index[index_path]
+
+    def find_tasks_at_index(self, request):
+        found = [self.index[i] for i in request.payload["indexes"] if i in self.index]
+        tasks, token = self._page(found, request.query)
+        return 200, {"tasks": tasks, "continuationToken": token}
+
+    def list_tasks(self, request, namespace):
+        prefix = f"{namespace}."
+        found = [
+            entry
+            for name, entry in sorted(self.index.items())
+            if name.startswith(prefix) and "." not in name[len(prefix) :]
+        ]
+        tasks, token = self._page(found, request.query)
+        return 200, {"namespace": namespace, "tasks": tasks, "continuationToken": token}
+
+    def find_artifact_from_task(self, request, index_path, name):
+        if index_path not in self.index:
+            return 404, {"message": f"Indexed task not found: {index_path}"}
+        task_id = self.index[index_path]["taskId"]
+        if name not in self.artifacts.get(task_id, {}):
+            return 404, {"message": f"Artifact not found: {name}"}
+        # The index redirects without a body.
+        url = f"{self.root_url}/artifacts/{task_id}/{name}"
+        return 303, b"", {"Location": url}
+
+    # Queue
+
+    def create_task(self, request, task_id):
+        definition = request.payload
+        with self._lock:
+            if task_id in self.tasks:
+                if self.tasks[task_id] != definition:
+                    return 409, {"message": f"Task {task_id} already exists"}
+                return 200, {"status": self.statuses[task_id]}
+            missing = [
+                d for d in definition.get("dependencies", []) if d not in self.tasks
+            ]
+            if missing:
+                return 400, {"message": f"Missing dependencies: {', '.join(missing)}"}
+            self.tasks[task_id] = definition
+            state = "unscheduled" if definition.get("dependencies") else "pending"
+            self.statuses[task_id] = self._status(task_id, definition, state)
+        return 200, {"status": self.statuses[task_id]}
+
+    def task(self, request, task_id):
+        if task_id not in self.tasks:
+            return 404, {"message": f"Task not found: {task_id}"}
+        return 200, self.tasks[task_id]
+
+    def status(self, request, task_id):
+        if task_id not in self.statuses:
+            return 404, {"message": f"Task not found: {task_id}"}
+        return 200, {"status": self.statuses[task_id]}
+
+    def statuses_(self, request):
+        found = [
+            {"taskId": t, "status": self.statuses[t]}
+            for t in request.payload["taskIds"]
+            if t in self.statuses
+        ]
+        statuses, token = self._page(found, request.query)
+        return 200, {"statuses": statuses, "continuationToken": token}
+
+    def tasks_(self, request):
+        found = [
+            {"taskId": t, "task": self.tasks[t]}
+            for t in request.payload["taskIds"]
+            if t in self.tasks
+        ]
+        tasks, token = self._page(found, request.query)
+        return 200, {"tasks": tasks, "continuationToken": token}
+
+    def cancel_task(self, request, task_id):
+        if task_id not in self.statuses:
+            return 404, {"message": f"Task not found: {task_id}"}
+        with self._lock:
+            status = self.statuses[task_id]
+            if status["state"] in ("unscheduled", "pending", "running"):
+                status["state"] = "exception"
+                status["runs"].append(
+                    {"runId": len(status["runs"]), "state": "exception"}
+                )
+        return 200, {"status": status}
+
+    def rerun_task(self, request, task_id):
+        if task_id not in self.statuses:
+            return 404, {"message": f"Task not found: {task_id}"}
+        with self._lock:
+            self.statuses[task_id]["state"] = "pending"
+        return 200, {"status": self.statuses[task_id]}
+
+    def list_task_group(self, request, task_group_id):
+        found = [
+            {"status": self.statuses[t], "task": self.tasks[t]}
+            for t in sorted(self.tasks)
+            if self.statuses[t]["taskGroupId"] == task_group_id
+        ]
+        tasks, token = self._page(found, request.query)
+        return 200, {
+            "taskGroupId": task_group_id,
+            "tasks": tasks,
+            "continuationToken": token,
+        }
+
+    def list_latest_artifacts(self, request, task_id, run_id=None):
+        if task_id not in self.statuses:
+            return 404, {"message": f"Task not found: {task_id}"}
+        found = [
+            {
+                "name": name,
+                "storageType": "s3",
+                "contentType": content_type,
+                "expires": DEFAULT_EXPIRES,
+            }
+            for name, (_, content_type) in sorted(
+                self.artifacts.get(task_id, {}).items()
+            )
+        ]
+        artifacts, token = self._page(found, request.query)
+        return 200, {"artifacts": artifacts, "continuationToken": token}
+
+    def get_latest_artifact(self, request, task_id, name):
+        if name not in self.artifacts.get(task_id, {}):
+            return 404, {"message": f"Artifact not found: {name}"}
+        url = f"{self.root_url}/artifacts/{task_id}/{name}"
+        return 303, {"storageType": "s3", "url": url}, {"Location": url}
+
+    def get_artifact(self, request, task_id, run_id, name):
+        # Tasks only have one run.
+        return self.get_latest_artifact(request, task_id, name)
+
+    # Notify
+
+    def email(self, request):
+        with self._lock:
+            self.emails.append(request.payload)
+        return 200, {}
+
+
+# Maps each endpoint to its method, route (relative to the service's API)
+# and handler. Route parameters are passed to handlers as arguments.
+_ENDPOINTS = [
+    ("index", "findTask", "GET", r"/task/([^/]+)", "find_task"),
+    ("index", "findTasksAtIndex", "POST", r"/tasks/indexes", "find_tasks_at_index"),
+    ("index", "listTasks", "GET", r"/tasks/([^/]+)", "list_tasks"),
+    (
+        "index",
+        "findArtifactFromTask",
+        "GET",
+        r"/task/([^/]+)/artifacts/(.+)",
+        "find_artifact_from_task",
+    ),
+    ("queue", "createTask", "PUT", r"/task/([^/]+)", "create_task"),
+    ("queue", "task", "GET", r"/task/([^/]+)", "task"),
+    ("queue", "status", "GET", r"/task/([^/]+)/status", "status"),
+    ("queue", "statuses", "POST", r"/tasks/status", "statuses_"),
+    ("queue", "tasks", "POST", r"/tasks", "tasks_"),
+    ("queue", "cancelTask", "POST", r"/task/([^/]+)/cancel", "cancel_task"),
+    ("queue", "rerunTask", "POST", r"/task/([^/]+)/rerun", "rerun_task"),
+    ("queue", "listTaskGroup", "GET", r"/task-group/([^/]+)/list", "list_task_group"),
+    (
+        "queue",
+        "listLatestArtifacts",
+        "GET",
+        r"/task/([^/]+)/artifacts",
+        "list_latest_artifacts",
+    ),
+    (
+        "queue",
+        "listArtifacts",
+        "GET",
+        r"/task/([^/]+)/runs/(\d+)/artifacts",
+        "list_latest_artifacts",
+    ),
+    (
+        "queue",
+        "getLatestArtifact",
+        "GET",
+        r"/task/([^/]+)/artifacts/(.+)",
+        "get_latest_artifact",
+    ),
+    (
+        "queue",
+        "getArtifact",
+        "GET",
+        r"/task/([^/]+)/runs/(\d+)/artifacts/(.+)",
+        "get_artifact",
+    ),
+    ("notify", "email", "POST", r"/email", "email"),
+]
+_ROUTES = [
+    (method, re.compile(rf"/api/{service}/v1{route}"), name, handler)
+    for service, name, method, route, handler in _ENDPOINTS
+]
+_ARTIFACT_DATA = re.compile(r"/artifacts/([^/]+)/(.+)")
+_RANGE = re.compile(r"bytes=(\d+)-(\d*)")
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many clients connect at once.
+    request_queue_size = 128
+
+
+class _Request:
+    def __init__(self, query, payload):
+        self.query = query
+        self.payload = payload
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and bodies are written separately, which Nagle's algorithm
+    # would delay on kept alive connections.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.fake.responses[status] += 1  # type: ignore
+
+    def _read_payload(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length) if length else b""
+        return json.loads(data) if data else None
+
+    def _artifact_data(self, task_id, name):
+        fake = self.server.fake  # type: ignore
+        if name not in fake.artifacts.get(task_id, {}):
+            return self._send(404, {"message": f"Artifact not found: {name}"})
+        data, content_type = fake.artifacts[task_id][name]
+        headers = {}
+        if encoding := fake.content_encodings.get((task_id, name)):
+            # Like cloud storage, the stored encoding is served regardless of
+            # the encodings the client accepts.
+            headers["Content-Encoding"] = encoding
+        match = _RANGE.fullmatch(self.headers.get("Range") or "")
+        if not match:
+            return self._send(200, data, headers, content_type=content_type)
+        start = int(match.group(1))
+        end = int(match.group(2)) + 1 if match.group(2) else len(data)
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{len(data)}"
+        return self._send(206, data[start:end], headers, content_type=content_type)
+
+    def _dispatch(self, method):
+        fake = self.server.fake  # type: ignore
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        payload = self._read_payload()
+
+        if method == "GET" and (match := _ARTIFACT_DATA.fullmatch(path)):
+            return self._artifact_data(*match.groups())
+
+        for route_method, route, name, handler in _ROUTES:
+            if route_method == method and (match := route.fullmatch(path)):
+                break
+        else:
+            return self._send(404, {"message": f"No such endpoint: {method} {path}"})
+
+        with fake._lock:
+            fake.calls[name] += 1
+            fake._in_flight += 1
+            throttled = fake._throttled()
+            failed = fake.error_rate and fake._random.random() < fake.error_rate
+        try:
+            if throttled:
+                return self._send(429, {"message": "Too many requests"})
+            if fake.latency:
+                time.sleep(fake.latency)
+            if failed:
+                return self._send(500, {"message": "Internal Server Error"})
+            result = getattr(fake, handler)(_Request(query, payload), *match.groups())
+            return self._send(*result)
+        finally:
+            with fake._lock:
+                fake._in_flight -= 1
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
@@ -2,10 +2,6 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import importlib.metadata
-
-__version__ = importlib.metadata.version("taskcluster-taskgraph")
-
 # Maximum number of dependencies a single task can have
 # https://docs.taskcluster.net/docs/reference/platform/queue/api#createTask
 # specifies 10000, but we also optionally add the decision task id as a dep in
@@ -16,3 +12,15 @@ MAX_DEPENDENCIES = 9999
 # This is normally switched on via the --fast/-F flag to `mach taskgraph`
 # Currently this skips toolchain task optimizations and schema validation
 fast = False
+
+
+def __getattr__(name):
+    # Looking up the version imports `importlib.metadata`, which is slow to
+    # import, so only do it when the version is needed.
+    if name == "__version__":
+        import importlib.metadata  # noqa: PLC0415
+
+        global __version__
+        __version__ = importlib.metadata.version("taskcluster-taskgraph")
+        return __version__
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -39,7 +39,7 @@ from taskgraph.actions.util import (
 )
 def add_new_jobs_action(parameters, graph_config, input, task_group_id, task_id):
     decision_task_id, full_task_graph, label_to_taskid = fetch_graph_and_labels(
-        parameters, graph_config, task_group_id=task_group_id
+        parameters, graph_config, task_group_id=task_group_id, labels=input["tasks"]
     )
 
     to_run = []
@@ -142,13 +142,17 @@ def retrigger_decision_action(parameters, graph_config, input, task_group_id, ta
     },
 )
 def retrigger_action(parameters, graph_config, input, task_group_id, task_id):
-    decision_task_id, full_task_graph, label_to_taskid = fetch_graph_and_labels(
-        parameters, graph_config, task_group_id=task_group_id
-    )
-
     task = taskcluster.get_task_definition(task_id)
     label = task["metadata"]["name"]  # type: ignore
 
+    decision_task_id, full_task_graph, label_to_taskid = fetch_graph_and_labels(
+        parameters,
+        graph_config,
+        task_group_id=task_group_id,
+        labels=[label],
+        downstream=input.get("downstream", False),
+    )
+
     with_downstream = " "
     to_run = [label]
 
@@ -198,8 +202,9 @@ def retrigger_action(parameters, graph_config, input, task_group_id, task_id):
 def rerun_action(parameters, graph_config, input, task_group_id, task_id):
     task = taskcluster.get_task_definition(task_id)
     parameters = dict(parameters)
+    # Only the label to task id mapping is needed.
     decision_task_id, full_task_graph, label_to_taskid = fetch_graph_and_labels(
-        parameters, graph_config, task_group_id=task_group_id
+        parameters, graph_config, task_group_id=task_group_id, labels=[]
     )
     label = task["metadata"]["name"]  # type: ignore
     if task_id not in label_to_taskid.values():
@@ -257,7 +262,14 @@ def _rerun_task(task_id, label):
 )
 def retrigger_multiple(parameters, graph_config, input, task_group_id, task_id):
     decision_task_id, full_task_graph, label_to_taskid = fetch_graph_and_labels(
-        parameters, graph_config, task_group_id=task_group_id
+        parameters,
+        graph_config,
+        task_group_id=task_group_id,
+        labels=[
+            label
+            for request in input.get("requests", [])
+            for label in request.get("tasks")
+        ],
     )
 
     suffixes = []
@@ -14,9 +14,16 @@ from requests.exceptions import HTTPError
 from taskcluster.exceptions import TaskclusterRestFailure
 
 from taskgraph import create
-from taskgraph.decision import read_artifact, rename_artifact, write_artifact
+from taskgraph.decision import (
+    ARTIFACTS_DIR,
+    read_artifact,
+    rename_artifact,
+    write_artifact,
+)
 from taskgraph.optimize.base import optimize_task_graph
 from taskgraph.taskgraph import TaskGraph
+from taskgraph.util.indexed_graph import IndexedTaskGraph
+from taskgraph.util.journal import load_journal
 from taskgraph.util.taskcluster import (
     CONCURRENCY,
     get_artifact,
@@ -33,7 +40,41 @@ def get_parameters(decision_task_id):
     return get_artifact(decision_task_id, "public/parameters.yml")
 
 
-def fetch_graph_and_labels(parameters, graph_config, task_group_id=None):
+def fetch_full_task_graph(decision_task_id, labels=None, downstream=False):
+    """Fetch the full task graph of a decision task.
+
+    If `labels` is given, only those tasks, the tasks they depend on and with
+    `downstream`, the tasks depending on them are guaranteed to be in the
+    graph. When the decision task published an indexed graph, only these
+    tasks are downloaded.
+    """
+    if labels is not None:
+        try:
+            indexed = IndexedTaskGraph.from_artifact(
+                decision_task_id, "public/full-task-graph.jsonl"
+            )
+        except (HTTPError, TaskclusterRestFailure):
+            logger.debug(f"No indexed full task graph found for {decision_task_id}")
+        else:
+            keys = set(labels)
+            if downstream:
+                keys = indexed.closure(keys, reverse=True)
+            return indexed.load(indexed.closure(keys))
+
+    full_task_graph = get_artifact(decision_task_id, "public/full-task-graph.json")
+    _, full_task_graph = TaskGraph.from_json(full_task_graph, compact=True)
+    return full_task_graph
+
+
+def fetch_graph_and_labels(
+    parameters, graph_config, task_group_id=None, labels=None, downstream=False
+):
+    """Fetch the full task graph and label to task id mapping of the decision
+    task for `parameters`, updated with those of later action and cron tasks.
+
+    If `labels` is given, the graph may only contain the tasks needed to
+    schedule them, see `fetch_full_task_graph`.
+    """
     try:
         # Look up the decision_task id in the index
         decision_task_id = find_decision_task(parameters, graph_config)
@@ -44,8 +85,7 @@ def fetch_graph_and_labels(parameters, graph_config, task_group_id=None):
         decision_task_id = task_group_id
 
     # First grab the graph and labels generated during the initial decision task
-    full_task_graph = get_artifact(decision_task_id, "public/full-task-graph.json")
-    _, full_task_graph = TaskGraph.from_json(full_task_graph)
+    full_task_graph = fetch_full_task_graph(decision_task_id, labels, downstream)
     label_to_taskid = get_artifact(decision_task_id, "public/label-to-taskid.json")
 
     # fetch everything in parallel; this avoids serializing any delay in downloading
@@ -166,30 +206,44 @@ def create_tasks(
 
     target_graph = full_task_graph.graph.transitive_closure(to_run)
     target_task_graph = TaskGraph(
-        {l: modifier(full_task_graph[l]) for l in target_graph.nodes},
+        {l: modifier(full_task_graph[l]) for l in target_graph.iter_nodes()},
         target_graph,
     )
     target_task_graph.for_each_task(update_parent)
     if decision_task_id and decision_task_id != os.environ.get("TASK_ID"):
         target_task_graph.for_each_task(update_dependencies)
+
+    # reuse the tasks created by an earlier run of this action, if any
+    journal = None
+    do_not_optimize = to_run
+    if not create.testing and "TASK_ID" in os.environ:
+        journal = load_journal(ARTIFACTS_DIR, os.environ["TASK_ID"], suffix)
+        label_to_taskid = {**label_to_taskid, **journal.tasks}
+        do_not_optimize = to_run - journal.tasks.keys()
+
     optimized_task_graph, label_to_taskid = optimize_task_graph(
         target_task_graph,
         to_run,
         params,
-        to_run,
+        do_not_optimize,
         decision_task_id,
         existing_tasks=label_to_taskid,
     )
     write_artifact(f"task-graph{suffix}.json", optimized_task_graph.to_json())
     write_artifact(f"label-to-taskid{suffix}.json", label_to_taskid)
     write_artifact(f"to-run{suffix}.json", list(to_run))
-    create.create_tasks(
-        graph_config,
-        optimized_task_graph,
-        label_to_taskid,
-        params,
-        decision_task_id,
-    )
+    try:
+        create.create_tasks(
+            graph_config,
+            optimized_task_graph,
+            label_to_taskid,
+            params,
+            decision_task_id,
+            journal=journal,
+        )
+    finally:
+        if journal is not None:
+            journal.close()
     return label_to_taskid
 
 
@@ -4,14 +4,21 @@
 
 
 import logging
+import queue
 import sys
+from collections import deque
 from concurrent import futures
 
 from slugid import nice as slugid
 
-from taskgraph.util import json
+from taskgraph.util import json, trace
 from taskgraph.util.parameterization import resolve_timestamps
-from taskgraph.util.taskcluster import CONCURRENCY, get_session, get_taskcluster_client
+from taskgraph.util.taskcluster import (
+    CONCURRENCY,
+    get_limiter,
+    get_session,
+    get_taskcluster_client,
+)
 from taskgraph.util.time import current_json_time
 
 logger = logging.getLogger(__name__)
@@ -32,7 +39,23 @@ class CreateTasksException(Exception):
         super().__init__(message)
 
 
-def create_tasks(graph_config, taskgraph, label_to_taskid, params, decision_task_id):
+def create_tasks(
+    graph_config, taskgraph, label_to_taskid, params, decision_task_id, journal=None
+):
+    """Create the tasks of `taskgraph`.
+
+    If a `TaskJournal` is given, tasks recorded in it are assumed to exist
+    and aren't created again, and tasks that get created are recorded in it.
+    """
+    with trace.span("create_tasks", tasks=len(taskgraph.graph.nodes)):
+        _create_tasks(
+            graph_config, taskgraph, label_to_taskid, params, decision_task_id, journal
+        )
+
+
+def _create_tasks(
+    graph_config, taskgraph, label_to_taskid, params, decision_task_id, journal
+):
     taskid_to_label = {t: l for l, t in label_to_taskid.items()}
 
     # when running as an actual decision task, we use the decision task's
@@ -61,74 +84,101 @@ def create_tasks(graph_config, taskgraph, label_to_taskid, params, decision_task
     concurrency = CONCURRENCY if not testing else 1
     session = get_session()
     with futures.ThreadPoolExecutor(concurrency) as e:
-        fs = {}
-        fs_to_task = {}
-        skipped = set()
-        errors = {}
-
-        # We can't submit a task until its dependencies have been submitted.
-        # So our strategy is to walk the graph and submit tasks once all
-        # their dependencies have been submitted.
-        tasklist = set(taskgraph.graph.visit_postorder())
-        alltasks = tasklist.copy()
-
-        def handle_exception(fut):
-            if exc := fut.exception():
-                task_id, label = fs_to_task[fut]
-                skipped.add(task_id)
-                errors[label] = exc
-
-        def schedule_tasks():
-            to_remove = set()
-            new = set()
-
-            def submit(task_id, label, task_def):
-                fut = e.submit(create_task, session, task_id, label, task_def)
-                new.add(fut)
-                fs[task_id] = fut
-                fs_to_task[fut] = (task_id, label)
-                fut.add_done_callback(handle_exception)
-
-            for task_id in tasklist:
-                task_def = taskgraph.tasks[task_id].task
-                # Some dependencies aren't in our graph, so make sure to filter
-                # those out
-                deps = set(task_def.get("dependencies", [])) & alltasks
-
-                # If one of the dependencies didn't get created, then
-                # don't attempt to submit as it would fail.
-                if any(d in skipped for d in deps):
-                    skipped.add(task_id)
-                    to_remove.add(task_id)
-                    continue
-
-                # If we haven't finished submitting all our dependencies yet,
-                # come back to this later.
-                if any((d not in fs or not fs[d].done()) for d in deps):
-                    continue
-
-                submit(task_id, taskid_to_label[task_id], task_def)
-                to_remove.add(task_id)
-
-                # Schedule tasks as many times as task_duplicates indicates
-                attributes = taskgraph.tasks[task_id].attributes
-                for i in range(1, attributes.get("task_duplicates", 1)):
-                    # We use slugid() since we want a distinct task id
-                    submit(slugid(), taskid_to_label[task_id], task_def)
-            tasklist.difference_update(to_remove)
-
-            # As each of those futures complete, try to schedule more tasks.
-            for f in futures.as_completed(new):
-                schedule_tasks()
-
-        # Start scheduling tasks and run until everything is scheduled.
-        schedule_tasks()
-
-        # Wait for all futures to complete.
-        futures.wait(fs.values())
-
-        if errors:
-            raise CreateTasksException(errors)
+        _submit_tasks(e, session, taskgraph, taskid_to_label, journal)
+
+
+def _submit_tasks(executor, session, taskgraph, taskid_to_label, journal):
+    """Create the tasks of `taskgraph` with `executor`, submitting each task
+    as soon as all its dependencies have been created.
+
+    The number of dependencies of each task that haven't been created yet is
+    counted upfront, and decremented as each creation completes, so each task
+    and dependency is only looked at once. Completions are handled in this
+    thread, in the order they happen, so the executor always has all the
+    tasks that can be created.
+    """
+    alltasks = taskgraph.tasks.keys()
+    remaining = {}
+    dependents = {task_id: [] for task_id in alltasks}
+    ready = []
+    # Visit in post-order so tasks without dependencies are submitted in a
+    # stable order.
+    for task_id in taskgraph.graph.visit_postorder():
+        # Some dependencies aren't in our graph, so make sure to filter those
+        # out.
+        deps = set(taskgraph.tasks[task_id].task.get("dependencies", [])) & alltasks
+        deps.discard(task_id)
+        remaining[task_id] = len(deps)
+        for dep in deps:
+            dependents[dep].append(task_id)
+        if not deps:
+            ready.append(task_id)
+
+    completed = queue.SimpleQueue()
+    fs_to_task = {}
+    skipped = set()
+    errors = {}
+
+    def submit(task_id, label, task_def):
+        fut = executor.submit(create_task, session, task_id, label, task_def)
+        fs_to_task[fut] = (task_id, label)
+        fut.add_done_callback(completed.put)
+
+    def release(task_id):
+        # Return the dependents of `task_id` that can now be created.
+        ready = []
+        for dependent in dependents[task_id]:
+            remaining[dependent] -= 1
+            if remaining[dependent] == 0 and dependent not in skipped:
+                ready.append(dependent)
+        return ready
+
+    def submit_all(task_ids):
+        task_ids = deque(task_ids)
+        while task_ids:
+            task_id = task_ids.popleft()
+            if journal is not None and task_id in journal:
+                logger.debug(f"Task {task_id} was already created")
+                task_ids.extend(release(task_id))
+                continue
+
+            task = taskgraph.tasks[task_id]
+            label = taskid_to_label[task_id]
+            submit(task_id, label, task.task)
+
+            # Schedule tasks as many times as task_duplicates indicates
+            for i in range(1, task.attributes.get("task_duplicates", 1)):
+                # We use slugid() since we want a distinct task id
+                submit(slugid(), label, task.task)
+
+    def skip_dependents(task_id):
+        # If one of the dependencies didn't get created, then don't attempt to
+        # submit the tasks depending on it, as they would fail.
+        stack = [task_id]
+        while stack:
+            for dependent in dependents[stack.pop()]:
+                if dependent not in skipped:
+                    skipped.add(dependent)
+                    stack.append(dependent)
+
+    submit_all(ready)
+    while fs_to_task:
+        fut = completed.get()
+        task_id, label = fs_to_task.pop(fut)
+        if exc := fut.exception():
+            errors[label] = exc
+            if task_id in dependents:
+                skip_dependents(task_id)
+            continue
+
+        # Duplicates aren't in the graph, and nothing depends on them.
+        if task_id in dependents:
+            if journal is not None and not testing:
+                journal.record(task_id, label)
+            submit_all(release(task_id))
+
+    if errors:
+        raise CreateTasksException(errors)
 
 
 def create_task(session, task_id, label, task_def):
@@ -149,4 +199,36 @@ def create_task(session, task_id, label, task_def):
 
     logger.info(f"Creating task with taskId {task_id} for {label}")
     queue = get_taskcluster_client("queue")
-    queue.createTask(task_id, task_def)
+    with trace.span("createTask", cat="network", label=label, taskId=task_id):
+        try:
+            get_limiter().call("createTask", queue.createTask, task_id, task_def)
+        except Exception as e:
+            # The task may have been created by an earlier attempt whose
+            # response was lost.
+            if getattr(e, "status_code", None) != 409 or not _already_created(
+                queue, task_id, task_def
+            ):
+                raise
+            logger.info(f"Task {task_id} for {label} already exists")
+
+
+# Resolved when creating a task, so they differ between attempts.
+_TIMESTAMP_FIELDS = ("created", "deadline", "expires")
+
+
+def _already_created(queue, task_id, task_def):
+    """Return whether `task_id` exists with the definition `task_def`.
+
+    The queue adds default values to the definitions it stores, so only the
+    fields of `task_def` are compared, apart from its timestamps.
+    """
+    try:
+        existing = queue.task(task_id)
+    except Exception:
+        return False
+    task_def = json.loads(json.dumps(task_def))
+    return all(
+        existing.get(key) == value
+        for key, value in task_def.items()
+        if key not in _TIMESTAMP_FIELDS
+    )
@@ -18,9 +18,13 @@ from taskgraph.create import create_tasks
 from taskgraph.generator import TaskGraphGenerator
 from taskgraph.parameters import Parameters, get_version
 from taskgraph.taskgraph import TaskGraph
-from taskgraph.util import json
+from taskgraph.util import json, packed
+from taskgraph.util.indexed_graph import index_path, write_indexed_graph
+from taskgraph.util.journal import load_journal
 from taskgraph.util.python_path import find_object
 from taskgraph.util.schema import Schema, validate_schema
+from taskgraph.util.taskcluster import get_limiter
+from taskgraph.util.transform_profile import PROFILE_ENV
 from taskgraph.util.vcs import get_repository
 from taskgraph.util.yaml import load_yaml
 
@@ -47,13 +51,13 @@ class TryTaskConfigSchemaV2(Schema, forbid_unknown_fields=True):
 try_task_config_schema_v2 = TryTaskConfigSchemaV2
 
 
-def full_task_graph_to_runnable_tasks(full_task_json):
+def full_task_graph_to_runnable_tasks(full_task_graph):
     runnable_tasks = {}
-    for label, node in full_task_json.items():
-        if not ("extra" in node["task"] and "treeherder" in node["task"]["extra"]):
+    for label, task in full_task_graph.tasks.items():
+        if not ("extra" in task.task and "treeherder" in task.task["extra"]):
             continue
 
-        th = node["task"]["extra"]["treeherder"]
+        th = task.task["extra"]["treeherder"]
         runnable_tasks[label] = {"symbol": th["symbol"]}
 
         for i in ("groupName", "groupSymbol", "collection"):
@@ -89,6 +93,11 @@ def taskgraph_decision(options, parameters=None):
     if not os.path.isdir(ARTIFACTS_DIR):
         os.mkdir(ARTIFACTS_DIR)
 
+    if options.get("profile_transforms"):
+        os.environ[PROFILE_ENV] = os.path.abspath(
+            ARTIFACTS_DIR / "transform-profile.json"
+        )
+
     # optimizations are difficult to debug after the fact, so we always
     # log them at DEBUG level, and write the log as a separate artifact
     opt_log = logging.getLogger("optimization")
@@ -98,12 +107,17 @@ def taskgraph_decision(options, parameters=None):
         opt_handler.setFormatter(logging.root.handlers[0].formatter)
     opt_log.addHandler(opt_handler)
 
+    decision_task_id = os.environ["TASK_ID"]
+
+    # reuse the tasks created by an earlier run of this decision task, if any
+    journal = load_journal(ARTIFACTS_DIR, decision_task_id)
+
     parameters = parameters or (
-        lambda graph_config: get_decision_parameters(graph_config, options)
+        lambda graph_config: get_decision_parameters(
+            graph_config, options, existing_tasks=journal.tasks
+        )
     )
 
-    decision_task_id = os.environ["TASK_ID"]
-
     # create a TaskGraphGenerator instance
     tgg = TaskGraphGenerator(
         root_dir=options.get("root"),
@@ -111,6 +125,7 @@ def taskgraph_decision(options, parameters=None):
         decision_task_id=decision_task_id,
         write_artifacts=True,
         enable_verifications=options.get("verify", True),
+        created_tasks=journal.tasks,
     )
 
     # write out the parameters used to generate this graph
@@ -123,24 +138,28 @@ def taskgraph_decision(options, parameters=None):
     )
 
     # write out the full graph for reference
-    full_task_json = tgg.full_task_graph.to_json()
-    write_artifact("full-task-graph.json", full_task_json)
+    write_artifact("full-task-graph.json", tgg.full_task_graph)
+    write_artifact("full-task-graph.jsonl", tgg.full_task_graph)
 
     # write out the public/runnable-jobs.json file
     write_artifact(
-        "runnable-jobs.json", full_task_graph_to_runnable_tasks(full_task_json)
+        "runnable-jobs.json", full_task_graph_to_runnable_tasks(tgg.full_task_graph)
     )
 
-    # this is just a test to check whether the from_json() function is working
-    _, _ = TaskGraph.from_json(full_task_json)
-
     # write out the target task set to allow reproducing this as input
     write_artifact("target-tasks.json", list(tgg.target_task_set.tasks.keys()))
 
     # write out the optimized task graph to describe what will actually happen,
     # and the map of labels to taskids
-    write_artifact("task-graph.json", tgg.morphed_task_graph.to_json())
+    write_artifact("task-graph.json", tgg.morphed_task_graph)
     write_artifact("label-to-taskid.json", tgg.label_to_taskid)
+    if os.environ.get(packed.BINARY_ARTIFACTS_ENV):
+        write_artifact(f"full-task-graph{packed.EXTENSION}", tgg.full_task_graph)
+        write_artifact(f"task-graph{packed.EXTENSION}", tgg.morphed_task_graph)
+        write_artifact(f"label-to-taskid{packed.EXTENSION}", tgg.label_to_taskid)
+
+    # write out how long each phase of generation took, to track regressions
+    write_artifact("generation-metrics.json", tgg.metrics.to_json())
 
     # write out current run-task and fetch-content scripts
     RUN_TASK_DIR = pathlib.Path(__file__).parent / "run-task"
@@ -148,20 +167,29 @@ def taskgraph_decision(options, parameters=None):
     shutil.copy2(RUN_TASK_DIR / "fetch-content", ARTIFACTS_DIR)
 
     # actually create the graph
-    create_tasks(
-        tgg.graph_config,
-        tgg.morphed_task_graph,
-        tgg.label_to_taskid,
-        tgg.parameters,
-        decision_task_id=decision_task_id,
-    )
+    try:
+        create_tasks(
+            tgg.graph_config,
+            tgg.morphed_task_graph,
+            tgg.label_to_taskid,
+            tgg.parameters,
+            decision_task_id=decision_task_id,
+            journal=journal,
+        )
+    finally:
+        journal.close()
+        # write out how the concurrency of Taskcluster API calls was adapted
+        write_artifact("concurrency-metrics.json", get_limiter().to_json())
 
 
-def get_decision_parameters(graph_config, options):
+def get_decision_parameters(graph_config, options, existing_tasks=None):
     """
     Load parameters from the command-line options for 'taskgraph decision'.
     This also applies per-project parameters, based on the given project.
 
+    `existing_tasks` maps the labels of tasks created by an earlier run of the
+    decision task to their task ids.
+
     """
     parameters = {
         n: options[n]
@@ -202,7 +230,7 @@ def get_decision_parameters(graph_config, options):
     ]
     parameters["optimize_strategies"] = None
     parameters["optimize_target_tasks"] = True
-    parameters["existing_tasks"] = {}
+    parameters["existing_tasks"] = dict(existing_tasks or {})
     parameters["do_not_optimize"] = []
     parameters["enable_always_target"] = True
     parameters["build_number"] = 1
@@ -303,7 +331,31 @@ def write_artifact(filename, data):
     if not os.path.isdir(ARTIFACTS_DIR):
         os.mkdir(ARTIFACTS_DIR)
     path = ARTIFACTS_DIR / filename
-    if filename.endswith(".yml"):
+    if filename.endswith(packed.EXTENSION):
+        with open(path, "wb") as f:
+            packed.dump(data, f)
+    elif isinstance(data, TaskGraph):
+        # Task graphs can be large enough that holding their whole
+        # serialization in memory is a problem, so write them one task at a
+        # time.
+        if filename.endswith(".json"):
+            with open(path, "w", encoding="utf-8") as f:
+                data.write_json(f)
+        elif filename.endswith(".json.gz"):
+            import gzip  # noqa: PLC0415
+
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                data.write_json(f)
+        elif filename.endswith(".jsonl"):
+            # Written along with an index, so actions can read only the tasks
+            # they need.
+            with open(path, "wb") as f:
+                index = write_indexed_graph(data, f)
+            with open(index_path(path), "w") as f:
+                json.dump(index, f, sort_keys=True)
+        else:
+            raise TypeError(f"Don't know how to write a task graph to {filename}")
+    elif filename.endswith(".yml"):
         with open(path, "w") as f:
             yaml.safe_dump(data, f, allow_unicode=True, default_flow_style=False)
     elif filename.endswith(".json"):
@@ -312,15 +364,18 @@ def write_artifact(filename, data):
     elif filename.endswith(".gz"):
         import gzip  # noqa: PLC0415
 
-        with gzip.open(path, "wb") as f:
-            f.write(json.dumps(data))  # type: ignore
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(data))
     else:
         raise TypeError(f"Don't know how to write to {filename}")
 
 
 def read_artifact(filename):
     path = ARTIFACTS_DIR / filename
-    if filename.endswith(".yml"):
+    if filename.endswith(packed.EXTENSION):
+        with open(path, "rb") as f:
+            return packed.load(f)
+    elif filename.endswith(".yml"):
         return load_yaml(path, filename)
     elif filename.endswith(".json"):
         with open(path) as f:
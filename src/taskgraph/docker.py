@@ -17,8 +17,6 @@ from pathlib import Path
 from textwrap import dedent
 from typing import Any, Optional, Union
 
-from taskcluster.exceptions import TaskclusterRestFailure
-
 try:
     import zstandard as zstd
 except ImportError as e:
@@ -157,6 +155,8 @@ def build_image(
         ValueError: If name is not provided.
         Exception: If the image directory does not exist.
     """
+    from taskcluster.exceptions import TaskclusterRestFailure  # noqa: PLC0415
+
     logger.info(f"Building {name} image")
     if not name:
         raise ValueError("must provide a Docker image name")
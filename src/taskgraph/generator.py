@@ -2,12 +2,15 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import contextlib
 import copy
 import inspect
+import itertools
 import logging
 import multiprocessing
 import os
 import platform
+import time
 from concurrent.futures import (
     FIRST_COMPLETED,
     ProcessPoolExecutor,
@@ -19,20 +22,43 @@ from typing import Callable, Optional, Union
 
 from . import filter_tasks
 from .config import GraphConfig, load_graph_config
-from .graph import Graph
+from .graph import Graph, GraphBuilder
 from .morph import morph
 from .optimize.base import optimize_task_graph
 from .parameters import Parameters, parameters_loader
 from .task import Task
-from .taskgraph import TaskGraph
+from .taskgraph import TaskGraph, TaskGraphBuilder
 from .transforms.base import TransformConfig, TransformSequence
+from .util import trace
+from .util.generation_metrics import GenerationMetrics
+from .util.intern import INTERN_ENV, intern_tasks
+from .util.kind_cache import (
+    KindCache,
+    RecordingParameters,
+    is_cacheable_loader,
+    iter_recording_inputs,
+    recording_inputs,
+)
+from .util.kind_timings import KindTimings
 from .util.python_path import find_object
 from .util.schema import SchemaValidationError
+from .util.task_store import TaskStore
+from .util.transform_profile import (
+    TransformProfile,
+    finish_profile,
+    profile_path,
+    start_profile,
+)
 from .util.verify import verifications
 from .util.yaml import load_yaml
 
 logger = logging.getLogger(__name__)
 
+# Number of tasks written at a time by kinds that other kinds stream from, and
+# how often (in seconds) to check for new chunks while they are being loaded.
+STREAM_CHUNK_SIZE = 100
+STREAM_POLL_INTERVAL = 0.05
+
 
 class KindNotFound(Exception):
     """
@@ -56,34 +82,110 @@ class Kind:
         assert callable(loader)
         return loader
 
+    @property
+    def stream_from(self) -> Optional[str]:
+        """The upstream kind this kind can be loaded from one piece at a time,
+        if any."""
+        return self.config.get("stream-from")
+
+    @property
+    def shard_safe(self) -> bool:
+        """Whether this kind's transforms can be run on separate shards of the
+        loader's output."""
+        return self.config.get("shard-safe", False)
+
     def load_tasks(self, parameters, kind_dependencies_tasks, write_artifacts):
+        with trace.span(f"load {self.name}", cat="kinds"):
+            return list(
+                self._generate_tasks(
+                    parameters, kind_dependencies_tasks, write_artifacts
+                )
+            )
+
+    def _generate_tasks(
+        self,
+        parameters,
+        kind_dependencies_tasks,
+        write_artifacts,
+        cache_name=None,
+        shard=None,
+    ):
         logger.debug(f"Loading tasks for kind {self.name}")
+        cache_name = cache_name or self.name
 
-        parameters = Parameters(**parameters)
         loader = self._get_loader()
+        # Loaders may write artifacts as a side effect, so never serve those
+        # runs from the cache.
+        cache = None if write_artifacts else KindCache.from_environment()
+        if cache and not is_cacheable_loader(loader):
+            logger.debug(f"Not caching kind {self.name}: its loader isn't cacheable")
+            cache = None
+        if cache and profile_path():
+            # Tasks served from the cache don't run their transforms.
+            logger.debug(f"Not caching kind {self.name} while profiling transforms")
+            cache = None
+        # Files of the repository read while generating the tasks, see
+        # `cached_input`.
+        files_read = None
+        if cache:
+            parameters = RecordingParameters(**parameters)
+            files_read = []
+        else:
+            parameters = Parameters(**parameters)
         config = copy.deepcopy(self.config)
 
         if "write_artifacts" in inspect.signature(loader).parameters:
             extra_args = (write_artifacts,)
         else:
             extra_args = ()
-        inputs = loader(
-            self.name,
-            self.path,
-            config,
-            parameters,
-            list(kind_dependencies_tasks.values()),
-            *extra_args,
-        )
+        with recording_inputs(files_read):
+            inputs = loader(
+                self.name,
+                self.path,
+                config,
+                parameters,
+                list(kind_dependencies_tasks.values()),
+                *extra_args,
+            )
 
-        transforms = TransformSequence()
-        for xform_path in config["transforms"]:
-            if ":" not in xform_path:
-                xform_path = f"{xform_path}:transforms"
+        xform_paths = [
+            p if ":" in p else f"{p}:transforms" for p in config["transforms"]
+        ]
 
+        if cache:
+            cache_key = cache.key(
+                self, config, loader, xform_paths, kind_dependencies_tasks
+            )
+            if cache_key is None:
+                cache = files_read = None
+        if cache:
+            tasks = cache.get(cache_name, cache_key, parameters)
+            if tasks is not None:
+                logger.info(
+                    f"Loaded {len(tasks)} tasks for kind {self.name} from cache"
+                )
+                yield from tasks
+                return
+
+        if shard:
+            # Only transform a contiguous slice of the inputs, so that joining
+            # the shards in order gives the same tasks as loading it whole.
+            index, count = shard
+            inputs = list(inputs)
+            size, extra = divmod(len(inputs), count)
+            start = index * size + min(index, extra)
+            inputs = inputs[start : start + size + (index < extra)]
+
+        transforms = TransformSequence()
+        for xform_path in xform_paths:
             transform = find_object(xform_path)
             transforms.add(transform)
 
+        profile = None
+        if path := profile_path():
+            profile = TransformProfile(self.name)
+            transforms = profile.wrap(transforms)
+
         # perform the transformations on the loaded inputs
         trans_config = TransformConfig(
             self.name,
@@ -94,8 +196,11 @@ class Kind:
             self.graph_config,
             write_artifacts=write_artifacts,
         )
-        tasks = [
-            Task(
+        tasks = []
+        for task_dict in iter_recording_inputs(
+            files_read, transforms(trans_config, inputs)
+        ):
+            task = Task(
                 self.name,
                 label=task_dict["label"],
                 description=task_dict["description"],
@@ -106,10 +211,94 @@ class Kind:
                 soft_dependencies=task_dict.get("soft-dependencies", []),
                 if_dependencies=task_dict.get("if-dependencies", []),
             )
-            for task_dict in transforms(trans_config, inputs)
-        ]
+            tasks.append(task)
+            yield task
         logger.info(f"Generated {len(tasks)} tasks for kind {self.name}")
-        return tasks
+        if profile:
+            profile.save(path)
+        if cache:
+            cache.put(cache_name, cache_key, parameters, tasks, files_read)  # type: ignore
+
+    def load_tasks_into_store(
+        self,
+        store_path,
+        parameters,
+        kind_dependencies_tasks,
+        write_artifacts,
+        chunk=None,
+        chunk_size=None,
+        shards=None,
+    ):
+        """Load this kind's tasks and write them to the ``TaskStore`` at
+        `store_path`, rather than returning them.
+
+        Args:
+            chunk (int): The chunk of the kind being loaded, when the kind is
+                loaded one chunk of its `stream_from` kind at a time, or one
+                shard of its inputs at a time.
+            chunk_size (int): If set, write tasks in consecutive chunks of this
+                size as soon as they are generated, so kinds streaming from
+                this one can start on them.
+            shards (int): The number of shards the kind's inputs are split
+                into, if it is sharded. `chunk` is the shard to load.
+        """
+        try:
+            self._load_tasks_into_store(
+                TaskStore(store_path),
+                parameters,
+                kind_dependencies_tasks,
+                write_artifacts,
+                chunk,
+                chunk_size,
+                shards,
+            )
+        finally:
+            # This runs in a worker process, so write out its spans before
+            # returning to the generator.
+            trace.flush()
+
+    def _load_tasks_into_store(
+        self,
+        store,
+        parameters,
+        kind_dependencies_tasks,
+        write_artifacts,
+        chunk,
+        chunk_size,
+        shards,
+    ):
+        if chunk is not None:
+            shard = (chunk, shards) if shards else None
+            cache_name = f"{chunk}-of-{shards}" if shards else str(chunk)
+            with trace.span(f"load {self.name} {cache_name}", cat="kinds"):
+                tasks = self._generate_tasks(
+                    parameters,
+                    kind_dependencies_tasks,
+                    write_artifacts,
+                    cache_name=os.path.join(self.name, cache_name),
+                    shard=shard,
+                )
+                store.write(self.name, list(tasks), chunk)
+            return
+
+        if not chunk_size:
+            tasks = self.load_tasks(
+                parameters, kind_dependencies_tasks, write_artifacts
+            )
+            store.write(self.name, tasks)
+            return
+
+        with trace.span(f"load {self.name}", cat="kinds"):
+            tasks = self._generate_tasks(
+                parameters, kind_dependencies_tasks, write_artifacts
+            )
+            for chunk in itertools.count():
+                tasks_chunk = list(itertools.islice(tasks, chunk_size))
+                # Always write the first chunk, so an empty kind is still stored.
+                if tasks_chunk or chunk == 0:
+                    store.write(self.name, tasks_chunk, chunk)
+                if len(tasks_chunk) < chunk_size:
+                    break
 
     @classmethod
     def load(cls, root_dir, graph_config, kind_name):
@@ -146,12 +335,16 @@ class TaskGraphGenerator:
         decision_task_id: str = "DECISION-TASK",
         write_artifacts: bool = False,
         enable_verifications: bool = True,
+        created_tasks: Optional[dict[str, str]] = None,
     ):
         """
         @param root_dir: root directory containing the Taskgraph config.yml file
         @param parameters: parameters for this task-graph generation, or callable
             taking a `GraphConfig` and returning parameters
         @type parameters: Union[Parameters, Callable[[GraphConfig], Parameters]]
+        @param created_tasks: labels of the tasks an earlier run of the decision
+            task already created, mapped to their task ids. They are replaced by
+            the existing tasks even if they would otherwise not be optimized.
         """
         if root_dir is None:
             root_dir = "taskcluster"
@@ -160,10 +353,12 @@ class TaskGraphGenerator:
         self._decision_task_id = decision_task_id
         self._write_artifacts = write_artifacts
         self._enable_verifications = enable_verifications
+        self._created_tasks = created_tasks or {}
 
         # start the generator
         self._run = self._run()  # type: ignore
         self._run_results = {}
+        self.metrics = GenerationMetrics()
 
     @property
     def parameters(self):
@@ -317,52 +512,197 @@ class TaskGraphGenerator:
 
         return all_tasks
 
-    def _load_tasks_parallel(self, kinds, kind_graph, parameters, executor):
+    def _load_tasks_parallel(self, kinds, kind_graph, parameters, executor, workers):
         all_tasks = {}
-        futures_to_kind = {}
+        tasks_by_kind = {}
+        futures_to_job = {}
+        futures_to_start = {}
         futures = set()
-        edges = set(kind_graph.edges)
 
-        with executor:
+        # Kinds that haven't been loaded yet, mapped to the kinds they are
+        # still waiting on.
+        waiting_on = {name: set() for name in kinds}
+        for left, right, _ in kind_graph.edges:
+            waiting_on[left].add(right)
+
+        # Kinds with `stream-from` are loaded one chunk of their upstream kind
+        # at a time, as soon as each chunk has been generated, rather than
+        # waiting for the whole upstream kind. Kinds that are themselves loaded
+        # in chunks can't be streamed from.
+        streams = {
+            name: kind.stream_from
+            for name, kind in kinds.items()
+            if kind.stream_from in waiting_on[name]
+        }
+        streams = {d: u for d, u in streams.items() if u not in streams}
+
+        # When kinds are loaded in other processes, write each kind's tasks to
+        # a shared store once rather than pickling them again for every kind
+        # that depends on them. Chunks of upstream kinds are streamed through
+        # the store, so it is also used by threads when any kind streams.
+        store = None
+        if isinstance(executor, ProcessPoolExecutor) or streams:
+            store = TaskStore()
+
+        # Prefer kinds at the head of the longest (slowest) remaining chain of
+        # kinds, using timings from previous runs. Only submit as many kinds as
+        # there are workers so that kinds becoming ready later can still jump
+        # ahead of cheap leaf kinds.
+        timings = KindTimings.load(self.root_dir)
+        priorities = timings.priorities(kind_graph)
+
+        # Kinds with `shard-safe` have their inputs split between all workers,
+        # each shard being written to the store as a chunk of the kind.
+        shards = {}
+        if store and workers > 1:
+            shards = {
+                name: workers
+                for name, kind in kinds.items()
+                if kind.shard_safe and name not in streams
+            }
 
-            def submit_ready_kinds():
-                """Create the next batch of tasks for kinds without dependencies."""
-                nonlocal kinds, edges, futures
-                loaded_tasks = all_tasks.copy()
-                kinds_with_deps = {edge[0] for edge in edges}
-                ready_kinds = (
-                    set(kinds) - kinds_with_deps - set(futures_to_kind.values())
-                )
-                for name in ready_kinds:
-                    kind = kinds.get(name)
-                    if not kind:
-                        message = (
-                            f'Could not find the kind "{name}"\nAvailable kinds:\n'
+        # The chunks of each upstream kind read so far, and the number of
+        # chunks submitted for each streaming or sharded kind.
+        upstream_chunks = {u: [] for u in streams.values()}
+        chunks_submitted = {name: 0 for name in itertools.chain(streams, shards)}
+        running = {name: 0 for name in kinds}
+        durations = {name: 0.0 for name in kinds}
+
+        def ready_jobs():
+            for name in kinds:
+                if name in streams:
+                    upstream = streams[name]
+                    if waiting_on[name] <= {upstream}:
+                        available = len(upstream_chunks[upstream])
+                        for chunk in range(chunks_submitted[name], available):
+                            yield name, chunk
+                elif name in shards:
+                    if not waiting_on[name]:
+                        for chunk in range(chunks_submitted[name], shards[name]):
+                            yield name, chunk
+                elif not waiting_on[name] and not running[name]:
+                    yield name, None
+
+        def submit_ready_jobs():
+            """Create the next batch of tasks for kinds without dependencies."""
+            ready = sorted(
+                ready_jobs(),
+                key=lambda job: (-priorities.get(job[0], 0.0), job[0], job[1] or 0),
+            )
+            for name, chunk in ready[: max(workers - len(futures), 0)]:
+                kind = kinds.get(name)
+                if not kind:
+                    message = f'Could not find the kind "{name}"\nAvailable kinds:\n'
+                    for k in sorted(kinds):
+                        message += f' - "{k}"\n'
+                    raise Exception(message)
+
+                upstream = streams.get(name)
+                dep_kinds = [
+                    k
+                    for k in kind.config.get("kind-dependencies", [])
+                    if k in tasks_by_kind and k != upstream
+                ]
+                dep_tasks = {t.label: t for k in dep_kinds for t in tasks_by_kind[k]}
+                if store:
+                    deps = [(k, None) for k in dep_kinds]
+                    if chunk is not None:
+                        chunks_submitted[name] += 1
+                    if upstream:
+                        deps.append((upstream, chunk))
+                        dep_tasks.update(
+                            (t.label, t) for t in upstream_chunks[upstream][chunk]
                         )
-                        for k in sorted(kinds):
-                            message += f' - "{k}"\n'
-                        raise Exception(message)
-
+                    future = executor.submit(
+                        kind.load_tasks_into_store,
+                        store.path,
+                        dict(parameters),
+                        store.view(deps, dep_tasks),
+                        self._write_artifacts,
+                        chunk,
+                        STREAM_CHUNK_SIZE if name in upstream_chunks else None,
+                        shards.get(name),
+                    )
+                else:
                     future = executor.submit(
                         kind.load_tasks,
                         dict(parameters),
-                        {
-                            k: t
-                            for k, t in loaded_tasks.items()
-                            if t.kind in kind.config.get("kind-dependencies", [])
-                        },
+                        dep_tasks,
                         self._write_artifacts,
                     )
-                    futures.add(future)
-                    futures_to_kind[future] = name
+                futures.add(future)
+                futures_to_job[future] = name
+                futures_to_start[future] = time.monotonic()
+                running[name] += 1
 
-            submit_ready_kinds()
+        def add_tasks(new_tasks):
+            for task in new_tasks:
+                if task.label in all_tasks:
+                    raise Exception("duplicate tasks with label " + task.label)
+                all_tasks[task.label] = task
+
+        def read_upstream_chunks(name):
+            """Read the chunks an upstream kind has written since last time."""
+            chunks = upstream_chunks[name]
+            available = store.chunks().get(name, set())
+            while len(chunks) in available:
+                chunks.append(store.read(name, len(chunks)))
+                add_tasks(chunks[-1])
+
+        def finish_kind(name, new_tasks):
+            if name in upstream_chunks:
+                # Its tasks were added as each chunk was read.
+                read_upstream_chunks(name)
+                new_tasks = [t for chunk in upstream_chunks[name] for t in chunk]
+            else:
+                if new_tasks is None:
+                    new_tasks = store.read(name)
+                add_tasks(new_tasks)
+            tasks_by_kind[name] = new_tasks
+            timings.record(name, durations.pop(name))
+
+            # Update state for next batch of futures.
+            del kinds[name]
+            del waiting_on[name]
+            for deps in waiting_on.values():
+                deps.discard(name)
+
+        def finish_chunked_kinds():
+            # Sharded kinds go first, as they may be streamed from.
+            for name, count in shards.items():
+                if name in kinds and not running[name]:
+                    if chunks_submitted[name] == count:
+                        finish_kind(name, None)
+
+            for name, upstream in streams.items():
+                if (
+                    name in kinds
+                    and upstream in tasks_by_kind
+                    and not running[name]
+                    and chunks_submitted[name] == len(upstream_chunks[upstream])
+                ):
+                    finish_kind(name, None)
+
+        with executor, contextlib.ExitStack() as stack:
+            if store:
+                stack.callback(store.cleanup)
+
+            submit_ready_jobs()
             while futures:
-                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                # Poll for new chunks while an upstream kind is being loaded.
+                streaming = [u for u in upstream_chunks if running.get(u)]
+                done, _ = wait(
+                    futures,
+                    timeout=STREAM_POLL_INTERVAL if streaming else None,
+                    return_when=FIRST_COMPLETED,
+                )
+                for name in streaming:
+                    read_upstream_chunks(name)
+
                 for future in done:
                     if exc := future.exception():
                         executor.shutdown(wait=False, cancel_futures=True)
-                        kind_name = futures_to_kind.get(future, "?")
+                        kind_name = futures_to_job.get(future, "?")
                         if isinstance(exc, SchemaValidationError):
                             logger.error(
                                 f"Error loading tasks for kind {kind_name}:\n{exc}"
@@ -373,26 +713,26 @@ class TaskGraphGenerator:
                                 exc_info=(type(exc), exc, exc.__traceback__),
                             )
                         raise exc
-                    kind = futures_to_kind.pop(future)
+                    kind = futures_to_job.pop(future)
                     futures.remove(future)
+                    running[kind] -= 1
+                    durations[kind] += time.monotonic() - futures_to_start.pop(future)
 
-                    for task in future.result():
-                        if task.label in all_tasks:
-                            raise Exception("duplicate tasks with label " + task.label)
-                        all_tasks[task.label] = task
+                    if kind not in streams and kind not in shards:
+                        finish_kind(kind, None if store else future.result())
 
-                    # Update state for next batch of futures.
-                    del kinds[kind]
-                    edges = {e for e in edges if e[1] != kind}
+                finish_chunked_kinds()
 
                 # Submit any newly unblocked kinds
-                submit_ready_kinds()
+                submit_ready_jobs()
 
+        timings.save()
         return all_tasks
 
     def _run(self):
         logger.info("Loading graph configuration.")
-        graph_config = load_graph_config(self.root_dir)
+        with trace.span("load_graph_config"):
+            graph_config = load_graph_config(self.root_dir)
 
         yield ("graph_config", graph_config)
 
@@ -433,11 +773,12 @@ class TaskGraphGenerator:
         }
         self.verify("kinds", kinds)
 
-        edges = set()
+        builder = GraphBuilder()
         for kind in kinds.values():
+            builder.add_node(kind.name)
             for dep in kind.config.get("kind-dependencies", []):
-                edges.add((kind.name, dep, "kind-dependency"))
-        kind_graph = Graph(frozenset(kinds), frozenset(edges))
+                builder.add_edge(kind.name, dep, "kind-dependency")
+        kind_graph = builder.freeze()
 
         if target_kinds:
             kind_graph = kind_graph.transitive_closure(
@@ -467,17 +808,20 @@ class TaskGraphGenerator:
         # all platforms by default using threads, and remove support for multiple
         # processes altogether.
         def load_tasks():
+            # `os.process_cpu_count` is only available from Python 3.13.
+            workers = getattr(os, "process_cpu_count", os.cpu_count)() or 1
             if platform.system() == "Linux":
                 if os.environ.get("TASKGRAPH_SERIAL"):
                     return self._load_tasks_serial(kinds, kind_graph, parameters)
                 elif os.environ.get("TASKGRAPH_USE_THREADS"):
-                    executor = ThreadPoolExecutor(max_workers=os.process_cpu_count())
+                    executor = ThreadPoolExecutor(max_workers=workers)
                 else:
                     executor = ProcessPoolExecutor(
-                        mp_context=multiprocessing.get_context("fork")
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context("fork"),
                     )
                 return self._load_tasks_parallel(
-                    kinds, kind_graph, parameters, executor
+                    kinds, kind_graph, parameters, executor, workers
                 )
             else:
                 if os.environ.get("TASKGRAPH_SERIAL") or not os.environ.get(
@@ -485,31 +829,37 @@ class TaskGraphGenerator:
                 ):
                     return self._load_tasks_serial(kinds, kind_graph, parameters)
                 else:
-                    executor = ThreadPoolExecutor(max_workers=os.process_cpu_count())
+                    executor = ThreadPoolExecutor(max_workers=workers)
                 return self._load_tasks_parallel(
-                    kinds, kind_graph, parameters, executor
+                    kinds, kind_graph, parameters, executor, workers
                 )
 
+        if path := profile_path():
+            start_profile(path)
         all_tasks = load_tasks()
+        if path:
+            finish_profile(path)
+            logger.info(f"Wrote transform profile to {path}")
+
+        if os.environ.get(INTERN_ENV):
+            intern_tasks(all_tasks.values())
 
         full_task_set = TaskGraph(all_tasks, Graph(frozenset(all_tasks), frozenset()))
         yield self.verify("full_task_set", full_task_set, graph_config, parameters)
 
         logger.info("Generating full task graph")
-        edges = set()
+        builder = TaskGraphBuilder(full_task_set)
         for t in full_task_set:
             for depname, dep in t.dependencies.items():
                 if dep not in all_tasks.keys():
                     raise Exception(
                         f"Task '{t.label}' lists a dependency that does not exist: '{dep}'"
                     )
-                edges.add((t.label, dep, depname))
+                builder.add_edge(t.label, dep, depname)
 
-        full_task_graph = TaskGraph(
-            all_tasks, Graph(frozenset(full_task_set.graph.nodes), frozenset(edges))
-        )
+        full_task_graph = builder.freeze()
         logger.info(
-            f"Full task graph contains {len(full_task_set.graph.nodes)} tasks and {len(edges)} dependencies"
+            f"Full task graph contains {len(full_task_graph.graph.nodes)} tasks and {len(full_task_graph.graph.edges)} dependencies"
         )
         yield self.verify("full_task_graph", full_task_graph, graph_config, parameters)
 
@@ -561,6 +911,7 @@ class TaskGraphGenerator:
         do_not_optimize = set(parameters.get("do_not_optimize", []))
         if not parameters.get("optimize_target_tasks", True):
             do_not_optimize = set(target_task_set.graph.nodes).union(do_not_optimize)
+        do_not_optimize -= self._created_tasks.keys()
 
         # this is used for testing experimental optimization strategies
         strategies = os.environ.get(
@@ -594,10 +945,15 @@ class TaskGraphGenerator:
 
     def _run_until(self, name):
         while name not in self._run_results:
-            try:
-                k, v = next(self._run)  # type: ignore
-            except StopIteration:
-                raise AttributeError(f"No such run result {name}")
+            started = self.metrics.start()
+            with trace.span("generate", cat="phases") as event:
+                try:
+                    k, v = next(self._run)  # type: ignore
+                except StopIteration:
+                    raise AttributeError(f"No such run result {name}")
+                if event:
+                    event["name"] = k
+            self.metrics.record(k, v, started)
             self._run_results[k] = v
         return self._run_results[name]
 
@@ -4,7 +4,8 @@
 
 
 import collections
-import functools
+import itertools
+from array import array
 from dataclasses import dataclass
 
 from .util.readonlydict import ReadOnlyDict
@@ -34,6 +35,20 @@ class Graph(_Graph):
     def __init__(self, nodes, edges):
         super().__init__(frozenset(nodes), frozenset(edges))
 
+    def __hash__(self):
+        # Only the sizes are hashed, as they are cheap to get for a
+        # `CompactGraph` too, and equal graphs have equal sizes.
+        return hash((len(self.nodes), len(self.edges)))
+
+    def iter_nodes(self):
+        """Return an iterator over the nodes of the graph."""
+        return iter(self.nodes)
+
+    def iter_edges(self):
+        """Return an iterator over the edges of the graph, as
+        `(left, right, name)` tuples."""
+        return iter(self.edges)
+
     def transitive_closure(self, nodes, reverse=False):
         """Return the transitive closure of <nodes>: the graph containing all
         specified nodes as well as any nodes reachable from them, and any
@@ -61,21 +76,27 @@ class Graph(_Graph):
                 f"Unknown nodes in transitive closure: {nodes - self.nodes}"
             )
 
-        # generate a new graph by expanding along edges until reaching a fixed
-        # point
-        new_nodes, new_edges = nodes, set()
-        nodes, edges = set(), set()
-        while (new_nodes, new_edges) != (nodes, edges):
-            nodes, edges = new_nodes, new_edges
-            add_edges = {
-                (left, right, name)
-                for (left, right, name) in self.edges
-                if (right if reverse else left) in nodes
-            }
-            add_nodes = {(left if reverse else right) for (left, right, _) in add_edges}
-            new_nodes = nodes | add_nodes
-            new_edges = edges | add_edges
-        return Graph(new_nodes, new_edges)
+        forward_links, reverse_links = self.links_and_reverse_links_dict()
+        links = reverse_links if reverse else forward_links
+
+        # walk the adjacency index from the given nodes, visiting each
+        # reachable node once
+        reached = set(nodes)
+        stack = list(nodes)
+        while stack:
+            for linked in links[stack.pop()]:
+                if linked not in reached:
+                    reached.add(linked)
+                    stack.append(linked)
+
+        if len(reached) == len(self.nodes):
+            return Graph(self.nodes, self.edges)
+
+        # every edge out of (or into, if reversed) a reached node leads to
+        # another reached node
+        end = 1 if reverse else 0
+        edges = {edge for edge in self.edges if edge[end] in reached}
+        return Graph(reached, edges)
 
     def _visit(self, reverse):
         forward_links, reverse_links = self.links_and_reverse_links_dict()
@@ -119,7 +140,60 @@ class Graph(_Graph):
         """
         return self._visit(True)
 
-    @functools.cache
+    def levels(self, reverse=False):
+        """
+        Return the nodes of the graph grouped into levels, such that every
+        node is in the level after the last of the nodes it links to. The
+        nodes of a level don't depend on each other, so they can be processed
+        together once the previous levels have been.
+
+        If `reverse` is true, every node is instead in the level after the
+        last of the nodes linking to it.
+
+        Because the return value is cached on the graph, this returns a tuple
+        of frozensets.
+
+        Raises an exception if the graph contains a cycle.
+        """
+        # Cached on the instance rather than with `functools.cache`, which
+        # would keep every graph it was called on alive.
+        key = f"_levels_{reverse}"
+        if key in self.__dict__:
+            return self.__dict__[key]
+
+        forward_links, reverse_links = self.links_and_reverse_links_dict()
+
+        dependencies = reverse_links if reverse else forward_links
+        dependents = forward_links if reverse else reverse_links
+
+        indegree = {node: len(dependencies[node]) for node in self.nodes}
+        level = [node for node, degree in indegree.items() if degree == 0]
+
+        levels = []
+        while level:
+            levels.append(frozenset(level))
+            next_level = []
+            for node in level:
+                for dependent in dependents[node]:
+                    indegree[dependent] -= 1
+                    if indegree[dependent] == 0:
+                        next_level.append(dependent)
+            level = next_level
+
+        loopy_nodes = {node for node, degree in indegree.items() if degree > 0}
+        if loopy_nodes:
+            raise Exception(
+                f"Dependency loop detected involving the following nodes: {loopy_nodes}"
+            )
+        self.__dict__[key] = tuple(levels)
+        return self.__dict__[key]
+
+    def critical_path_length(self):
+        """
+        Return the number of nodes in the longest path through the graph.
+        """
+        return len(self.levels())
+
     def links_and_reverse_links_dict(self):
         """
         Return both links and reverse_links dictionaries.
@@ -132,16 +206,21 @@ class Graph(_Graph):
         `reverse_links_dict` counterparts to avoid consumers modifying the
         cached value by mistake.
         """
+        # Cached on the instance, like `levels`.
+        if "_links_and_reverse_links" in self.__dict__:
+            return self.__dict__["_links_and_reverse_links"]
+
         forward = {node: set() for node in self.nodes}
         reverse = {node: set() for node in self.nodes}
         for left, right, _ in self.edges:
             forward[left].add(right)
             reverse[right].add(left)
 
-        return (
+        self.__dict__["_links_and_reverse_links"] = (
             ReadOnlyDict({key: frozenset(value) for key, value in forward.items()}),
             ReadOnlyDict({key: frozenset(value) for key, value in reverse.items()}),
         )
+        return self.__dict__["_links_and_reverse_links"]
 
     def links_dict(self):
         """
@@ -172,3 +251,315 @@ class Graph(_Graph):
         for left, right, _ in self.edges:
             links[right].add(left)
         return links
+
+
+def _union(base, added):
+    """Return a frozenset of `base` and `added`, copying `base` only if
+    something was added to it."""
+    if base is None:
+        return frozenset(added)
+    if not added:
+        return base
+    return base.union(added)
+
+
+class GraphBuilder:
+    """Collect the nodes and edges of a graph, then freeze them into a
+    `Graph` in one step.
+
+    If `graph` is given, nodes and edges are added to those of `graph`. Its
+    sets are copied once when the builder is frozen, or not at all if
+    nothing was added.
+    """
+
+    def __init__(self, graph=None):
+        self.graph = graph
+        self._nodes = set()
+        self._edges = set()
+
+    def add_node(self, node):
+        self._nodes.add(node)
+
+    def add_edge(self, left, right, name):
+        self._edges.add((left, right, name))
+
+    def _frozen_nodes(self):
+        return _union(self.graph and self.graph.nodes, self._nodes)
+
+    def freeze(self, compact=False):
+        """Return the built graph, as a `CompactGraph` if `compact` is
+        true."""
+        edges = _union(self.graph and self.graph.edges, self._edges)
+        return (CompactGraph if compact else Graph)(self._frozen_nodes(), edges)
+
+
+def _csr(count, keys, *columns):
+    """Group the columns of a list of edges by `keys`, in compressed sparse
+    row form.
+
+    Returns:
+        tuple: An array of `count + 1` offsets, such that the values of key
+        `i` are at positions `offsets[i]` to `offsets[i + 1]` of each of the
+        returned columns, followed by the reordered columns.
+    """
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    degrees = collections.Counter(keys)
+    offsets = array(
+        "l", itertools.accumulate(map(degrees.__getitem__, range(count)), initial=0)
+    )
+    return (offsets,) + tuple(
+        array(column.typecode, map(column.__getitem__, order)) for column in columns
+    )
+
+
+class CompactGraph(Graph):
+    """A `Graph` stored in a compact form, for large graphs.
+
+    Node labels and edge names are interned to integer ids, and edges are
+    stored in both directions as arrays in compressed sparse row form,
+    instead of as a set of tuples. This takes a fraction of the memory of a
+    `Graph`, and graph operations work on integers rather than hashing
+    labels.
+
+    The `nodes` and `edges` sets are only built when they are accessed, so
+    callers that only need to traverse the graph should prefer the
+    `iter_*`, `visit_*`, `*_links_dict` and `transitive_closure` methods.
+    """
+
+    def __init__(self, nodes, edges):
+        labels = list(nodes)
+        index = dict(zip(labels, itertools.count()))
+        if not isinstance(edges, (set, frozenset)):
+            edges = set(edges)
+
+        names = {}
+        lefts, rights, name_ids = array("i"), array("i"), array("i")
+        for left, right, name in edges:
+            lefts.append(index[left])
+            rights.append(index[right])
+            name_ids.append(names.setdefault(name, len(names)))
+
+        self._init(labels, list(names), lefts, rights, name_ids)
+
+    def _init(self, labels, names, lefts, rights, name_ids):
+        if len(names) <= 1 << 16:
+            name_ids = array("H", name_ids)
+        state = {
+            "_labels": labels,
+            "_names": names,
+        }
+        count = len(labels)
+        (
+            state["_forward_offsets"],
+            state["_forward_nodes"],
+            state["_forward_names"],
+        ) = _csr(count, lefts, rights, name_ids)
+        (
+            state["_reverse_offsets"],
+            state["_reverse_nodes"],
+            state["_reverse_names"],
+        ) = _csr(count, rights, lefts, name_ids)
+        self.__dict__.update(state)
+
+    @classmethod
+    def _from_ids(cls, labels, names, lefts, rights, name_ids):
+        graph = cls.__new__(cls)
+        graph._init(labels, names, lefts, rights, name_ids)
+        return graph
+
+    def __getstate__(self):
+        # Don't pickle the sets and dictionaries built on demand.
+        return {
+            key: value
+            for key, value in self.__dict__.items()
+            if key.startswith(("_forward", "_reverse")) or key in ("_labels", "_names")
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    def __getattr__(self, name):
+        # Build the views of the graph on first use.
+        if name == "_index":
+            value = dict(zip(self._labels, itertools.count()))
+        elif name == "nodes":
+            value = frozenset(self._labels)
+        elif name == "edges":
+            value = frozenset(self._iter_edges())
+        else:
+            raise AttributeError(name)
+        self.__dict__[name] = value
+        return value
+
+    def __eq__(self, other):
+        if not isinstance(other, Graph):
+            return NotImplemented
+        return self.nodes == other.nodes and self.edges == other.edges
+
+    def __hash__(self):
+        return hash((len(self._labels), len(self._forward_nodes)))
+
+    def iter_nodes(self):
+        return iter(self._labels)
+
+    def iter_edges(self):
+        return self._iter_edges()
+
+    def _iter_edges(self, reverse=False):
+        """Yield each edge as a `(left, right, name)` tuple, grouped by left
+        node (or right node, if `reverse` is true)."""
+        if reverse:
+            offsets, nodes, names = (
+                self._reverse_offsets,
+                self._reverse_nodes,
+                self._reverse_names,
+            )
+        else:
+            offsets, nodes, names = (
+                self._forward_offsets,
+                self._forward_nodes,
+                self._forward_names,
+            )
+        labels, edge_names = self._labels, self._names
+        for i, label in enumerate(labels):
+            for j in range(offsets[i], offsets[i + 1]):
+                other = labels[nodes[j]]
+                edge = (other, label) if reverse else (label, other)
+                yield edge + (edge_names[names[j]],)
+
+    def _links(self, i, reverse=False):
+        if reverse:
+            return self._reverse_nodes[
+                self._reverse_offsets[i] : self._reverse_offsets[i + 1]
+            ]
+        return self._forward_nodes[
+            self._forward_offsets[i] : self._forward_offsets[i + 1]
+        ]
+
+    def transitive_closure(self, nodes, reverse=False):
+        assert isinstance(nodes, set)
+        index = self._index
+        unknown = {node for node in nodes if node not in index}
+        if unknown:
+            raise Exception(f"Unknown nodes in transitive closure: {unknown}")
+
+        if reverse:
+            offsets, links = self._reverse_offsets, self._reverse_nodes
+        else:
+            offsets, links = self._forward_offsets, self._forward_nodes
+
+        reached = bytearray(len(self._labels))
+        stack = [index[node] for node in nodes]
+        for i in stack:
+            reached[i] = 1
+        while stack:
+            i = stack.pop()
+            for j in links[offsets[i] : offsets[i + 1]]:
+                if not reached[j]:
+                    reached[j] = 1
+                    stack.append(j)
+
+        ids = [i for i, r in enumerate(reached) if r]
+        if len(ids) == len(self._labels):
+            return self
+
+        # keep the edges between reached nodes, renumbering the nodes
+        new_ids = array("i", [0]) * len(reached)
+        for new_id, i in enumerate(ids):
+            new_ids[i] = new_id
+        names = self._reverse_names if reverse else self._forward_names
+        lefts, rights, name_ids = array("i"), array("i"), array(names.typecode)
+        for new_id, i in enumerate(ids):
+            start, end = offsets[i], offsets[i + 1]
+            lefts.extend(array("i", [new_id]) * (end - start))
+            rights.extend(links[start:end])
+            name_ids.extend(names[start:end])
+        rights = array("i", map(new_ids.__getitem__, rights))
+        if reverse:
+            lefts, rights = rights, lefts
+        return CompactGraph._from_ids(
+            [self._labels[i] for i in ids], self._names, lefts, rights, name_ids
+        )
+
+    def _visit(self, reverse):
+        labels = self._labels
+        offsets = self._reverse_offsets if reverse else self._forward_offsets
+        indegree = [end - start for start, end in zip(offsets, offsets[1:])]
+
+        queue = collections.deque(i for i, degree in enumerate(indegree) if not degree)
+        while queue:
+            i = queue.popleft()
+            yield labels[i]
+
+            for j in self._links(i, reverse=not reverse):
+                indegree[j] -= 1
+                if indegree[j] == 0:
+                    queue.append(j)
+        loopy_nodes = {labels[i] for i, degree in enumerate(indegree) if degree > 0}
+        if loopy_nodes:
+            raise Exception(
+                f"Dependency loop detected involving the following nodes: {loopy_nodes}"
+            )
+
+    def levels(self, reverse=False):
+        key = f"_levels_{reverse}"
+        if key in self.__dict__:
+            return self.__dict__[key]
+
+        labels = self._labels
+        offsets = self._reverse_offsets if reverse else self._forward_offsets
+        indegree = [end - start for start, end in zip(offsets, offsets[1:])]
+        level = [i for i, degree in enumerate(indegree) if not degree]
+
+        levels = []
+        while level:
+            levels.append(frozenset(labels[i] for i in level))
+            next_level = []
+            for i in level:
+                for j in self._links(i, reverse=not reverse):
+                    indegree[j] -= 1
+                    if indegree[j] == 0:
+                        next_level.append(j)
+            level = next_level
+
+        loopy_nodes = {labels[i] for i, degree in enumerate(indegree) if degree > 0}
+        if loopy_nodes:
+            raise Exception(
+                f"Dependency loop detected involving the following nodes: {loopy_nodes}"
+            )
+        self.__dict__[key] = tuple(levels)
+        return self.__dict__[key]
+
+    def links_and_reverse_links_dict(self):
+        if "_links_and_reverse_links" not in self.__dict__:
+            labels = self._labels
+            self.__dict__["_links_and_reverse_links"] = tuple(
+                ReadOnlyDict(
+                    {
+                        label: frozenset(
+                            labels[j] for j in self._links(i, reverse=reverse)
+                        )
+                        for i, label in enumerate(labels)
+                    }
+                )
+                for reverse in (False, True)
+            )
+        return self.__dict__["_links_and_reverse_links"]
+
+    def links_dict(self):
+        links = collections.defaultdict(set)
+        for left, right, _ in self._iter_edges():
+            links[left].add(right)
+        return links
+
+    def named_links_dict(self):
+        links = collections.defaultdict(dict)
+        for left, right, name in self._iter_edges():
+            links[left][name] = right
+        return links
+
+    def reverse_links_dict(self):
+        links = collections.defaultdict(set)
+        for left, right, _ in self._iter_edges(reverse=True):
+            links[right].add(left)
+        return links
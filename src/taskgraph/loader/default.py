@@ -5,6 +5,8 @@
 
 import logging
 
+from taskgraph.util.kind_cache import cacheable_loader
+
 from .transform import loader as transform_loader
 
 logger = logging.getLogger(__name__)
@@ -16,6 +18,7 @@ DEFAULT_TRANSFORMS = [
 ]
 
 
+@cacheable_loader
 def loader(kind, path, config, params, loaded_tasks, write_artifacts):
     """
     This default loader builds on the `transform` loader by providing sensible
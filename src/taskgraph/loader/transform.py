@@ -5,12 +5,14 @@
 
 import logging
 
+from taskgraph.util.kind_cache import cacheable_loader
 from taskgraph.util.templates import merge
 from taskgraph.util.yaml import load_yaml
 
 logger = logging.getLogger(__name__)
 
 
+@cacheable_loader
 def loader(kind, path, config, params, loaded_tasks, write_artifacts):
     """
     Get the input elements that will be transformed into tasks in a generic
@@ -10,20 +10,13 @@ import re
 import shutil
 import subprocess
 import sys
-import tempfile
 import traceback
 from collections import namedtuple
-from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from textwrap import dedent
 from typing import Any
 from urllib.parse import urlparse
 
-import appdirs
-import yaml
-
-from taskgraph.util.schema import SchemaValidationError
-
 Command = namedtuple("Command", ["func", "args", "kwargs", "defaults"])
 commands = {}
 
@@ -63,6 +56,8 @@ def format_taskgraph_json(taskgraph):
 
 
 def format_taskgraph_yaml(taskgraph):
+    import yaml  # noqa: PLC0415
+
     return yaml.safe_dump(taskgraph.to_json(), default_flow_style=False)
 
 
@@ -96,27 +91,23 @@ def get_filtered_taskgraph(taskgraph, tasksregex, exclude_keys):
     Filter all the tasks on basis of a regular expression
     and returns a new TaskGraph object
     """
-    from taskgraph.graph import Graph  # noqa: PLC0415
     from taskgraph.task import Task  # noqa: PLC0415
-    from taskgraph.taskgraph import TaskGraph  # noqa: PLC0415
+    from taskgraph.taskgraph import TaskGraphBuilder  # noqa: PLC0415
 
     if tasksregex:
         named_links_dict = taskgraph.graph.named_links_dict()
-        filteredtasks = {}
-        filterededges = set()
+        builder = TaskGraphBuilder()
         regexprogram = re.compile(tasksregex)
 
         for key in taskgraph.graph.visit_postorder():
             task = taskgraph.tasks[key]
             if regexprogram.match(task.label):
-                filteredtasks[key] = task
+                builder.add_task(task, key=key)
                 for depname, dep in named_links_dict[key].items():
                     if regexprogram.match(dep):
-                        filterededges.add((key, dep, depname))
+                        builder.add_edge(key, dep, depname)
 
-        taskgraph = TaskGraph(
-            filteredtasks, Graph(frozenset(filteredtasks), frozenset(filterededges))
-        )
+        taskgraph = builder.freeze()
 
     if exclude_keys:
         for label, task in taskgraph.tasks.items():
@@ -151,7 +142,9 @@ def get_taskgraph_generator(root, parameters):
 
 def format_taskgraph(options, parameters, overrides, logfile=None):
     import taskgraph  # noqa: PLC0415
-    from taskgraph.parameters import parameters_loader  # noqa: PLC0415
+    from taskgraph.parameters import Parameters, parameters_loader  # noqa: PLC0415
+    from taskgraph.util.trace import tracing  # noqa: PLC0415
+    from taskgraph.util.transform_profile import profiling  # noqa: PLC0415
 
     if logfile:
         handler = logging.FileHandler(logfile, mode="w")
@@ -164,6 +157,17 @@ def format_taskgraph(options, parameters, overrides, logfile=None):
     if options["fast"]:
         taskgraph.fast = True
 
+    # Output files may contain '{params}', to write one per parameter set.
+    spec = parameters if isinstance(parameters, str) else None
+    params_name = Parameters.format_spec(spec)
+    trace_path = options.get("trace")
+    if trace_path:
+        trace_path = trace_path.format(params=params_name)
+
+    profile_path = options.get("profile_transforms")
+    if profile_path:
+        profile_path = profile_path.format(params=params_name)
+
     if isinstance(parameters, str):
         parameters = parameters_loader(
             parameters,
@@ -172,8 +176,8 @@ def format_taskgraph(options, parameters, overrides, logfile=None):
         )
 
     tgg = get_taskgraph_generator(options.get("root"), parameters)
-
-    tg = getattr(tgg, options["graph_attr"])
+    with tracing(trace_path), profiling(profile_path):
+        tg = getattr(tgg, options["graph_attr"])
     tg = get_filtered_taskgraph(tg, options["tasks_regex"], options["exclude_keys"])
     format_method = FORMAT_METHODS[options["format"] or "labels"]
     return format_method(tg)
@@ -221,6 +225,8 @@ def generate_taskgraph(options, parameters, overrides, logdir):
         dump_output(out, options["output_file"])
         return 0
 
+    from concurrent.futures import ProcessPoolExecutor, as_completed  # noqa: PLC0415
+
     futures = {}
     with ProcessPoolExecutor(max_workers=options["max_workers"]) as executor:
         for spec in parameters:
@@ -441,6 +447,32 @@ def show_kind_graph(options):
     action="store_true",
     help="enable fast task generation for local debugging.",
 )
+@argument(
+    "--profile-transforms",
+    default=None,
+    metavar="FILE",
+    help="Measure the time spent in each transform and write the profile to "
+    "FILE, which can be displayed with `taskgraph profile`. When multiple "
+    "parameters are specified, FILE should contain '{params}', which is "
+    "replaced with the name of each parameter set.",
+)
+@argument(
+    "--no-server",
+    dest="use_server",
+    default=True,
+    action="store_false",
+    help="Generate the graph in this process, even if a `taskgraph serve` "
+    "server is running.",
+)
+@argument(
+    "--trace",
+    default=None,
+    metavar="FILE",
+    help="Write a timeline of the generation to FILE in the Chrome trace event "
+    "format, which can be opened with https://ui.perfetto.dev. When multiple "
+    "parameters are specified, FILE should contain '{params}', which is "
+    "replaced with the name of each parameter set.",
+)
 @argument(
     "--diff",
     const="default",
@@ -450,6 +482,15 @@ def show_kind_graph(options):
     "Without args the base revision will be used. A revision specifier such as "
     "the hash or `.~1` (hg) or `HEAD~1` (git) can be used as well.",
 )
+@argument(
+    "--diff-format",
+    default="text",
+    choices=["text", "summary", "full"],
+    help="How to show the differences found by '--diff'. 'text' diffs the "
+    "generated output, 'summary' lists added, removed and changed tasks along "
+    "with the paths of their changed fields, and 'full' prints the structured "
+    "diff, including the old and new value of each changed field, as JSON.",
+)
 @argument(
     "-j",
     "--max-workers",
@@ -474,6 +515,11 @@ def show_taskgraph(options):
     if options["diff"] or options["force_local_files_changed"]:
         repo = get_repository(os.getcwd())
 
+    if options["diff"] and options["diff_format"] != "text":
+        # Structured diffs are computed from the JSON representation of the
+        # graphs.
+        options["format"] = "json"
+
     if options["diff"]:
         assert repo is not None
         if not repo.working_directory_clean():
@@ -490,6 +536,8 @@ def show_taskgraph(options):
         cur_rev = repo.branch or repo.head_rev[:12]
         cur_rev_file = cur_rev.replace("/", "_")
 
+        import tempfile  # noqa: PLC0415
+
         diffdir = tempfile.mkdtemp()
         atexit.register(
             shutil.rmtree, diffdir
@@ -526,10 +574,35 @@ def show_taskgraph(options):
                 ]
             )
 
+    # Let a running `taskgraph serve` generate the graph, unless a feature it
+    # doesn't support was requested.
+    if (
+        options["use_server"]
+        and len(parameters) == 1
+        and isinstance(parameters[0], (str, type(None)))
+        and not options["diff"]
+        and not options["force_local_files_changed"]
+        and not options.get("profile_transforms")
+        and not options.get("trace")
+    ):
+        from taskgraph.server import request_graph  # noqa: PLC0415
+
+        response = request_graph(
+            options.get("root"), dict(options, parameters=parameters[0])
+        )
+        if response is not None:
+            if response["returncode"]:
+                print(response["error"], file=sys.stderr)
+            else:
+                dump_output(response["output"], options["output_file"])
+            return response["returncode"]
+
     logdir = None
     if len(parameters) > 1:
         # Log to separate files for each process instead of stderr to
         # avoid interleaving.
+        import appdirs  # noqa: PLC0415
+
         basename = os.path.basename(os.getcwd())
         logdir = os.path.join(appdirs.user_log_dir("taskgraph"), basename)
         if not os.path.isdir(logdir):
@@ -603,6 +676,21 @@ def show_taskgraph(options):
                 non_fatal_failures.append(os.path.basename(base_path))
                 continue
 
+            if options["diff_format"] != "text":
+                diff = diff_taskgraph_files(base_path, cur_path)
+                if options["diff_format"] == "summary":
+                    diff_output = diff.summary()
+                else:
+                    from taskgraph.util import json  # noqa: PLC0415
+
+                    diff_output = json.dumps(diff.to_json(), sort_keys=True, indent=2)
+                dump_output(
+                    diff_output,
+                    path=output_file if diff else None,
+                    params_spec=spec if len(parameters) > 1 else None,
+                )
+                continue
+
             try:
                 # If the output file(s) are missing, this command will raise
                 # CalledProcessError with a returncode > 1.
@@ -640,7 +728,7 @@ def show_taskgraph(options):
                 file=sys.stderr,
             )
 
-        if options["format"] != "json":
+        if options["format"] != "json" and options["diff_format"] == "text":
             print(
                 "If you were expecting differences in task bodies "
                 'you should pass "-J"\n',
@@ -653,6 +741,19 @@ def show_taskgraph(options):
     return ret
 
 
+def diff_taskgraph_files(base_path, cur_path):
+    """Compare two task graphs stored in JSON format."""
+    from taskgraph.taskgraph import TaskGraph  # noqa: PLC0415
+    from taskgraph.util import json  # noqa: PLC0415
+    from taskgraph.util.diff import diff_taskgraphs  # noqa: PLC0415
+
+    graphs = []
+    for path in (base_path, cur_path):
+        with open(path) as fh:
+            graphs.append(TaskGraph.from_json(json.load(fh))[1])
+    return diff_taskgraphs(*graphs)
+
+
 @command("build-image", help="Build a Docker image")
 @argument("image_name", help="Name of the image to build")
 @argument(
@@ -941,10 +1042,73 @@ def load_task(args):
     action="store_true",
     help="Allow user to override computed decision task parameters.",
 )
+@argument(
+    "--profile-transforms",
+    default=False,
+    action="store_true",
+    help="Measure the time spent in each transform and write the profile to "
+    "the transform-profile.json artifact.",
+)
+@argument(
+    "--trace",
+    default=None,
+    metavar="FILE",
+    help="Write a timeline of the decision task, including task creation, to "
+    "FILE in the Chrome trace event format.",
+)
 def decision(options):
     from taskgraph.decision import taskgraph_decision  # noqa: PLC0415
+    from taskgraph.util.trace import tracing  # noqa: PLC0415
 
-    taskgraph_decision(options)
+    with tracing(options.get("trace")):
+        taskgraph_decision(options)
+
+
+@command("profile", help="Show the slowest transforms from a transform profile.")
+@argument(
+    "profile",
+    help="Path to a profile written by `--profile-transforms` (or the "
+    "transform-profile.json artifact of a decision task).",
+)
+@argument(
+    "--sort",
+    default="wall_time",
+    choices=["wall_time", "cpu_time", "items_in", "items_out"],
+    help="Field to sort transforms by, in descending order (default: wall_time).",
+)
+@argument("--kind", "-k", default=None, help="Only show transforms of this kind.")
+@argument(
+    "--limit", "-n", default=None, type=int, help="Only show this many transforms."
+)
+def show_profile(options):
+    from taskgraph.util import json  # noqa: PLC0415
+    from taskgraph.util.transform_profile import format_profile  # noqa: PLC0415
+
+    with open(options["profile"]) as fh:
+        profile = json.load(fh)["kinds"]
+    if options["kind"]:
+        profile = {k: v for k, v in profile.items() if k == options["kind"]}
+    print(format_profile(profile, sort_by=options["sort"], limit=options["limit"]))
+    return 0
+
+
+@command(
+    "serve",
+    help="Keep a task graph generator running, so that generating graphs with "
+    "other commands (such as `taskgraph full`) is faster. Graphs are regenerated "
+    "as files in the Taskgraph root change.",
+)
+@argument("--root", "-r", help="root of the taskgraph definition relative to topsrcdir")
+@argument(
+    "--verbose", "-v", action="store_true", help="include debug-level logging output"
+)
+def serve(options):
+    from taskgraph.server import serve  # noqa: PLC0415
+
+    if options.pop("verbose", False):
+        logging.root.setLevel(logging.DEBUG)
+
+    return serve(options.get("root"))
 
 
 @command("actions", help="Print the rendered actions.json")
@@ -1209,9 +1373,13 @@ def main(args=sys.argv[1:]):
     args = parser.parse_args(args)
     try:
         return args.command(vars(args))
-    except SchemaValidationError:
-        # Message was already logged; skip the traceback for user input errors.
-        sys.exit(1)
-    except Exception:
+    except Exception as e:
+        # The schema module is slow to import, and can only have raised the
+        # error if it was imported.
+        schema = sys.modules.get("taskgraph.util.schema")
+        if schema and isinstance(e, schema.SchemaValidationError):
+            # Message was already logged; skip the traceback for user input
+            # errors.
+            sys.exit(1)
         traceback.print_exc()
         sys.exit(1)
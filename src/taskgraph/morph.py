@@ -23,9 +23,9 @@ import re
 
 from slugid import nice as slugid
 
-from .graph import Graph
 from .task import Task
-from .taskgraph import TaskGraph
+from .taskgraph import TaskGraphBuilder
+from .util import trace
 from .util.workertypes import get_worker_type
 
 here = os.path.abspath(os.path.dirname(__file__))
@@ -42,17 +42,15 @@ def register_morph(func):
 
 def amend_taskgraph(taskgraph, label_to_taskid, to_add):
     """Add the given tasks to the taskgraph, returning a new taskgraph"""
-    new_tasks = taskgraph.tasks.copy()
-    new_edges = set(taskgraph.graph.edges)
+    builder = TaskGraphBuilder(taskgraph)
     for task in to_add:
-        new_tasks[task.task_id] = task
+        builder.add_task(task, key=task.task_id)
         assert task.label not in label_to_taskid
         label_to_taskid[task.label] = task.task_id
         for depname, dep in task.dependencies.items():
-            new_edges.add((task.task_id, dep, depname))
+            builder.add_edge(task.task_id, dep, depname)
 
-    taskgraph = TaskGraph(new_tasks, Graph(frozenset(new_tasks), new_edges))
-    return taskgraph, label_to_taskid
+    return builder.freeze(), label_to_taskid
 
 
 def derive_index_task(task, taskgraph, label_to_taskid, parameters, graph_config):
@@ -254,7 +252,8 @@ def add_code_review_task(taskgraph, label_to_taskid, parameters, graph_config):
 def morph(taskgraph, label_to_taskid, parameters, graph_config):
     """Apply all morphs"""
     for m in registered_morphs:
-        taskgraph, label_to_taskid = m(
-            taskgraph, label_to_taskid, parameters, graph_config
-        )
+        with trace.span(m.__name__, cat="morphs"):
+            taskgraph, label_to_taskid = m(
+                taskgraph, label_to_taskid, parameters, graph_config
+            )
     return taskgraph, label_to_taskid
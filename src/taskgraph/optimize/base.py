@@ -15,18 +15,27 @@ import datetime
 import logging
 from abc import ABCMeta, abstractmethod
 from collections import defaultdict
+from concurrent import futures
 
 from slugid import nice as slugid
 
-from taskgraph.graph import Graph
-from taskgraph.taskgraph import TaskGraph
+from taskgraph.taskgraph import TaskGraph, TaskGraphBuilder
+from taskgraph.util import trace
 from taskgraph.util.parameterization import resolve_task_references, resolve_timestamps
 from taskgraph.util.python_path import import_sibling_modules
-from taskgraph.util.taskcluster import find_task_id_batched, status_task_batched
+from taskgraph.util.taskcluster import (
+    CONCURRENCY,
+    find_task_id_batched,
+    status_task_batched,
+)
 
 logger = logging.getLogger("optimization")
 registry = {}
 
+# The number of index paths looked up by each findTasksAtIndex call. Chunks
+# are looked up concurrently, and each fits in a page of results.
+INDEX_CHUNK_SIZE = 1000
+
 
 def register_strategy(name, args=(), kwargs=None):
     kwargs = kwargs or {}
@@ -68,13 +77,14 @@ def optimize_task_graph(
 
     optimizations = _get_optimizations(target_task_graph, strategies)
 
-    removed_tasks = remove_tasks(
-        target_task_graph=target_task_graph,
-        requested_tasks=requested_tasks,
-        optimizations=optimizations,
-        params=params,
-        do_not_optimize=do_not_optimize,
-    )
+    with trace.span("remove_tasks", cat="optimize"):
+        removed_tasks = remove_tasks(
+            target_task_graph=target_task_graph,
+            requested_tasks=requested_tasks,
+            optimizations=optimizations,
+            params=params,
+            do_not_optimize=do_not_optimize,
+        )
 
     # Gather each relevant task's index
     indexes = set()
@@ -89,32 +99,63 @@ def optimize_task_graph(
     taskid_to_status = {}
     if indexes:
         # Find their respective status using TC index/queue batch APIs
-        indexes = list(indexes)
-        index_to_taskid = find_task_id_batched(indexes)
-        taskid_to_status = status_task_batched(list(index_to_taskid.values()))
-
-    replaced_tasks = replace_tasks(
-        target_task_graph=target_task_graph,
-        optimizations=optimizations,
-        params=params,
-        do_not_optimize=do_not_optimize,
-        label_to_taskid=label_to_taskid,
-        existing_tasks=existing_tasks,
-        removed_tasks=removed_tasks,
-        index_to_taskid=index_to_taskid,
-        taskid_to_status=taskid_to_status,
-    )
+        with trace.span("lookup_indexes", cat="optimize", indexes=len(indexes)):
+            index_to_taskid, taskid_to_status = _lookup_indexes(indexes)
+
+    with trace.span("replace_tasks", cat="optimize"):
+        replaced_tasks = replace_tasks(
+            target_task_graph=target_task_graph,
+            optimizations=optimizations,
+            params=params,
+            do_not_optimize=do_not_optimize,
+            label_to_taskid=label_to_taskid,
+            existing_tasks=existing_tasks,
+            removed_tasks=removed_tasks,
+            index_to_taskid=index_to_taskid,
+            taskid_to_status=taskid_to_status,
+        )
 
-    return (
-        get_subgraph(
+    with trace.span("get_subgraph", cat="optimize"):
+        subgraph = get_subgraph(
             target_task_graph,
             removed_tasks,
             replaced_tasks,
             label_to_taskid,
             decision_task_id,
-        ),
-        label_to_taskid,
-    )
+        )
+    return subgraph, label_to_taskid
+
+
+def _lookup_indexes(indexes):
+    """Find the tasks indexed at `indexes`, and their statuses.
+
+    Indexes are looked up in chunks of `INDEX_CHUNK_SIZE`, concurrently, and
+    the statuses of the tasks found for a chunk are looked up as soon as
+    that chunk is, rather than once all indexes are.
+
+    Returns:
+        tuple: A dict mapping each index path that exists to its task id,
+            and a dict mapping each of those task ids to its status.
+    """
+    indexes = sorted(indexes)
+    chunks = [
+        indexes[i : i + INDEX_CHUNK_SIZE]
+        for i in range(0, len(indexes), INDEX_CHUNK_SIZE)
+    ]
+
+    def lookup(chunk):
+        index_to_taskid = find_task_id_batched(chunk)
+        task_ids = list(dict.fromkeys(index_to_taskid.values()))
+        taskid_to_status = status_task_batched(task_ids) if task_ids else {}
+        return index_to_taskid, taskid_to_status
+
+    index_to_taskid = {}
+    taskid_to_status = {}
+    with futures.ThreadPoolExecutor(min(CONCURRENCY, len(chunks))) as e:
+        for chunk_taskids, chunk_statuses in e.map(lookup, chunks):
+            index_to_taskid.update(chunk_taskids)
+            taskid_to_status.update(chunk_statuses)
+    return index_to_taskid, taskid_to_status
 
 
 def _get_optimizations(target_task_graph, strategies):
@@ -385,7 +426,7 @@ def get_subgraph(
     # check for any dependency edges from included to removed tasks
     bad_edges = [
         (l, r, n)
-        for l, r, n in target_task_graph.graph.edges
+        for l, r, n in target_task_graph.graph.iter_edges()
         if l not in removed_tasks and r in removed_tasks
     ]
     if bad_edges:
@@ -398,14 +439,16 @@ def get_subgraph(
     # fill in label_to_taskid for anything not removed or replaced
     assert replaced_tasks <= set(label_to_taskid)
     for label in sorted(
-        target_task_graph.graph.nodes - removed_tasks - set(label_to_taskid)
+        label
+        for label in target_task_graph.tasks
+        if label not in removed_tasks and label not in label_to_taskid
     ):
         task_id = slugid()
         assert isinstance(task_id, str)
         label_to_taskid[label] = task_id
 
     # resolve labels to taskIds and populate task['dependencies']
-    tasks_by_taskid = {}
+    builder = TaskGraphBuilder()
     named_links_dict = target_task_graph.graph.named_links_dict()
     omit = removed_tasks | replaced_tasks
     for label, task in target_task_graph.tasks.items():
@@ -438,24 +481,18 @@ def get_subgraph(
         deps = task.task.setdefault("dependencies", [])
         deps.extend(sorted(named_task_dependencies.values()))
         task.dependencies.update(named_task_dependencies)
-        tasks_by_taskid[task.task_id] = task
-
-    # resolve edges to taskIds
-    edges_by_taskid = (
-        (label_to_taskid.get(left), label_to_taskid.get(right), name)
-        for (left, right, name) in target_task_graph.graph.edges
-    )
-    # ..and drop edges that are no longer entirely in the task graph
-    #   (note that this omits edges to replaced tasks, but they are still in task.dependnecies)
-    edges_by_taskid = {
-        (left, right, name)
-        for (left, right, name) in edges_by_taskid
-        if left in tasks_by_taskid and right in tasks_by_taskid
-    }
-
-    return TaskGraph(
-        tasks_by_taskid, Graph(frozenset(tasks_by_taskid), edges_by_taskid)
-    )
+        builder.add_task(task, key=task.task_id)
+
+    # resolve edges to taskIds, dropping edges that are no longer entirely in
+    # the task graph (note that this omits edges to replaced tasks, but they
+    # are still in task.dependencies)
+    tasks_by_taskid = builder.tasks
+    for left, right, name in target_task_graph.graph.iter_edges():
+        left, right = label_to_taskid.get(left), label_to_taskid.get(right)
+        if left in tasks_by_taskid and right in tasks_by_taskid:
+            builder.add_edge(left, right, name)
+
+    return builder.freeze()
 
 
 @register_strategy("never")
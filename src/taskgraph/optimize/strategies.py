@@ -1,8 +1,6 @@
 import logging
 from datetime import datetime
 
-from taskcluster.exceptions import TaskclusterRestFailure
-
 from taskgraph.optimize.base import OptimizationStrategy, register_strategy
 from taskgraph.util.path import match as match_path
 from taskgraph.util.taskcluster import find_task_id, status_task
@@ -26,6 +24,8 @@ class IndexSearch(OptimizationStrategy):
 
     def should_replace_task(self, task, params, deadline, arg):
         "Look for a task with one of the given index paths"
+        from taskcluster.exceptions import TaskclusterRestFailure  # noqa: PLC0415
+
         batched = False
         # Appease static checker that doesn't understand that this is not needed
         label_to_taskid = {}
@@ -11,7 +11,6 @@ from io import BytesIO
 from pprint import pformat
 from subprocess import CalledProcessError
 from typing import Optional, Union
-from unittest.mock import Mock
 from urllib.parse import urlparse
 from urllib.request import urlopen
 
@@ -99,6 +98,8 @@ def _get_defaults(repo_root=None):
         tool = repo.tool
         files_changed = repo.get_changed_files("AM")
     except (RuntimeError, CalledProcessError):
+        from unittest.mock import Mock  # noqa: PLC0415
+
         # Use fake values if no repo is detected or git refuses to operate.
         repo = Mock()
         repo.get_url.return_value = ""
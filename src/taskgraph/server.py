@@ -0,0 +1,402 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Keep task graph generation warm between invocations of ``taskgraph``.
+
+``taskgraph serve`` starts a server listening on a Unix socket specific to the
+Taskgraph root. While it is running, graph commands such as ``taskgraph full``
+send their options to the server instead of generating the graph themselves,
+so they don't pay for interpreter startup, imports and regeneration.
+
+The server watches the files under the Taskgraph root and any parameter files
+it was asked to use, checking them more rarely the longer they stay unchanged.
+When a request arrives, it also checks the state of the repository that
+default parameters are derived from, resolved against the working directory
+of the client: its branch, its head revision and its modified files. When none
+of them changed, graphs are served from the generators of previous requests.
+Otherwise the affected modules are unloaded, along with what they registered,
+and graphs are regenerated, with the tasks of each kind kept in a kind cache
+so that only the kinds whose inputs changed are loaded again.
+"""
+
+import dataclasses
+import hashlib
+import logging
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import traceback
+from subprocess import CalledProcessError
+
+import appdirs
+
+from taskgraph.util import json
+from taskgraph.util.kind_cache import CACHE_DIR_ENV, CACHE_ENV
+
+logger = logging.getLogger(__name__)
+
+# How often (in seconds) to check for changed files between requests. The
+# interval doubles each time nothing changed, up to `MAX_WATCH_INTERVAL`.
+WATCH_INTERVAL = 1.0
+MAX_WATCH_INTERVAL = 30.0
+
+# Options of graph commands that affect the graph the server sends back.
+REQUEST_OPTIONS = (
+    "graph_attr",
+    "parameters",
+    "target_kinds",
+    "tasks_regex",
+    "exclude_keys",
+    "format",
+    "fast",
+)
+
+
+def socket_path(root):
+    """Return the path of the socket the server for `root` listens on."""
+    root = os.path.abspath(root or "taskcluster")
+    digest = hashlib.sha256(root.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(appdirs.user_cache_dir("taskgraph"), f"server-{digest}.sock")
+
+
+def file_states(paths):
+    """Return the modification time and size of every file under `paths`."""
+    states = {}
+    for path in paths:
+        if os.path.isfile(path):
+            st = os.stat(path)
+            states[path] = (st.st_mtime_ns, st.st_size)
+            continue
+
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [
+                d for d in dirnames if d != "__pycache__" and not d.startswith(".")
+            ]
+            for name in filenames:
+                if name.endswith(".pyc"):
+                    continue
+                filepath = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(filepath)
+                except FileNotFoundError:
+                    continue
+                states[filepath] = (st.st_mtime_ns, st.st_size)
+    return states
+
+
+def vcs_state(path):
+    """Return the state of the repository at `path` that default parameters
+    are derived from, or ``None`` outside a repository.
+
+    Returns:
+        tuple: The branch, the head revision, and the state of each modified
+        file, as returned by `file_states`.
+    """
+    from taskgraph.util.vcs import get_repository  # noqa: PLC0415
+
+    try:
+        repo = get_repository(path)
+        changed = [os.path.join(repo.path, p) for p in repo.get_changed_files("AM")]
+        return (repo.branch, repo.head_rev, file_states(changed))
+    except (RuntimeError, CalledProcessError):
+        return None
+
+
+def _vcs_changes(path, old, new):
+    """Return the paths of the files that differ between two `vcs_state` of
+    the repository at `path`."""
+    from taskgraph.util.vcs import get_repository  # noqa: PLC0415
+
+    old_files = old[2] if old else {}
+    new_files = new[2] if new else {}
+    changed = {
+        path
+        for path in set(old_files) | set(new_files)
+        if old_files.get(path) != new_files.get(path)
+    }
+    if old and new and old[1] != new[1]:
+        try:
+            repo = get_repository(path)
+            changed.update(
+                os.path.join(repo.path, p)
+                for p in repo.get_changed_files("AMD", rev=new[1], base=old[1])
+            )
+        except (RuntimeError, CalledProcessError):
+            pass
+    return changed
+
+
+def _defined_in(value, modules):
+    """Return whether `value`, an entry of a registry, comes from one of
+    `modules`."""
+    if isinstance(value, tuple):
+        return any(_defined_in(v, modules) for v in value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return any(
+            _defined_in(getattr(value, f.name), modules)
+            for f in dataclasses.fields(value)
+        )
+    return getattr(value, "__module__", None) in modules
+
+
+def _unregister(modules):
+    """Remove the entries `modules` added to Taskgraph's registries, which
+    importing them again will add back."""
+    registries = []
+
+    def add(module_name, *attrs):
+        # Modules that were never imported have nothing registered.
+        module = sys.modules.get(module_name)
+        if module:
+            registries.extend(getattr(module, attr) for attr in attrs)
+
+    add("taskgraph.morph", "registered_morphs")
+    add("taskgraph.parameters", "defaults_functions", "_parameter_extensions")
+    add("taskgraph.filter_tasks", "filter_task_functions")
+    add("taskgraph.target_tasks", "_target_task_methods")
+    add("taskgraph.optimize.base", "registry")
+    add("taskgraph.transforms.task", "payload_builders", "index_builders")
+    add("taskgraph.transforms.fetch", "fetch_builders")
+    if verify := sys.modules.get("taskgraph.util.verify"):
+        registries.extend(verify.verifications._verifications.values())
+    if run := sys.modules.get("taskgraph.transforms.run"):
+        registries.extend(run.registry.values())
+    if actions := sys.modules.get("taskgraph.actions.registry"):
+        actions.actions[:] = [
+            action
+            for action in actions.actions
+            if not _defined_in(actions.callbacks.get(action.cb_name), modules)
+        ]
+        registries.append(actions.callbacks)
+
+    for registry in registries:
+        if isinstance(registry, list):
+            registry[:] = [v for v in registry if not _defined_in(v, modules)]
+        else:
+            for key in [k for k, v in registry.items() if _defined_in(v, modules)]:
+                del registry[key]
+
+
+class TaskGraphServer(socketserver.UnixStreamServer):
+    """Serve task graphs generated from `root` over the Unix socket at
+    `path`.
+
+    Args:
+        root (str): The Taskgraph root directory.
+        path (str): Path of the socket to listen on.
+    """
+
+    def __init__(self, root, path):
+        self.root = os.path.abspath(root or "taskcluster")
+        self.timeout = WATCH_INTERVAL
+        self._watched = {self.root}
+        self._files = file_states(self._watched)
+        # Checking the state of the repository runs VCS commands, so it is
+        # only done when a request arrives, from the client's directory.
+        self._cwd = None
+        self._vcs = None
+        self._generators = {}
+        self._last_request = None
+        super().__init__(path, RequestHandler)
+
+    def _check_files(self, cwd=None):
+        """Drop stale generators and modules if any watched file, or the
+        state of the repository at `cwd`, changed.
+
+        Args:
+            cwd (str): The working directory of the client. The state of the
+                repository is left unchecked when ``None``.
+
+        Returns:
+            bool: Whether anything changed.
+        """
+        files = file_states(self._watched)
+        vcs = self._vcs
+        if cwd is not None:
+            vcs = vcs_state(cwd)
+            if self._cwd is None:
+                # Nothing was generated yet to compare against.
+                self._cwd, self._vcs = cwd, vcs
+        if files == self._files and vcs == self._vcs:
+            return False
+
+        changed = {
+            path
+            for path in set(files) | set(self._files)
+            if files.get(path) != self._files.get(path)
+        }
+        changed |= _vcs_changes(cwd or self._cwd, self._vcs, vcs)
+        self._files = files
+        self._vcs = vcs
+        self._cwd = cwd or self._cwd
+        logger.info(f"{len(changed)} file(s) changed, regenerating")
+
+        if any(path.endswith(".py") for path in changed):
+            # Re-import the project's modules, and modules changed elsewhere
+            # in the repository, so changes to transforms, loaders and their
+            # helpers are picked up.
+            prefix = self.root + os.sep
+            unloaded = set()
+            for name, module in list(sys.modules.items()):
+                path = getattr(module, "__file__", None)
+                if not path:
+                    continue
+                path = os.path.abspath(path)
+                if path.startswith(prefix) or path in changed:
+                    del sys.modules[name]
+                    unloaded.add(name)
+            _unregister(unloaded)
+
+        if hash_module := sys.modules.get("taskgraph.util.hash"):
+            # Files are only hashed once per process.
+            hash_module.hash_path.cache_clear()
+            hash_module._find_matching_files.cache_clear()
+            hash_module._get_all_files.cache_clear()
+
+        self._generators.clear()
+        return True
+
+    def generate(self, request):
+        """Generate the graph described by `request` and format it."""
+        import taskgraph  # noqa: PLC0415
+        from taskgraph import main  # noqa: PLC0415
+        from taskgraph.parameters import parameters_loader  # noqa: PLC0415
+        from taskgraph.taskgraph import TaskGraph  # noqa: PLC0415
+
+        spec = request.get("parameters")
+        if spec and os.path.isfile(spec) and spec not in self._watched:
+            self._watched.add(spec)
+            self._files = file_states(self._watched)
+        # Resolve paths and the repository like the client would.
+        cwd = request.get("cwd") or os.getcwd()
+        os.chdir(cwd)
+        self._check_files(cwd)
+        self._last_request = request
+        self.timeout = WATCH_INTERVAL
+
+        target_kinds = request.get("target_kinds") or []
+        fast = bool(request.get("fast"))
+        key = (cwd, spec, tuple(target_kinds), fast)
+        taskgraph.fast = fast
+        tgg = self._generators.get(key)
+        if not tgg:
+            parameters = parameters_loader(
+                spec, strict=False, overrides={"target-kinds": target_kinds}
+            )
+            tgg = main.get_taskgraph_generator(self.root, parameters)
+            self._generators[key] = tgg
+
+        try:
+            tg = getattr(tgg, request["graph_attr"])
+        except Exception:
+            # The generator can't be resumed after an error.
+            del self._generators[key]
+            raise
+        # Filtering may modify tasks, so don't let it touch the generator's.
+        tg = TaskGraph(dict(tg.tasks), tg.graph)
+        tg = main.get_filtered_taskgraph(
+            tg, request.get("tasks_regex"), request.get("exclude_keys")
+        )
+        return main.FORMAT_METHODS[request.get("format") or "labels"](tg)
+
+    def handle_timeout(self):
+        # Regenerate the last requested graph as soon as files change, so it
+        # is ready by the time it is requested again.
+        if not self._last_request:
+            return
+        if not self._check_files():
+            self.timeout = min(self.timeout * 2, MAX_WATCH_INTERVAL)
+            return
+        try:
+            self.generate(self._last_request)
+        except Exception:
+            logger.exception("Error regenerating task graph")
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        try:
+            response = {"returncode": 0, "output": self.server.generate(request)}  # type: ignore
+        except Exception:
+            response = {"returncode": 1, "error": traceback.format_exc()}
+            logger.error(response["error"])
+        self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+
+
+def request_graph(root, options):
+    """Ask the server for `root` to generate a graph.
+
+    Args:
+        root (str): The Taskgraph root directory.
+        options (dict): Options of the graph command.
+
+    Returns:
+        dict: The server's response, with a ``returncode`` and either the
+        formatted graph as ``output`` or a traceback as ``error``. ``None`` if
+        no server is running.
+    """
+    path = socket_path(root)
+    if not hasattr(socket, "AF_UNIX") or not os.path.exists(path):
+        return None
+
+    request = {key: options.get(key) for key in REQUEST_OPTIONS}
+    request["cwd"] = os.getcwd()
+    spec = request["parameters"]
+    if spec and os.path.exists(spec):
+        request["parameters"] = os.path.abspath(spec)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            # The server is no longer running.
+            return None
+        with sock.makefile("rwb") as fh:
+            fh.write((json.dumps(request) + "\n").encode("utf-8"))
+            fh.flush()
+            return json.loads(fh.readline())
+
+
+def serve(root):
+    """Serve task graphs for `root` until interrupted."""
+    if not hasattr(socket, "AF_UNIX"):
+        print("abort: taskgraph serve requires Unix sockets", file=sys.stderr)
+        return 1
+
+    path = socket_path(root)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        with sock:
+            try:
+                sock.connect(path)
+            except OSError:
+                # Left behind by a server that didn't shut down cleanly.
+                os.remove(path)
+            else:
+                print(
+                    f"abort: a server is already listening on {path}", file=sys.stderr
+                )
+                return 1
+
+    with tempfile.TemporaryDirectory(prefix="taskgraph-kinds-") as cache_dir:
+        # Only regenerate the kinds affected by a change.
+        os.environ.setdefault(CACHE_ENV, "1")
+        os.environ.setdefault(CACHE_DIR_ENV, cache_dir)
+
+        with TaskGraphServer(root, path) as server:
+            logger.info(f"Serving task graphs for {server.root} on {path}")
+            try:
+                while True:
+                    server.handle_request()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                os.remove(path)
+    return 0
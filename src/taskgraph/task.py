@@ -2,11 +2,33 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-from dataclasses import dataclass, field
+import copy
+import sys
 from typing import Any, Union
 
+_FIELDS = (
+    "kind",
+    "label",
+    "attributes",
+    "task",
+    "description",
+    "task_id",
+    "optimization",
+    "dependencies",
+    "soft_dependencies",
+    "if_dependencies",
+)
+
+
+def _intern_keys(d):
+    """Replace the string keys of `d` by their interned copy, in place."""
+    if all(sys.intern(k) is k for k in d if type(k) is str):
+        return
+    items = list(dict.items(d))
+    dict.clear(d)
+    dict.update(d, ((sys.intern(k) if type(k) is str else k, v) for k, v in items))
+
 
-@dataclass
 class Task:
     """
     Representation of a task in a TaskGraph.  Each Task has, at creation:
@@ -29,21 +51,74 @@ class Task:
 
     This class is just a convenience wrapper for the data type and managing
     display, comparison, serialization, etc. It has no functionality of its own.
+
+    Graphs hold many tasks, so tasks are slotted, and their kind and the keys
+    of their attributes are interned, as they are the same for many tasks.
     """
 
+    __slots__ = _FIELDS
+
     kind: str
     label: str
     attributes: dict
     task: dict
-    description: str = ""
-    task_id: Union[str, None] = field(default=None, init=False)
-    optimization: Union[dict[str, Any], None] = field(default=None)
-    dependencies: dict = field(default_factory=dict)
-    soft_dependencies: list = field(default_factory=list)
-    if_dependencies: list = field(default_factory=list)
-
-    def __post_init__(self):
-        self.attributes["kind"] = self.kind
+    description: str
+    task_id: Union[str, None]
+    optimization: Union[dict[str, Any], None]
+    dependencies: dict
+    soft_dependencies: list
+    if_dependencies: list
+
+    def __init__(
+        self,
+        kind,
+        label,
+        attributes,
+        task,
+        description="",
+        optimization=None,
+        dependencies=None,
+        soft_dependencies=None,
+        if_dependencies=None,
+    ):
+        self.kind = sys.intern(kind)
+        self.label = label
+        self.attributes = attributes
+        self.task = task
+        self.description = description
+        self.task_id = None
+        self.optimization = optimization
+        self.dependencies = {} if dependencies is None else dependencies
+        self.soft_dependencies = [] if soft_dependencies is None else soft_dependencies
+        self.if_dependencies = [] if if_dependencies is None else if_dependencies
+
+        attributes["kind"] = self.kind
+        _intern_keys(attributes)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in _FIELDS)
+
+    __hash__ = None  # type: ignore
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in _FIELDS)
+        return f"{self.__class__.__qualname__}({fields})"
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in _FIELDS}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+
+    def __deepcopy__(self, memo):
+        rv = self.__class__.__new__(self.__class__)
+        memo[id(self)] = rv
+        for name in _FIELDS:
+            object.__setattr__(rv, name, copy.deepcopy(getattr(self, name), memo))
+        return rv
 
     def to_json(self):
         rv = {
@@ -4,8 +4,9 @@
 
 from dataclasses import dataclass
 
-from .graph import Graph
+from .graph import CompactGraph, Graph, GraphBuilder
 from .task import Task
+from .util import json
 
 
 @dataclass(frozen=True)
@@ -24,7 +25,15 @@ class TaskGraph:
     graph: Graph
 
     def __post_init__(self):
-        assert set(self.tasks) == self.graph.nodes
+        if isinstance(self.graph, CompactGraph):
+            # Check against the label index, rather than building the set of
+            # nodes the compact graph avoids.
+            index = self.graph._index
+            assert len(self.tasks) == len(index)
+            assert all(label in index for label in self.tasks)
+        else:
+            # Compare the keys view rather than building a set of them.
+            assert self.tasks.keys() == self.graph.nodes
 
     def for_each_task(self, f, *args, **kwargs):
         for task_label in self.graph.visit_postorder():
@@ -50,21 +59,86 @@ class TaskGraph:
             tasks[key] = self.tasks[key].to_json()
         return tasks
 
+    def write_json(self, fh):
+        """Write the JSON representation of the task graph to `fh`, as
+        ``json.dump(self.to_json(), fh, sort_keys=True, indent=2)`` would,
+        one task at a time."""
+        json.dump_items(
+            ((key, self.tasks[key].to_json()) for key in sorted(self.tasks)), fh
+        )
+
     @classmethod
-    def from_json(cls, tasks_dict):
+    def from_json(cls, tasks_dict, compact=False):
         """
         This code is used to generate the a TaskGraph using a dictionary
         which is representative of the TaskGraph.
+
+        If `compact` is true, the graph is stored as a `CompactGraph`, which
+        saves memory for large graphs that are only traversed.
+
+        `tasks_dict` may also be the bytes of a JSON or binary (see
+        `taskgraph.util.packed`) task graph artifact.
         """
-        tasks = {}
-        edges = set()
+        if isinstance(tasks_dict, (bytes, bytearray, memoryview)):
+            from .util import packed  # noqa: PLC0415
+
+            if packed.is_packed(tasks_dict):
+                tasks_dict = packed.loads(tasks_dict)
+            else:
+                tasks_dict = json.loads(bytes(tasks_dict))
+        builder = TaskGraphBuilder(cls=cls)
         for key, value in tasks_dict.items():
-            tasks[key] = Task.from_json(value)
+            task = Task.from_json(value)
             if "task_id" in value:
-                tasks[key].task_id = value["task_id"]
+                task.task_id = value["task_id"]
+            builder.add_task(task, key=key)
             for depname, dep in value["dependencies"].items():
                 # Task filtering can cause dependencies to be removed from the graph.
                 if dep in tasks_dict:
-                    edges.add((key, dep, depname))
-        task_graph = cls(tasks, Graph(frozenset(tasks), edges))
-        return tasks, task_graph
+                    builder.add_edge(key, dep, depname)
+        task_graph = builder.freeze(compact=compact)
+        return task_graph.tasks, task_graph
+
+
+class TaskGraphBuilder(GraphBuilder):
+    """Collect the tasks and edges of a task graph, then freeze them into a
+    `TaskGraph` in one step.
+
+    The nodes of the graph are the keys of its tasks. If `taskgraph` is
+    given, tasks and edges are added to those of `taskgraph`. Its tasks and
+    sets are copied at most once, and only if something was added to them.
+
+    Args:
+        taskgraph (TaskGraph): The task graph to add to, if any.
+        cls (type): The `TaskGraph` class to build.
+    """
+
+    def __init__(self, taskgraph=None, cls=TaskGraph):
+        super().__init__(taskgraph and taskgraph.graph)
+        self.taskgraph = taskgraph
+        self.cls = cls
+        # Only copied once a task is added.
+        self._tasks = None if taskgraph else {}
+
+    @property
+    def tasks(self):
+        "The tasks added so far, by key"
+        if self._tasks is None:
+            return self.taskgraph.tasks  # type: ignore
+        return self._tasks
+
+    def add_task(self, task, key=None):
+        """Add `task`, keyed by its label unless `key` is given."""
+        if self._tasks is None:
+            self._tasks = dict(self.taskgraph.tasks)  # type: ignore
+        self._tasks[task.label if key is None else key] = task
+
+    def _frozen_nodes(self):
+        if self._tasks is None:
+            return self.graph.nodes  # type: ignore
+        return frozenset(self._tasks)
+
+    def freeze(self, compact=False):
+        """Return the built task graph, with its graph stored as a
+        `CompactGraph` if `compact` is true."""
+        return self.cls(self.tasks, super().freeze(compact=compact))
@@ -1,9 +1,19 @@
 from typing import Any
 
 from taskgraph.task import Task
+from taskgraph.util.intern import CowDict, CowList, SharedDict, SharedList
 from taskgraph.util.readonlydict import ReadOnlyDict
 
-immutable_types = {int, float, bool, str, type(None), ReadOnlyDict}
+immutable_types = {
+    int,
+    float,
+    bool,
+    str,
+    type(None),
+    ReadOnlyDict,
+    SharedDict,
+    SharedList,
+}
 
 
 def deepcopy(obj: Any) -> Any:
@@ -29,19 +39,23 @@ def deepcopy(obj: Any) -> Any:
         return {k: deepcopy(v) for k, v in obj.items()}
     if ty is list:
         return [deepcopy(elt) for elt in obj]
+    if ty is CowDict:
+        return CowDict({k: deepcopy(v) for k, v in dict.items(obj)})
+    if ty is CowList:
+        return CowList([deepcopy(elt) for elt in list.__iter__(obj)])
     if ty is Task:
-        task = Task(
-            kind=deepcopy(obj.kind),
-            label=deepcopy(obj.label),
-            attributes=deepcopy(obj.attributes),
-            task=deepcopy(obj.task),
-            description=deepcopy(obj.description),
-            optimization=deepcopy(obj.optimization),
-            dependencies=deepcopy(obj.dependencies),
-            soft_dependencies=deepcopy(obj.soft_dependencies),
-            if_dependencies=deepcopy(obj.if_dependencies),
-        )
-        if obj.task_id:
-            task.task_id = obj.task_id
+        # The attributes of the copy already contain the kind, with interned
+        # keys, so skip `Task.__init__`.
+        task = Task.__new__(Task)
+        task.kind = obj.kind
+        task.label = obj.label
+        task.attributes = deepcopy(obj.attributes)
+        task.task = deepcopy(obj.task)
+        task.description = obj.description
+        task.task_id = obj.task_id
+        task.optimization = deepcopy(obj.optimization)
+        task.dependencies = deepcopy(obj.dependencies)
+        task.soft_dependencies = deepcopy(obj.soft_dependencies)
+        task.if_dependencies = deepcopy(obj.if_dependencies)
         return task
     raise NotImplementedError(f"copying '{ty}' from '{obj}'")
@@ -0,0 +1,157 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Compare the structure of two task graphs.
+
+Rather than diffing the text of two serialized graphs, which is slow for
+large graphs and hard to read when tasks move around, the tasks of each graph
+are matched by label. Tasks whose JSON representations compare equal are
+skipped without walking them field by field, so the cost of a diff grows
+with the size of the graphs and the number of changed fields only. Changed fields are reported as JSON pointers (RFC 6901) into the JSON
+representation of the task, e.g. ``/task/payload/env/FOO``.
+"""
+
+from dataclasses import dataclass, field
+
+
+class _Missing:
+    def __repr__(self):
+        return "MISSING"
+
+
+#: Stands in for the value of a field that only exists in one of the graphs,
+#: so that a removed field can be told apart from one set to ``None``.
+MISSING = _Missing()
+
+
+def _escape(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _changed_paths(base, cur, path=""):
+    """Yield the JSON pointer, old and new value of each difference between
+    `base` and `cur`."""
+    if isinstance(base, dict) and isinstance(cur, dict):
+        for key in sorted(base.keys() | cur.keys(), key=str):
+            yield from _changed_paths(
+                base.get(key, MISSING),
+                cur.get(key, MISSING),
+                f"{path}/{_escape(key)}",
+            )
+    elif isinstance(base, list) and isinstance(cur, list):
+        for i in range(max(len(base), len(cur))):
+            yield from _changed_paths(
+                base[i] if i < len(base) else MISSING,
+                cur[i] if i < len(cur) else MISSING,
+                f"{path}/{i}",
+            )
+    elif base != cur or type(base) is not type(cur):
+        yield path, base, cur
+
+
+@dataclass
+class TaskGraphDiff:
+    """The differences between a base and a current task graph.
+
+    Tasks are identified by the keys of their graph, usually labels.
+    """
+
+    #: Tasks only in the current graph.
+    added: list = field(default_factory=list)
+    #: Tasks only in the base graph.
+    removed: list = field(default_factory=list)
+    #: Edges, as ``(left, right, name)`` tuples, only in the current graph.
+    added_edges: list = field(default_factory=list)
+    #: Edges only in the base graph.
+    removed_edges: list = field(default_factory=list)
+    #: Maps the tasks in both graphs whose content differs to a dict mapping
+    #: the JSON pointer of each changed field to its base and current value.
+    #: Fields missing from one of the graphs have the value :data:`MISSING`
+    #: there.
+    changed: dict = field(default_factory=dict)
+    #: The number of tasks that are identical in both graphs.
+    unchanged: int = 0
+
+    def __bool__(self):
+        return bool(
+            self.added
+            or self.removed
+            or self.added_edges
+            or self.removed_edges
+            or self.changed
+        )
+
+    def to_json(self):
+        return {
+            "added": self.added,
+            "removed": self.removed,
+            "edges": {
+                "added": [list(edge) for edge in self.added_edges],
+                "removed": [list(edge) for edge in self.removed_edges],
+            },
+            "changed": {
+                label: {
+                    pointer: {
+                        side: value
+                        for side, value in (("base", base), ("current", cur))
+                        if value is not MISSING
+                    }
+                    for pointer, (base, cur) in fields.items()
+                }
+                for label, fields in self.changed.items()
+            },
+            "unchanged": self.unchanged,
+        }
+
+    def summary(self):
+        """Return a short description of the differences, listing the
+        labels of added, removed and changed tasks along with the paths of
+        their changed fields."""
+        lines = [
+            f"{len(self.added)} added, {len(self.removed)} removed, "
+            f"{len(self.changed)} changed, {self.unchanged} unchanged tasks; "
+            f"{len(self.added_edges)} added, {len(self.removed_edges)} removed edges"
+        ]
+        lines.extend(f"+ {label}" for label in self.added)
+        lines.extend(f"- {label}" for label in self.removed)
+        for label, fields in self.changed.items():
+            lines.append(f"~ {label}")
+            lines.extend(f"    {pointer}" for pointer in fields)
+        lines.extend(
+            f"+ {left} -> {right} ({name})" for left, right, name in self.added_edges
+        )
+        lines.extend(
+            f"- {left} -> {right} ({name})" for left, right, name in self.removed_edges
+        )
+        return "\n".join(lines)
+
+
+def diff_taskgraphs(base, cur):
+    """Compare two task graphs.
+
+    Args:
+        base (TaskGraph): The graph to compare against.
+        cur (TaskGraph): The graph to compare.
+
+    Returns:
+        TaskGraphDiff: The differences between the graphs.
+    """
+    diff = TaskGraphDiff(
+        added=sorted(cur.tasks.keys() - base.tasks.keys()),
+        removed=sorted(base.tasks.keys() - cur.tasks.keys()),
+        added_edges=sorted(cur.graph.edges - base.graph.edges),
+        removed_edges=sorted(base.graph.edges - cur.graph.edges),
+    )
+    for label in sorted(base.tasks.keys() & cur.tasks.keys()):
+        base_json = base.tasks[label].to_json()
+        cur_json = cur.tasks[label].to_json()
+        if base_json == cur_json:
+            diff.unchanged += 1
+            continue
+        diff.changed[label] = {
+            pointer: (old, new)
+            for pointer, old, new in _changed_paths(base_json, cur_json)
+        }
+    return diff
@@ -11,6 +11,7 @@ import re
 from typing import Optional
 
 from taskgraph.util.archive import create_tar_from_files, gzip_compressor
+from taskgraph.util.kind_cache import cached_input
 
 IMAGE_DIR = os.path.join(".", "taskcluster", "docker")
 
@@ -63,6 +64,7 @@ class VoidWriter:
         pass
 
 
+@cached_input
 def generate_context_hash(topsrcdir, image_path, args=None):
     """Generates a sha256 hash for context directory used to build an image."""
 
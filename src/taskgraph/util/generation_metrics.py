@@ -0,0 +1,94 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Measure the time and memory used by each phase of graph generation.
+"""
+
+import sys
+import time
+
+from taskgraph.graph import Graph
+from taskgraph.taskgraph import TaskGraph
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+
+def _cpu_time():
+    """Return the CPU time used by this process and its finished children."""
+    if resource is None:
+        return time.process_time()
+    usage = (
+        resource.getrusage(resource.RUSAGE_SELF),
+        resource.getrusage(resource.RUSAGE_CHILDREN),
+    )
+    return sum(u.ru_utime + u.ru_stime for u in usage)
+
+
+def _peak_rss():
+    """Return the peak resident set size of this process in bytes, or
+    ``None`` if it can't be determined."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, but kilobytes elsewhere.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _graph(value):
+    if isinstance(value, TaskGraph):
+        value = value.graph
+    return value if isinstance(value, Graph) else None
+
+
+def _count(iterable):
+    return sum(1 for _ in iterable)
+
+
+class GenerationMetrics:
+    """Wall time, CPU time, peak RSS and graph sizes of each phase of a
+    ``TaskGraphGenerator``.
+
+    Graph sizes include the length of the graph's critical path, the longest
+    chain of tasks depending on each other. It needs a traversal of the
+    graph, so it is only computed once the metrics are requested.
+
+    CPU time includes processes used to load kinds in parallel. Peak RSS is
+    the peak for the whole generation up to the end of each phase, as the
+    operating system doesn't track it for shorter intervals.
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._pending = {}
+
+    def start(self):
+        """Return a token marking the start of a phase, to be passed to
+        ``record``."""
+        return time.perf_counter(), _cpu_time()
+
+    def record(self, name, value, started):
+        """Record the end of the phase `name`, which produced `value`."""
+        wall, cpu = started
+        metrics = {
+            "wall_time": time.perf_counter() - wall,
+            "cpu_time": _cpu_time() - cpu,
+            "peak_rss": _peak_rss(),
+        }
+        graph = _graph(value)
+        if graph is not None:
+            metrics["nodes"] = _count(graph.iter_nodes())
+            metrics["edges"] = _count(graph.iter_edges())
+            self._pending[name] = graph
+        self.phases[name] = metrics
+
+    def to_json(self):
+        for name, graph in self._pending.items():
+            self.phases[name]["critical_path"] = graph.critical_path_length()
+        self._pending.clear()
+        return {"phases": self.phases}
@@ -7,6 +7,7 @@ import hashlib
 import os
 
 from taskgraph.util import path as mozpath
+from taskgraph.util.kind_cache import cached_input
 from taskgraph.util.vcs import get_repository
 
 
@@ -20,6 +21,7 @@ def hash_path(path):
         return hashlib.sha256(fh.read()).hexdigest()
 
 
+@cached_input
 def hash_paths(base_path, patterns):
     """
     Give a list of path patterns, return a digest of the contents of all
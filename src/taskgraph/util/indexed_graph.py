@@ -0,0 +1,181 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Store a task graph so that parts of it can be loaded without reading all of
+it.
+
+The tasks are written as JSON Lines, one ``{"key": ..., "task": ...}`` object
+per line, in post-order so that tasks tend to be close to their
+dependencies. A separate index maps the key of each task to the byte offset
+and length of its line, and to the keys of its dependencies. Given the index,
+the tasks needed to schedule a few labels can be found without reading any
+task, then read with a handful of range requests, or from a memory map of a
+local file.
+"""
+
+import mmap
+import os
+from collections import deque
+
+from taskgraph.taskgraph import TaskGraph
+from taskgraph.util import json
+
+INDEX_VERSION = 1
+
+# Ranges separated by fewer bytes than this are read in a single request, as
+# reading a few unneeded tasks is cheaper than another round trip.
+COALESCE_GAP = 64 * 1024
+
+
+def index_path(path):
+    """Return the path of the index of the graph stored at `path`."""
+    root, _ = os.path.splitext(path)
+    return f"{root}.index.json"
+
+
+def write_indexed_graph(taskgraph, fh):
+    """Write the tasks of `taskgraph` to `fh`, a binary file, as JSON Lines.
+
+    Returns:
+        dict: The index of the written tasks, to be stored next to them.
+    """
+    tasks = {}
+    dependencies = {}
+    links = taskgraph.graph.links_dict()
+    offset = 0
+    for key in taskgraph.graph.visit_postorder():
+        line = json.dumps(
+            {"key": key, "task": taskgraph.tasks[key].to_json()}, sort_keys=True
+        )
+        data = (line + "\n").encode("utf-8")
+        fh.write(data)
+        tasks[key] = [offset, len(data)]
+        dependencies[key] = sorted(links[key])
+        offset += len(data)
+    return {"version": INDEX_VERSION, "tasks": tasks, "dependencies": dependencies}
+
+
+def _coalesce(ranges):
+    """Merge sorted ``(offset, length)`` ranges that are close together into
+    ``(start, end)`` ranges."""
+    merged = []
+    for offset, length in ranges:
+        if merged and offset - merged[-1][1] <= COALESCE_GAP:
+            merged[-1][1] = max(merged[-1][1], offset + length)
+        else:
+            merged.append([offset, offset + length])
+    return merged
+
+
+class IndexedTaskGraph:
+    """A task graph stored with `write_indexed_graph`, whose tasks are only
+    read once requested.
+
+    Args:
+        index (dict): The index returned by `write_indexed_graph`.
+        read_range (callable): Called with the start and end offsets of a
+            range of the stored tasks, returns the bytes in that range.
+    """
+
+    def __init__(self, index, read_range):
+        if index.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported graph index version {index.get('version')}")
+        self.index = index
+        self._read_range = read_range
+        self._dependents = None
+
+    @classmethod
+    def from_path(cls, path):
+        """Read the graph stored at `path` through a memory map."""
+        with open(index_path(path)) as fh:
+            index = json.load(fh)
+        with open(path, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size == 0:
+                # Empty files can't be mapped.
+                return cls(index, lambda start, end: b"")
+            data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(index, lambda start, end: data[start:end])
+
+    @classmethod
+    def from_artifact(cls, task_id, path):
+        """Read the graph stored in the artifact `path` of `task_id` with
+        range requests.
+
+        If the artifact can't be read by range, e.g. because it is stored
+        compressed, it is downloaded whole once instead.
+        """
+        from taskgraph.util.taskcluster import (  # noqa: PLC0415
+            get_artifact,
+            get_artifact_range_or_whole,
+        )
+
+        index = get_artifact(task_id, index_path(path))
+        whole = None
+
+        def read_range(start, end):
+            nonlocal whole
+            if whole is None:
+                data, ranged = get_artifact_range_or_whole(task_id, path, start, end)
+                if ranged:
+                    return data
+                whole = data
+            return whole[start:end]
+
+        return cls(index, read_range)
+
+    def __contains__(self, key):
+        return key in self.index["tasks"]
+
+    def __len__(self):
+        return len(self.index["tasks"])
+
+    def closure(self, keys, reverse=False):
+        """Return the keys of `keys` and all the tasks they depend on, or
+        with `reverse`, all the tasks depending on them.
+
+        Keys that aren't in the graph are ignored.
+        """
+        if reverse:
+            if self._dependents is None:
+                self._dependents = {key: [] for key in self.index["dependencies"]}
+                for key, deps in self.index["dependencies"].items():
+                    for dep in deps:
+                        self._dependents[dep].append(key)
+            links = self._dependents
+        else:
+            links = self.index["dependencies"]
+
+        seen = {key for key in keys if key in links}
+        queue = deque(seen)
+        while queue:
+            for link in links[queue.popleft()]:
+                if link not in seen:
+                    seen.add(link)
+                    queue.append(link)
+        return seen
+
+    def load(self, keys=None):
+        """Read tasks into a `TaskGraph`.
+
+        Args:
+            keys (iterable): The keys of the tasks to read, all of them if
+                ``None``. Dependencies of these tasks that aren't read are left
+                out of the graph's edges, so this is usually a `closure`.
+
+        Returns:
+            TaskGraph: A graph of the read tasks.
+        """
+        offsets = self.index["tasks"]
+        keys = offsets if keys is None else set(keys)
+        ranges = sorted(offsets[key] for key in keys)
+
+        tasks = {}
+        for start, end in _coalesce(ranges):
+            for line in self._read_range(start, end).splitlines():
+                entry = json.loads(line)
+                if entry["key"] in keys:
+                    tasks[entry["key"]] = entry["task"]
+        _, taskgraph = TaskGraph.from_json(tasks)
+        return taskgraph
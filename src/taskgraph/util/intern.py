@@ -0,0 +1,194 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Share identical parts of task definitions between tasks.
+
+Tasks generated from the same kind tend to carry many identical sub-trees,
+such as worker environments, caches, scopes or treeherder configuration, each
+of which is a separate copy produced by the transforms. Once all tasks are
+generated, ``intern_tasks`` replaces identical sub-trees of each task's
+``task`` and ``attributes`` with a single shared, immutable copy, and strings
+with a single shared string (hash-consing).
+
+The top level of each task's ``task`` and ``attributes`` stays private to the
+task, and is copied on write: reading a shared sub-tree from it with
+``d[key]``, ``d.get(key)``, ``d.setdefault(key)`` or ``d.pop(key)`` first
+replaces the sub-tree with a private, shallow copy, so it can be modified
+without affecting other tasks. Shared sub-trees reached any other way (e.g.
+by iterating over ``d.values()``) are read-only, and modifying them raises a
+``TypeError`` rather than silently changing other tasks.
+"""
+
+import yaml
+
+#: Enables interning the tasks of generated graphs, see `intern_tasks`.
+INTERN_ENV = "TASKGRAPH_INTERN_TASKS"
+
+_SCALARS = (int, float, bool, type(None))
+_IDENTITY = object()
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(
+        f"{type(self).__name__} is shared between tasks and can't be modified. "
+        "Access it through the task's definition to get a private copy."
+    )
+
+
+class SharedDict(dict):
+    """An immutable dict shared between tasks."""
+
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+    __ior__ = _read_only
+
+    def __copy__(self):
+        return CowDict(self)
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+class SharedList(list):
+    """An immutable list shared between tasks."""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = clear = extend = insert = pop = remove = reverse = sort = _read_only
+
+    def __copy__(self):
+        return CowList(self)
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (type(self), (list(self),))
+
+
+def _private(value):
+    """Return a private, shallow copy of `value` if it is shared."""
+    ty = type(value)
+    if ty is SharedDict:
+        return CowDict(value)
+    if ty is SharedList:
+        return CowList(value)
+    return value
+
+
+class CowDict(dict):
+    """A dict whose shared values are copied when accessed."""
+
+    def _own(self, key, value):
+        private = _private(value)
+        if private is not value:
+            dict.__setitem__(self, key, private)
+        return private
+
+    def __getitem__(self, key):
+        return self._own(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self[key]
+        dict.__setitem__(self, key, default)
+        return default
+
+    def pop(self, key, *args):
+        return _private(dict.pop(self, key, *args))
+
+    def copy(self):
+        return CowDict(self)
+
+    __copy__ = copy
+
+
+class CowList(list):
+    """A list whose shared items are copied when accessed."""
+
+    def __getitem__(self, index):
+        value = list.__getitem__(self, index)
+        if isinstance(index, slice):
+            return CowList(value)
+        private = _private(value)
+        if private is not value:
+            list.__setitem__(self, index, private)
+        return private
+
+    def pop(self, *args):
+        return _private(list.pop(self, *args))
+
+    def copy(self):
+        return CowList(self)
+
+    __copy__ = copy
+
+
+for cls in (SharedDict, CowDict):
+    yaml.SafeDumper.add_representer(cls, yaml.SafeDumper.represent_dict)
+for cls in (SharedList, CowList):
+    yaml.SafeDumper.add_representer(cls, yaml.SafeDumper.represent_list)
+
+
+class Interner:
+    """Map values to a single shared copy of each distinct value.
+
+    Equal values are only shared if their dicts have their keys in the same
+    order, so that their serialization is unchanged.
+    """
+
+    def __init__(self):
+        self._table = {}
+
+    def _key(self, kind, items):
+        # Interned strings and containers are equal if and only if they are
+        # the same object, so they are keyed by identity. Each item adds two
+        # members to the key, to tell identities and scalars apart.
+        key = [kind]
+        for item in items:
+            if type(item) in _SCALARS:
+                key += (type(item), item)
+            else:
+                key += (_IDENTITY, id(item))
+        return tuple(key)
+
+    def intern(self, value):
+        """Return the shared copy of `value`.
+
+        Dicts and lists are returned as `SharedDict` and `SharedList`. Values
+        of other types are returned unchanged.
+        """
+        table = self._table
+        if isinstance(value, str):
+            return table.setdefault(value, value)
+        if isinstance(value, dict):
+            items = [(self.intern(k), self.intern(v)) for k, v in dict.items(value)]
+            key = self._key(SharedDict, (x for item in items for x in item))
+            if key not in table:
+                table[key] = SharedDict(items)
+            return table[key]
+        if isinstance(value, list):
+            items = [self.intern(v) for v in list.__iter__(value)]
+            key = self._key(SharedList, items)
+            if key not in table:
+                table[key] = SharedList(items)
+            return table[key]
+        return value
+
+
+def intern_tasks(tasks):
+    """Share identical sub-trees of the definitions and attributes of
+    `tasks` (an iterable of `Task`)."""
+    interner = Interner()
+    for task in tasks:
+        task.task = CowDict(interner.intern(task.task))
+        task.attributes = CowDict(interner.intern(task.attributes))
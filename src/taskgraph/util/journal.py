@@ -0,0 +1,141 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Record the tasks created by a decision or action task, so that a rerun of it
+can reuse them instead of creating them again.
+
+The journal is a JSON Lines file written next to the other artifacts. Its
+first line identifies the task that created the tasks, and every
+other line holds the label and task id of a task, appended as soon as the
+task is created. Tasks are only created once their dependencies are, so
+the tasks of a journal always include their dependencies, and a rerun can
+pass them as ``existing_tasks`` to optimization. A partially written last
+line, left by a task that was killed, is ignored.
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+
+from taskgraph.util import json
+
+logger = logging.getLogger(__name__)
+
+#: Base name of journal artifacts.
+JOURNAL_NAME = "task-creation-journal"
+
+
+class TaskJournal:
+    """An append-only record of the tasks created by a task.
+
+    Args:
+        path (str): The path of the journal. Tasks recorded in an existing
+            journal of the same task are loaded, while a journal of another
+            task is overwritten.
+        task_id (str): The id of the decision or action task creating the
+            tasks.
+    """
+
+    def __init__(self, path, task_id):
+        self.path = Path(path)
+        self.task_id = task_id
+        #: Maps the label of each recorded task to its task id.
+        self.tasks = {}
+        self._task_ids = set()
+        self._lock = threading.Lock()
+        self._fh = None
+        self._read()
+
+    def _read(self):
+        try:
+            with open(self.path) as fh:
+                lines = fh.read().splitlines()
+        except FileNotFoundError:
+            return
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if header.get("taskId") != self.task_id:
+            logger.info(f"Ignoring {self.path}, which is for another task")
+            return
+
+        for line in lines[1:]:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            self.tasks[entry["label"]] = entry["taskId"]
+            self._task_ids.add(entry["taskId"])
+        if self.tasks:
+            logger.info(
+                f"Loaded {len(self.tasks)} already created tasks from {self.path}"
+            )
+
+    def __contains__(self, task_id):
+        return task_id in self._task_ids
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def record(self, task_id, label):
+        """Record that `task_id` was created for `label`."""
+        with self._lock:
+            if self._fh is None:
+                # Rewrite the loaded tasks rather than appending to them, to
+                # drop a partially written last line or another task's tasks.
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._fh = open(self.path, "w")
+                self._write({"taskId": self.task_id})
+                for recorded_label, recorded_id in self.tasks.items():
+                    self._write({"label": recorded_label, "taskId": recorded_id})
+            self._write({"label": label, "taskId": task_id})
+            self.tasks[label] = task_id
+            self._task_ids.add(task_id)
+
+    def _write(self, entry):
+        self._fh.write(json.dumps(entry) + "\n")
+        # Make the entry survive the process being killed.
+        self._fh.flush()
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+def load_journal(artifacts_dir, task_id, suffix=""):
+    """Return the journal of the tasks created by `task_id`.
+
+    The journal is read from `artifacts_dir` if an earlier run of the task
+    left it there. Otherwise, if this is a rerun of the task, it is fetched
+    from the artifacts of the previous run.
+
+    Args:
+        artifacts_dir (Path): The directory artifacts are written to.
+        task_id (str): The id of the decision or action task creating the
+            tasks.
+        suffix (str): Distinguishes the journals of several graphs created by
+            the same task.
+
+    Returns:
+        TaskJournal: The journal, to record further tasks in.
+    """
+    name = f"{JOURNAL_NAME}{suffix}.jsonl"
+    path = Path(artifacts_dir) / name
+    run_id = int(os.environ.get("RUN_ID", 0))
+    if not path.exists() and run_id > 0:
+        from taskgraph.util.taskcluster import get_artifact  # noqa: PLC0415
+
+        try:
+            data = get_artifact(task_id, f"public/{name}", run_id=run_id - 1).read()
+        except Exception as e:
+            logger.info(f"No journal from run {run_id - 1} of {task_id}: {e}")
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+    return TaskJournal(path, task_id)
@@ -19,6 +19,8 @@ import json
 from typing import TYPE_CHECKING, Any, Callable
 
 if TYPE_CHECKING:
+    from collections.abc import Iterable
+
     from _typeshed import SupportsRead, SupportsWrite
 
 try:
@@ -71,3 +73,21 @@ def dumps(
 
 def dump(obj: Any, fh: SupportsWrite[str], **kwargs) -> None:
     fh.write(dumps(obj, **kwargs))
+
+
+def dump_items(items: Iterable[tuple[str, Any]], fh: SupportsWrite[str]) -> None:
+    """Write a JSON object to `fh` one member at a time.
+
+    The output is identical to ``dump(dict(items), fh, sort_keys=True,
+    indent=2)``, without holding the whole object or its serialization in
+    memory. `items` yields ``(key, value)`` pairs, which must be sorted by key.
+    """
+    empty = True
+    for key, value in items:
+        # Serialize each member as a single-member object and strip its
+        # braces, so nested values are indented the same as in the whole
+        # object.
+        member = dumps({key: value}, sort_keys=True, indent=2)[2:-2]
+        fh.write(("{\n" if empty else ",\n") + member)
+        empty = False
+    fh.write("{}" if empty else "\n}")
@@ -0,0 +1,486 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+An opt-in, content-addressed on-disk cache of the tasks generated by each kind.
+
+When enabled (by setting ``TASKGRAPH_KIND_CACHE`` in the environment), the
+output of ``Kind.load_tasks`` is stored on disk under a key derived from:
+
+* the kind's configuration and its ``tasks-from`` files
+* the source of the kind's loader and transform modules, and of the project
+  modules they import, directly or indirectly
+* the graph configuration and the Taskgraph version
+* the tasks of the kind's upstream kinds
+
+The parameters a kind reads are recorded along with its tasks, and a cache
+entry is only used if those parameters still have the same values. This means
+changing a parameter only invalidates the kinds that actually look at it.
+
+Other files of the repository read by transforms, such as Dockerfiles or
+toolchain scripts, are handled the same way: functions hashing them are
+decorated with ``cached_input``, which records their arguments and results,
+and a cache entry is only used if they still return the same results.
+
+Loaders can read anything, such as environment variables or the state of the
+repository, and run before the cache is looked up. Only kinds whose loader is
+declared with ``cacheable_loader`` to read nothing but the inputs above are
+cached.
+"""
+
+import ast
+import contextvars
+import datetime
+import functools
+import hashlib
+import importlib
+import importlib.util
+import logging
+import os
+import pickle
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Optional
+
+import appdirs
+
+from taskgraph.parameters import Parameters
+from taskgraph.util import json
+from taskgraph.util.python_path import find_object
+
+logger = logging.getLogger(__name__)
+
+#: Set to a non-empty value to enable the kind cache.
+CACHE_ENV = "TASKGRAPH_KIND_CACHE"
+
+#: Overrides the directory the kind cache is stored in.
+CACHE_DIR_ENV = "TASKGRAPH_KIND_CACHE_DIR"
+
+_READ_ALL = object()
+
+# The inputs recorded by `cached_input` for the kind being loaded, if any.
+_inputs = contextvars.ContextVar("kind_cache_inputs", default=None)
+
+
+class _Uncacheable(Exception):
+    """Raised when a kind's inputs can't be reliably keyed."""
+
+
+class _Missing:
+    """Recorded for parameters that were looked up but not set."""
+
+    def __eq__(self, other):
+        return isinstance(other, _Missing)
+
+    def __hash__(self):
+        return 0
+
+
+_MISSING = _Missing()
+
+
+def _get_parameter(parameters, name):
+    # Bypass `RecordingParameters` so looking up values doesn't count as a read.
+    if dict.__contains__(parameters, name):
+        return dict.__getitem__(parameters, name)
+    return _MISSING
+
+
+class RecordingParameters(Parameters):
+    """Parameters that record which keys were read.
+
+    Any operation that exposes every parameter at once (iterating, copying,
+    serializing) marks all parameters as read.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.accessed = set()
+
+    def _record(self, key):
+        if self.accessed is not _READ_ALL:
+            self.accessed.add(key)
+
+    def _record_all(self):
+        self.accessed = _READ_ALL
+
+    def __getitem__(self, k):
+        self._record(k)
+        return super().__getitem__(k)
+
+    def __contains__(self, k):
+        self._record(k)
+        return super().__contains__(k)
+
+    def get(self, k, default=None):
+        self._record(k)
+        return super().get(k, default)
+
+    def __iter__(self):
+        self._record_all()
+        return super().__iter__()
+
+    def keys(self):
+        self._record_all()
+        return super().keys()
+
+    def values(self):
+        self._record_all()
+        return super().values()
+
+    def items(self):
+        self._record_all()
+        return super().items()
+
+    def copy(self):
+        self._record_all()
+        return super().copy()
+
+    def read_values(self) -> dict[str, Any]:
+        """Return the subset of parameters that were read, and their values."""
+        if self.accessed is _READ_ALL:
+            names = dict.keys(self)
+        else:
+            names = self.accessed
+        return {name: _get_parameter(self, name) for name in names}
+
+
+def cached_input(func):
+    """Decorate a function reading files of the repository, so that kinds
+    calling it are only served from the cache while it returns the same
+    results.
+
+    The function must be importable by its module and qualified name, and its
+    arguments and result must be picklable.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = func(*args, **kwargs)
+        inputs = _inputs.get()
+        if inputs is not None:
+            inputs.append(
+                (f"{func.__module__}:{func.__qualname__}", args, kwargs, result)
+            )
+        return result
+
+    return wrapper
+
+
+def cacheable_loader(func):
+    """Declare that the kind loader `func` only reads inputs the kind cache
+    tracks: the kind's configuration and ``tasks-from`` files, the parameters,
+    the tasks of upstream kinds and ``cached_input`` functions. Kinds with
+    other loaders are never cached."""
+    func.kind_cacheable = True
+    return func
+
+
+def is_cacheable_loader(loader):
+    """Return whether `loader` was declared with `cacheable_loader`."""
+    return getattr(loader, "kind_cacheable", False)
+
+
+@contextmanager
+def recording_inputs(inputs):
+    """Record calls to `cached_input` functions into `inputs`, a list, while
+    the context is active. Nothing is recorded if `inputs` is ``None``."""
+    token = _inputs.set(inputs)
+    try:
+        yield
+    finally:
+        _inputs.reset(token)
+
+
+def iter_recording_inputs(inputs, iterable):
+    """Iterate over `iterable`, recording calls to `cached_input` functions
+    made while producing each item into `inputs`, but not those made by the
+    caller while handling it."""
+    iterator = iter(iterable)
+    while True:
+        with recording_inputs(inputs):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def _stable_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    # Falling back to `str` could put object reprs, which change between
+    # runs, into the key.
+    raise TypeError(f"Can't key {type(value).__name__} values")
+
+
+def _stable_dumps(value):
+    try:
+        return json.dumps(value, sort_keys=True, default=_stable_default)
+    except TypeError as e:
+        raise _Uncacheable(str(e)) from e
+
+
+@functools.cache
+def _file_digest(path, mtime_ns, size):
+    with open(path, "rb") as fh:
+        return hashlib.sha256(fh.read()).digest()
+
+
+def _hash_file(h, path):
+    h.update(f"{path}\n".encode())
+    try:
+        st = os.stat(path)
+        h.update(_file_digest(path, st.st_mtime_ns, st.st_size))
+    except OSError:
+        h.update(b"<missing>")
+
+
+def _module_origin(name):
+    module = sys.modules.get(name)
+    if module is not None:
+        return getattr(module, "__file__", None)
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return None
+    return spec.origin if spec and spec.has_location else None
+
+
+@functools.cache
+def _imported_names(name, path, mtime_ns, size):
+    """Return the names of the modules the source of module `name`, at
+    `path`, may import."""
+    with open(path, "rb") as fh:
+        tree = ast.parse(fh.read(), path)
+    is_package = os.path.basename(path) == "__init__.py"
+    package = name if is_package else name.rpartition(".")[0]
+
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                parts = package.split(".")
+                base = ".".join(parts[: len(parts) - node.level + 1])
+                if node.module:
+                    base = f"{base}.{node.module}" if base else node.module
+            else:
+                base = node.module
+            if not base:
+                continue
+            names.add(base)
+            # Imported names may be submodules rather than attributes.
+            names.update(f"{base}.{alias.name}" for alias in node.names)
+
+    # Importing a module imports its parent packages too.
+    for imported in list(names):
+        while "." in imported:
+            imported = imported.rpartition(".")[0]
+            names.add(imported)
+    return frozenset(names)
+
+
+def _project_roots(graph_config):
+    import taskgraph  # noqa: PLC0415
+
+    roots = {
+        graph_config.root_dir,
+        os.path.dirname(os.path.abspath(taskgraph.__file__)),
+    }
+    try:
+        roots.add(str(graph_config.vcs_root))
+    except Exception:
+        pass
+    return tuple(os.path.join(root, "") for root in roots)
+
+
+def _is_project_file(path, roots):
+    return path.startswith(roots) and not any(
+        part in path.split(os.sep) for part in ("site-packages", "dist-packages")
+    )
+
+
+def _module_files(modules, roots):
+    """Return the files of `modules`, and of the project modules (those found
+    under `roots`) they import, directly or indirectly."""
+    files = {}
+    pending = list(modules)
+    while pending:
+        name = pending.pop()
+        if name in files:
+            continue
+        path = _module_origin(name)
+        if path is None:
+            if name in modules:
+                raise _Uncacheable(f"can't find the source of {name}")
+            continue
+        path = os.path.abspath(path)
+        files[name] = path
+        if not _is_project_file(path, roots):
+            continue
+        if not path.endswith(".py"):
+            raise _Uncacheable(f"can't read the imports of {name}")
+        try:
+            st = os.stat(path)
+            imported = _imported_names(name, path, st.st_mtime_ns, st.st_size)
+        except (OSError, SyntaxError, ValueError) as e:
+            raise _Uncacheable(f"can't read the imports of {name}: {e}") from e
+        pending.extend(imported - files.keys())
+    return {
+        name: path
+        for name, path in files.items()
+        if name in modules or _is_project_file(path, roots)
+    }
+
+
+def digest_tasks(tasks) -> str:
+    """Return a digest representing the content of the given tasks."""
+    h = hashlib.sha256()
+    for task in sorted(tasks, key=lambda t: t.label):
+        h.update(_stable_dumps(task.to_json()).encode())
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+class KindCache:
+    """On-disk store of the tasks generated by kinds.
+
+    Args:
+        path (str): Directory to store cache entries in.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @classmethod
+    def from_environment(cls) -> Optional["KindCache"]:
+        """Return a ``KindCache`` if caching is enabled, otherwise ``None``."""
+        if not os.environ.get(CACHE_ENV):
+            return None
+        path = os.environ.get(CACHE_DIR_ENV) or os.path.join(
+            appdirs.user_cache_dir("taskgraph"), "kinds"
+        )
+        return cls(path)
+
+    def key(self, kind, config, loader, transform_paths, dependency_tasks):
+        """Compute the cache key for a kind.
+
+        Args:
+            kind (Kind): The kind being loaded.
+            config (dict): The kind's configuration, after the loader has run.
+            loader (callable): The kind's loader.
+            transform_paths (list[str]): Python paths of the kind's transforms.
+            dependency_tasks (dict): Tasks of the kind's upstream kinds.
+
+        Returns:
+            str: A hex digest identifying this kind's inputs, or ``None`` if
+            they can't be reliably keyed, and the kind mustn't be cached.
+        """
+        import taskgraph  # noqa: PLC0415
+
+        try:
+            h = hashlib.sha256()
+            h.update(f"{taskgraph.__version__}\n{kind.name}\n".encode())
+            h.update(_stable_dumps(kind.config).encode())
+            h.update(_stable_dumps(config).encode())
+            h.update(_stable_dumps(kind.graph_config._config).encode())
+
+            for filename in kind.config.get("tasks-from", []):
+                _hash_file(h, os.path.join(kind.path, filename))
+
+            modules = {loader.__module__}
+            modules.update(path.split(":", 1)[0] for path in transform_paths)
+            for module in modules:
+                importlib.import_module(module)
+            files = _module_files(modules, _project_roots(kind.graph_config))
+            for module, path in sorted(files.items()):
+                h.update(f"{module}\n".encode())
+                _hash_file(h, path)
+
+            h.update(digest_tasks(dependency_tasks.values()).encode())
+        except _Uncacheable as e:
+            logger.debug(f"Not caching kind {kind.name}: {e}")
+            return None
+        return h.hexdigest()
+
+    def _entry_path(self, kind_name, key):
+        return os.path.join(self.path, kind_name, f"{key}.pickle")
+
+    def get(self, kind_name: str, key: str, parameters: Parameters):
+        """Return the cached tasks for a kind, or ``None`` on a cache miss."""
+        path = self._entry_path(kind_name, key)
+        try:
+            with open(path, "rb") as fh:
+                entry = pickle.load(fh)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable kind cache entry {path}: {e}")
+            return None
+
+        for name, value in entry["parameters"].items():
+            if _get_parameter(parameters, name) != value:
+                logger.debug(
+                    f"Kind cache entry for {kind_name} is stale; parameter "
+                    f"'{name}' changed"
+                )
+                return None
+
+        for func_path, args, kwargs, result in entry["inputs"]:
+            func = find_object(func_path)
+            # Don't record the inputs read to check the entry.
+            func = getattr(func, "__wrapped__", func)
+            try:
+                current = func(*args, **kwargs)
+            except Exception as e:
+                logger.debug(f"Kind cache entry for {kind_name} is stale; {e}")
+                return None
+            if current != result:
+                logger.debug(
+                    f"Kind cache entry for {kind_name} is stale; {func_path} returned "
+                    "a different result"
+                )
+                return None
+        return entry["tasks"]
+
+    def put(
+        self,
+        kind_name: str,
+        key: str,
+        parameters: RecordingParameters,
+        tasks,
+        inputs=(),
+    ):
+        """Store the tasks generated for a kind, and the `inputs` recorded
+        while generating them."""
+        path = self._entry_path(kind_name, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Only the most recent entry for each kind is kept to bound disk usage.
+        for name in os.listdir(os.path.dirname(path)):
+            if name.endswith(".pickle") and name != os.path.basename(path):
+                os.remove(os.path.join(os.path.dirname(path), name))
+
+        unique_inputs = {}
+        for func_path, args, kwargs, result in inputs:
+            call = pickle.dumps((func_path, args, sorted(kwargs.items())))
+            unique_inputs[call] = (func_path, args, kwargs, result)
+        entry = {
+            "parameters": parameters.read_values(),
+            "inputs": list(unique_inputs.values()),
+            "tasks": tasks,
+        }
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump(entry, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
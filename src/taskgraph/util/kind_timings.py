@@ -0,0 +1,117 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Persist how long each kind took to load, so the parallel loader can schedule
+the kinds on the critical path first.
+"""
+
+import logging
+import os
+import tempfile
+
+import appdirs
+
+from taskgraph.util import json
+
+logger = logging.getLogger(__name__)
+
+#: Overrides the file kind timings are stored in.
+TIMINGS_FILE_ENV = "TASKGRAPH_KIND_TIMINGS_FILE"
+
+# Weight given to the most recent measurement when updating a kind's timing.
+SMOOTHING = 0.5
+
+
+def _default_path():
+    return os.environ.get(TIMINGS_FILE_ENV) or os.path.join(
+        appdirs.user_cache_dir("taskgraph"), "kind-timings.json"
+    )
+
+
+class KindTimings:
+    """Wall times of each kind from previous generations of a Taskgraph root.
+
+    Args:
+        root_dir (str): The Taskgraph root the timings belong to.
+        path (str): File the timings are persisted to.
+    """
+
+    def __init__(self, root_dir, path=None):
+        self.root_dir = os.path.abspath(root_dir)
+        self.path = path or _default_path()
+        self.timings = {}
+
+    def _read(self):
+        try:
+            with open(self.path) as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug(f"Ignoring unreadable kind timings {self.path}: {e}")
+        return {}
+
+    @classmethod
+    def load(cls, root_dir, path=None):
+        timings = cls(root_dir, path)
+        timings.timings = timings._read().get(timings.root_dir, {})
+        return timings
+
+    def record(self, kind, duration):
+        """Record how long it took to load `kind`, in seconds."""
+        if kind in self.timings:
+            duration = SMOOTHING * duration + (1 - SMOOTHING) * self.timings[kind]
+        self.timings[kind] = duration
+
+    def save(self):
+        """Save the timings, merged with the timings other runs saved since
+        they were loaded.
+
+        Timings aren't saved when running in a task, such as a decision task,
+        as its cache directory is thrown away.
+        """
+        if "TASK_ID" in os.environ:
+            return
+
+        saved = self._read()
+        saved[self.root_dir] = {**saved.get(self.root_dir, {}), **self.timings}
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as fh:
+                    json.dump(saved, fh, sort_keys=True, indent=2)
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            logger.debug(f"Could not save kind timings to {self.path}: {e}")
+
+    def priorities(self, kind_graph):
+        """Return the length of the longest path from each kind to the end of
+        the kind graph, weighted by how long each kind takes to load.
+
+        Kinds that were never timed are assumed to take as long as the
+        average known kind.
+
+        Args:
+            kind_graph (Graph): The kind dependency graph.
+
+        Returns:
+            dict: Mapping of kind name to its remaining critical path length.
+        """
+        known = [self.timings[k] for k in kind_graph.nodes if k in self.timings]
+        default = sum(known) / len(known) if known else 1.0
+
+        _, dependents = kind_graph.links_and_reverse_links_dict()
+        remaining = {}
+        # Pre-order visits every kind before the kinds it depends on, so all
+        # of a kind's dependents have been handled by the time we reach it.
+        for kind in kind_graph.visit_preorder():
+            downstream = max((remaining[d] for d in dependents[kind]), default=0.0)
+            remaining[kind] = self.timings.get(kind, default) + downstream
+        return remaining
@@ -0,0 +1,224 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Adapt the number of concurrent Taskcluster API calls to how the services
+respond.
+
+Calls made through an ``AdaptiveLimiter`` wait for a free slot before being
+made. The number of slots starts at the maximum, so calls are only limited
+once a service pushes back, and then follows an additive-increase/
+multiplicative-decrease (AIMD) scheme, as used by TCP congestion control:
+each call that gets throttled halves the limit, at most once per window,
+and each call that succeeds while latency is healthy grows it back by about
+one slot per full window of calls. Throttled calls also pause every caller for a backoff
+period, rather than only the one that got throttled, and calls rejected
+with a 429 are retried after it.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Statuses meaning the service is overloaded. 5xx statuses are only seen
+# once the Taskcluster client ran out of retries, and 429 statuses aren't
+# retried by it at all.
+THROTTLE_STATUSES = frozenset((429, 502, 503, 504))
+
+# Weight of each new latency in the moving average of latencies.
+_LATENCY_WEIGHT = 0.2
+
+
+def _status(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        # `requests.HTTPError`
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_throttled(exc):
+    """Return whether `exc` means the service is overloaded, rather than that
+    the request itself is wrong."""
+    if type(exc).__name__ in ("TaskclusterConnectionError", "ConnectionError"):
+        return True
+    return _status(exc) in THROTTLE_STATUSES
+
+
+class AdaptiveLimiter:
+    """Limit the number of concurrent calls, adapting the limit with AIMD.
+
+    Args:
+        maximum (int): The largest number of concurrent calls.
+        initial (int): The number of concurrent calls to start with,
+            `maximum` by default.
+        minimum (int): The smallest number of concurrent calls.
+        decrease (float): The factor applied to the limit when throttled.
+        latency_tolerance (float): Latency is healthy, and the limit may
+            grow, while the average latency of an endpoint is at most this
+            many times the lowest average latency seen for it.
+        backoff (float): Seconds to pause callers for after the first of a
+            series of throttled calls. Each further throttled call doubles
+            the pause, up to `max_backoff`.
+        max_backoff (float): The longest pause, in seconds.
+        retries (int): How many times calls rejected with a 429 are retried.
+    """
+
+    def __init__(
+        self,
+        maximum,
+        initial=None,
+        minimum=1,
+        decrease=0.5,
+        latency_tolerance=2.0,
+        backoff=1.0,
+        max_backoff=30.0,
+        retries=5,
+    ):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.initial = initial or maximum
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = retries
+
+        self._cond = threading.Condition()
+        self._limit = self.initial
+        # Healthy calls since the limit last changed.
+        self._credit = 0
+        self._in_flight = 0
+        self._started = time.monotonic()
+        # Calls started before the last decrease don't decrease the limit
+        # again, so a burst of throttled calls only halves it once.
+        self._last_decrease = self._started
+        self._paused_until = 0.0
+        self._throttle_streak = 0
+        self._latency = {}
+        self._baseline = {}
+
+        self.counters = {
+            "calls": 0,
+            "throttled": 0,
+            "errors": 0,
+            "retries": 0,
+            "increases": 0,
+            "decreases": 0,
+            "max_in_flight": 0,
+        }
+        self.decisions = []
+
+    @property
+    def limit(self):
+        """The current number of concurrent calls allowed."""
+        return self._limit
+
+    def _record(self, reason):
+        self.decisions.append(
+            {
+                "time": round(time.monotonic() - self._started, 3),
+                "limit": self.limit,
+                "reason": reason,
+            }
+        )
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0 and self._in_flight < self.limit:
+                    break
+                self._cond.wait(wait if wait > 0 else None)
+            self._in_flight += 1
+            self.counters["calls"] += 1
+            self.counters["max_in_flight"] = max(
+                self.counters["max_in_flight"], self._in_flight
+            )
+            return time.monotonic()
+
+    def _healthy(self, name, latency):
+        average = self._latency.get(name, latency)
+        average += _LATENCY_WEIGHT * (latency - average)
+        self._latency[name] = average
+        baseline = min(self._baseline.get(name, average), average)
+        self._baseline[name] = baseline
+        return average <= baseline * self.latency_tolerance
+
+    def _release(self, name, started, exc):
+        now = time.monotonic()
+        with self._cond:
+            self._in_flight -= 1
+            if exc is not None and is_throttled(exc):
+                self.counters["throttled"] += 1
+                self._throttle_streak += 1
+                pause = min(
+                    self.max_backoff, self.backoff * 2 ** (self._throttle_streak - 1)
+                )
+                self._paused_until = max(self._paused_until, now + pause)
+                if started >= self._last_decrease:
+                    previous = self.limit
+                    self._limit = max(self.minimum, int(self._limit * self.decrease))
+                    self._credit = 0
+                    self._last_decrease = now
+                    self.counters["decreases"] += 1
+                    self._record("throttled")
+                    logger.info(
+                        f"{name} was throttled ({_status(exc) or type(exc).__name__}), "
+                        f"reducing concurrency from {previous} to {self.limit}"
+                    )
+            elif exc is not None:
+                self.counters["errors"] += 1
+            else:
+                self._throttle_streak = 0
+                if self._healthy(name, now - started) and self._limit < self.maximum:
+                    self._credit += 1
+                    if self._credit >= self._limit:
+                        self._limit += 1
+                        self._credit = 0
+                        self.counters["increases"] += 1
+                        self._record("increase")
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, name):
+        """Hold a slot for the duration of a call to the endpoint `name`.
+
+        Exceptions raised by the call are used to detect throttling, and are
+        re-raised.
+        """
+        started = self._acquire()
+        try:
+            yield
+        except Exception as e:
+            self._release(name, started, e)
+            raise
+        self._release(name, started, None)
+
+    def call(self, name, func, *args, **kwargs):
+        """Call `func` with `args` and `kwargs` in a slot, retrying it if it
+        is rejected with a 429."""
+        for attempt in range(self.retries + 1):
+            try:
+                with self.slot(name):
+                    return func(*args, **kwargs)
+            except Exception as e:
+                if _status(e) != 429 or attempt == self.retries:
+                    raise
+                with self._cond:
+                    self.counters["retries"] += 1
+
+    def to_json(self):
+        return {
+            "limit": self.limit,
+            "initial": self.initial,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "counters": dict(self.counters),
+            "latency": {name: round(v, 6) for name, v in self._latency.items()},
+            "decisions": list(self.decisions),
+        }
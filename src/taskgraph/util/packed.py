@@ -0,0 +1,136 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+A compact binary encoding for artifacts, as an alternative to JSON.
+
+Data is encoded as msgpack and compressed with zstd. Task graphs are encoded
+as msgspec Structs laid out as arrays, so the names of the fields of each task
+aren't repeated. Files in this format use the ``.msgpack.zst`` extension.
+
+Decoding produces the same objects as loading the JSON version of the
+artifact, so callers don't need to know which format was used. Compression
+requires the optional ``zstandard`` package, installed with
+``pip install taskcluster-taskgraph[zstd]``.
+"""
+
+from typing import Any, Optional, Union
+
+import msgspec
+
+#: File extension of artifacts in this format.
+EXTENSION = ".msgpack.zst"
+
+#: Makes the decision task also write its task graphs and label to task id
+#: mapping in this format.
+BINARY_ARTIFACTS_ENV = "TASKGRAPH_BINARY_ARTIFACTS"
+
+# Every zstd frame starts with these bytes.
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class PackedTask(msgspec.Struct, array_like=True, omit_defaults=True):
+    """The JSON representation of a `Task`, see `Task.to_json`."""
+
+    kind: str
+    label: str
+    description: str
+    attributes: dict
+    dependencies: dict
+    soft_dependencies: list
+    if_dependencies: list
+    optimization: Any
+    task: dict
+    task_id: Optional[str] = None
+
+
+class PackedTaskGraph(msgspec.Struct, array_like=True, tag="task-graph"):
+    """The JSON representation of a `TaskGraph`, see `TaskGraph.to_json`."""
+
+    tasks: dict[str, PackedTask]
+
+
+class PackedData(msgspec.Struct, array_like=True, tag="data"):
+    """Any other JSON-able data."""
+
+    data: Any
+
+
+_encoder = msgspec.msgpack.Encoder()
+_decoder = msgspec.msgpack.Decoder(Union[PackedTaskGraph, PackedData])
+
+
+def _zstd():
+    try:
+        import zstandard  # noqa: PLC0415
+    except ImportError as e:
+        raise ImportError(
+            "zstandard is not installed! Use `pip install "
+            "taskcluster-taskgraph[zstd]` to read or write binary artifacts."
+        ) from e
+    return zstandard
+
+
+def is_packed(data):
+    """Return whether `data` (bytes) is in this format rather than JSON."""
+    return bytes(data[:4]) == _ZSTD_MAGIC
+
+
+def dumps(obj):
+    """Encode `obj`, a `TaskGraph` or any JSON-able data.
+
+    Returns:
+        bytes: The encoded data.
+    """
+    from taskgraph.taskgraph import TaskGraph  # noqa: PLC0415
+
+    if isinstance(obj, TaskGraph):
+        tasks = {}
+        for key in obj.graph.visit_postorder():
+            task = obj.tasks[key]
+            tasks[key] = PackedTask(
+                kind=task.kind,
+                label=task.label,
+                description=task.description,
+                attributes=task.attributes,
+                dependencies=task.dependencies,
+                soft_dependencies=task.soft_dependencies,
+                if_dependencies=task.if_dependencies,
+                optimization=task.optimization,
+                task=task.task,
+                task_id=task.task_id,
+            )
+        packed = PackedTaskGraph(tasks)
+    else:
+        packed = PackedData(obj)
+    return _zstd().ZstdCompressor().compress(_encoder.encode(packed))
+
+
+def loads(data):
+    """Decode data encoded by `dumps`.
+
+    Task graphs are decoded to their JSON representation, as returned by
+    `TaskGraph.to_json`.
+    """
+    packed = _decoder.decode(_zstd().ZstdDecompressor().decompress(data))
+    if isinstance(packed, PackedData):
+        return packed.data
+
+    tasks = {}
+    for key, task in packed.tasks.items():
+        task_json = msgspec.structs.asdict(task)
+        if task_json["task_id"] is None:
+            del task_json["task_id"]
+        tasks[key] = task_json
+    return tasks
+
+
+def dump(obj, fh):
+    """Encode `obj` to `fh`, a binary file."""
+    fh.write(dumps(obj))
+
+
+def load(fh):
+    """Decode the contents of `fh`, a binary file."""
+    return loads(fh.read())
@@ -35,18 +35,20 @@ def import_sibling_modules(exceptions=None):
         exceptions (list): A list of file names to exclude (caller and
             __init__.py are implicitly excluded).
     """
-    frame = inspect.stack()[1]
-    mod = inspect.getmodule(frame[0])
+    # Unlike `inspect.stack()`, this doesn't read the source of every frame
+    # on the stack.
+    caller = inspect.currentframe().f_back.f_globals  # type: ignore
+    path = caller["__file__"]
 
-    name = os.path.basename(mod.__file__)  # type: ignore
+    name = os.path.basename(path)
     excs = {"__init__.py", name}
     if exceptions:
         excs.update(exceptions)
 
-    modpath = mod.__name__  # type: ignore
+    modpath = caller["__name__"]
     if not name.startswith("__init__.py"):
         modpath = modpath.rsplit(".", 1)[0]
 
-    for f in os.listdir(os.path.dirname(mod.__file__)):  # type: ignore
+    for f in os.listdir(os.path.dirname(path)):
         if f.endswith(".py") and f not in excs:
             __import__(modpath + "." + f[:-3])
@@ -2,9 +2,9 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import inspect
 import pprint
 import re
+import sys
 import threading
 from collections.abc import Mapping
 from typing import Annotated, Any, Literal, Optional, Union, get_args, get_origin
@@ -332,7 +332,9 @@ class LegacySchema(voluptuous.Schema):
 
 
 def _caller_module_name(depth=1):
-    frame = inspect.stack()[depth + 1].frame
+    # `inspect.stack()` would read the source of every frame on the stack,
+    # which is slow when schemas are defined at import time.
+    frame = sys._getframe(depth + 1)
     return frame.f_globals.get("__name__", "schema")
 
 
@@ -0,0 +1,108 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Share the tasks of loaded kinds with worker processes.
+
+When kinds are loaded in a process pool, every downstream kind needs the tasks
+of its upstream kinds. Passing them as arguments means they get pickled again
+for every kind that depends on them. Instead, each kind's tasks are serialized
+exactly once into a ``TaskStore`` and workers are only handed a reference to
+the store along with the names of the kinds they need.
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+
+
+class TaskStore:
+    """A directory containing the serialized tasks of each loaded kind.
+
+    Args:
+        path (str): Directory to store tasks in. A temporary directory is
+            created if not specified.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or tempfile.mkdtemp(prefix="taskgraph-tasks-")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def _chunk_path(self, kind, chunk):
+        return os.path.join(self.path, f"{kind}.{chunk}.pickle")
+
+    def write(self, kind, tasks, chunk=0):
+        """Serialize a chunk of the tasks of `kind` into the store."""
+        path = self._chunk_path(kind, chunk)
+        with open(path + ".tmp", "wb") as fh:
+            pickle.dump(tasks, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    def read(self, kind, chunk=None):
+        """Return the list of tasks stored for `kind`.
+
+        Args:
+            kind (str): Name of the kind to read.
+            chunk (int): Only read this chunk of the kind's tasks. Defaults to
+                reading every chunk, in order.
+        """
+        if chunk is None:
+            chunks = sorted(self.chunks().get(kind, ()))
+            return [task for c in chunks for task in self.read(kind, c)]
+
+        with open(self._chunk_path(kind, chunk), "rb") as fh:
+            return pickle.load(fh)
+
+    def chunks(self):
+        """Return a mapping of kind name to the set of chunks written for it."""
+        chunks = {}
+        for name in os.listdir(self.path):
+            if not name.endswith(".pickle"):
+                continue
+            kind, chunk, _ = name.rsplit(".", 2)
+            chunks.setdefault(kind, set()).add(int(chunk))
+        return chunks
+
+    def view(self, deps, tasks):
+        """Return the tasks of the given kinds as a ``StoredTasks`` mapping.
+
+        Args:
+            deps (list): ``(kind, chunk)`` tuples describing the tasks in
+                `tasks`. A chunk of ``None`` means all of the kind's tasks.
+            tasks (dict): Mapping of label to task, for tasks in `deps`.
+        """
+        return StoredTasks(self.path, sorted(deps, key=str), tasks)
+
+
+def _load_stored_tasks(path, deps):
+    store = TaskStore(path)
+    return {
+        task.label: task for kind, chunk in deps for task in store.read(kind, chunk)
+    }
+
+
+class StoredTasks(dict):
+    """A mapping of label to task for tasks held in a ``TaskStore``.
+
+    In the current process this behaves like a regular dictionary. When
+    pickled, only the location of the store and the kinds (or chunks of kinds)
+    are serialized, and the tasks are read back from the store when unpickled.
+    """
+
+    def __init__(self, path, deps, tasks):
+        super().__init__(tasks)
+        self._path = path
+        self._deps = deps
+
+    def __reduce__(self):
+        return (_load_stored_tasks, (self._path, self._deps))
@@ -9,15 +9,18 @@ import functools
 import io
 import logging
 import os
-from typing import Any, Union
+from typing import TYPE_CHECKING, Any, Union
 
-import requests
 import taskcluster_urls as liburls
-from requests.packages.urllib3.util.retry import Retry  # type: ignore
 
-import taskcluster
 from taskgraph.task import Task
-from taskgraph.util import yaml
+from taskgraph.util import trace, yaml
+from taskgraph.util.limiter import AdaptiveLimiter
+
+# `requests` and `taskcluster` take longer to import than the rest of
+# Taskgraph combined, so they're only imported once a request is made.
+if TYPE_CHECKING:
+    import requests
 
 logger = logging.getLogger(__name__)
 
@@ -62,6 +65,8 @@ def get_root_url(block_proxy=False):
 
 @functools.cache
 def get_taskcluster_client(service: str):
+    import taskcluster  # noqa: PLC0415
+
     if "TASKCLUSTER_PROXY_URL" in os.environ:
         options = {"rootUrl": os.environ["TASKCLUSTER_PROXY_URL"]}
     else:
@@ -72,11 +77,16 @@ def get_taskcluster_client(service: str):
 
 def _handle_artifact(
     path: str,
-    response: requests.Response,
+    response: "requests.Response",
 ) -> Any:
     if path.endswith(".json"):
         return response.json()
 
+    if path.endswith(".msgpack.zst"):
+        from taskgraph.util import packed  # noqa: PLC0415
+
+        return packed.loads(response.content)
+
     if path.endswith(".yml"):
         return yaml.load_stream(response.content)
 
@@ -98,6 +108,9 @@ def requests_retry_session(
     session=None,
     allowed_methods=None,
 ):
+    import requests  # noqa: PLC0415
+    from urllib3.util.retry import Retry  # noqa: PLC0415
+
     session = session or requests.Session()
     kwargs = {}
     if allowed_methods is not None:
@@ -130,15 +143,23 @@ def get_session():
     return requests_retry_session(retries=5)
 
 
+@functools.cache
+def get_limiter():
+    """Return the limiter shared by calls that create, cancel or look up many
+    tasks at once."""
+    return AdaptiveLimiter(maximum=CONCURRENCY)
+
+
 def get_artifact_url(task_id, path, use_proxy=False):
     url = get_root_url(block_proxy=not use_proxy)
     artifact_tmpl = liburls.api(url, "queue", "v1", "task/{}/artifacts/{}")
     return artifact_tmpl.format(task_id, path)
 
 
-def get_artifact(task_id, path):
+def get_artifact(task_id, path, run_id=None):
     """
-    Returns the artifact with the given path for the given task id.
+    Returns the artifact with the given path for the given task id, from the
+    run `run_id` if given, or from its latest run.
 
     If the path ends with ".json" or ".yml", the content is deserialized as,
     respectively, json or yaml, and the corresponding python data (usually
@@ -146,11 +167,61 @@ def get_artifact(task_id, path):
     For other types of content, a file-like object is returned.
     """
     queue = get_taskcluster_client("queue")
-    response = queue.getLatestArtifact(task_id, path)
+    if run_id is None:
+        response = queue.getLatestArtifact(task_id, path)
+    else:
+        response = queue.getArtifact(task_id, run_id, path)
     response = get_session().get(response["url"])
     return _handle_artifact(path, response)
 
 
+def get_artifact_range_or_whole(task_id, path, start, end):
+    """
+    Request the bytes from offset `start` up to, but excluding, offset `end`
+    of the artifact with the given path for the given task id.
+
+    Offsets are into the artifact's content. Artifacts stored with a content
+    encoding, like gzip, can't be read by range, as the server would send a
+    range of the encoded content, so these are downloaded whole.
+
+    Returns:
+        tuple: The requested bytes and ``True``, or the whole artifact and
+        ``False`` if the server didn't send the range.
+    """
+    queue = get_taskcluster_client("queue")
+    url = queue.getLatestArtifact(task_id, path)["url"]
+    session = get_session()
+    response = session.get(
+        url,
+        headers={"Range": f"bytes={start}-{end - 1}", "Accept-Encoding": "identity"},
+        stream=True,
+    )
+    response.raise_for_status()
+    if response.status_code == 206:
+        encoding = response.headers.get("Content-Encoding", "identity")
+        content_range = response.headers.get("Content-Range")
+        if encoding == "identity" and (
+            content_range is None
+            or content_range.startswith(f"bytes {start}-{end - 1}/")
+        ):
+            return response.content, True
+        response.close()
+        response = session.get(url)
+        response.raise_for_status()
+    # Either the server ignored the range and sent the whole artifact, or it
+    # is fetched again whole.
+    return response.content, False
+
+
+def get_artifact_range(task_id, path, start, end):
+    """
+    Returns the bytes from offset `start` up to, but excluding, offset `end`
+    of the artifact with the given path for the given task id.
+    """
+    data, ranged = get_artifact_range_or_whole(task_id, path, start, end)
+    return data if ranged else data[start:end]
+
+
 def list_artifacts(task_id):
     queue = get_taskcluster_client("queue")
     response = queue.listLatestArtifacts(task_id)
@@ -210,9 +281,13 @@ def find_task_id_batched(index_paths):
             }
         )
 
-    index.findTasksAtIndex(
-        payload={"indexes": index_paths}, paginationHandler=pagination_handler
-    )
+    with trace.span("findTasksAtIndex", cat="network", indexes=len(index_paths)):
+        get_limiter().call(
+            "findTasksAtIndex",
+            index.findTasksAtIndex,
+            payload={"indexes": index_paths},
+            paginationHandler=pagination_handler,
+        )
 
     return task_ids
 
@@ -302,7 +377,7 @@ def cancel_task(task_id):
         logger.info(f"Would have cancelled {task_id}.")
     else:
         queue = get_taskcluster_client("queue")
-        queue.cancelTask(task_id)
+        get_limiter().call("cancelTask", queue.cancelTask, task_id)
 
 
 def status_task(task_id):
@@ -357,7 +432,13 @@ def status_task_batched(task_ids):
             }
         )
 
-    queue.statuses(payload={"taskIds": task_ids}, paginationHandler=pagination_handler)
+    with trace.span("statuses", cat="network", tasks=len(task_ids)):
+        get_limiter().call(
+            "statuses",
+            queue.statuses,
+            payload={"taskIds": task_ids},
+            paginationHandler=pagination_handler,
+        )
 
     return statuses
 
@@ -0,0 +1,158 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Record a timeline of graph generation and task creation in the Chrome trace
+event format, which can be viewed with https://ui.perfetto.dev or
+``chrome://tracing``.
+
+Tracing is enabled by setting ``TASKGRAPH_TRACE`` to the path of the trace to
+write. Spans are buffered in each process and appended to an events file next
+to the trace, so that spans recorded by kind loader processes are included.
+``finish_trace`` merges the events into the final trace.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from taskgraph.util import json
+
+#: Enables tracing, writing the trace to the given path.
+TRACE_ENV = "TASKGRAPH_TRACE"
+
+_lock = threading.Lock()
+_events = []
+_events_pid = None
+
+
+def trace_path():
+    """Return the path to write the trace to, if tracing is enabled."""
+    path = os.environ.get(TRACE_ENV)
+    return os.path.abspath(path) if path else None
+
+
+def _events_path(path):
+    return f"{path}.events"
+
+
+def _now():
+    # Microseconds, from a clock shared by all processes.
+    return time.monotonic_ns() // 1000
+
+
+def _buffer():
+    global _events, _events_pid
+    # Forked processes inherit the events of their parent, which will be
+    # written by the parent.
+    if _events_pid != os.getpid():
+        _events = []
+        _events_pid = os.getpid()
+    return _events
+
+
+@contextmanager
+def span(name, cat="taskgraph", **args):
+    """Record the time spent in the body of the `with` statement.
+
+    Yields the event being recorded, or ``None`` if tracing is disabled.
+    Callers may update its name or ``args``.
+    """
+    if not trace_path():
+        yield None
+        return
+
+    event = {
+        "name": name,
+        "cat": cat,
+        "ph": "X",
+        "ts": _now(),
+        "pid": os.getpid(),
+        "tid": threading.get_native_id(),
+        "args": args,
+    }
+    try:
+        yield event
+    finally:
+        event["dur"] = _now() - event["ts"]
+        with _lock:
+            _buffer().append(event)
+
+
+def flush():
+    """Write the spans recorded by this process to the events file."""
+    path = trace_path()
+    if not path:
+        return
+    with _lock:
+        events = _buffer()
+        if not events:
+            return
+        data = "".join(json.dumps(event) + "\n" for event in events)
+        events.clear()
+        # A single append is atomic, so processes flushing concurrently
+        # won't interleave their events.
+        with open(_events_path(path), "a") as fh:
+            fh.write(data)
+
+
+def start_trace(path):
+    """Discard events left over from a previous trace at `path`."""
+    with _lock:
+        _buffer().clear()
+    for p in (path, _events_path(path)):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def finish_trace(path):
+    """Merge all recorded spans into the trace at `path`."""
+    flush()
+    events = []
+    if os.path.exists(_events_path(path)):
+        with open(_events_path(path)) as fh:
+            events = [json.loads(line) for line in fh]
+        os.remove(_events_path(path))
+
+    # Name each process, so worker processes are easy to tell apart.
+    pids = sorted({event["pid"] for event in events})
+    events.extend(
+        {
+            "name": "process_name",
+            "ph": "M",
+            "pid": pid,
+            "args": {"name": "taskgraph" if pid == os.getpid() else "worker"},
+        }
+        for pid in pids
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump(
+            {"traceEvents": events, "displayTimeUnit": "ms"},
+            fh,
+            sort_keys=True,
+            indent=2,
+        )
+
+
+@contextmanager
+def tracing(path):
+    """Record a trace to `path` for the duration of the `with` statement."""
+    if not path:
+        yield
+        return
+
+    path = os.path.abspath(path)
+    previous = os.environ.get(TRACE_ENV)
+    os.environ[TRACE_ENV] = path
+    start_trace(path)
+    try:
+        yield
+    finally:
+        finish_trace(path)
+        if previous is None:
+            del os.environ[TRACE_ENV]
+        else:
+            os.environ[TRACE_ENV] = previous
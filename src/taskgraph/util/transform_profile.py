@@ -0,0 +1,248 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Measure how much time each transform of each kind takes.
+
+Transforms are chained generators, so the time spent pulling an item out of a
+transform includes the time spent in every transform before it. Each transform
+is wrapped so that the time spent waiting on its input is subtracted, leaving
+only the time spent in the transform itself.
+
+Kinds may be loaded in other processes, so each load appends its measurements
+to a records file next to the profile, which is merged into the final JSON
+profile once all kinds have been loaded.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+from taskgraph.util import json
+
+#: Enables transform profiling, writing the profile to the given path.
+PROFILE_ENV = "TASKGRAPH_PROFILE_TRANSFORMS"
+
+FIELDS = ("wall_time", "cpu_time", "items_in", "items_out")
+
+
+def profile_path():
+    """Return the path to write the transform profile to, if enabled."""
+    path = os.environ.get(PROFILE_ENV)
+    return os.path.abspath(path) if path else None
+
+
+@contextmanager
+def profiling(path):
+    """Profile transforms to `path` for the duration of the `with`
+    statement."""
+    if not path:
+        yield
+        return
+
+    # Kinds may be loaded in other processes, which inherit the environment.
+    previous = os.environ.get(PROFILE_ENV)
+    os.environ[PROFILE_ENV] = path
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ[PROFILE_ENV]
+        else:
+            os.environ[PROFILE_ENV] = previous
+
+
+def _records_path(path):
+    return f"{path}.records"
+
+
+def _name(transform):
+    func = transform
+    if not hasattr(func, "__qualname__"):
+        # Callable instances, such as `ValidateSchema`.
+        func = type(func)
+    return f"{func.__module__}:{func.__qualname__}"
+
+
+def _flatten(transforms):
+    # Kinds chain the `TransformSequence` of each transforms module.
+    for transform in transforms:
+        if hasattr(transform, "_transforms"):
+            yield from _flatten(transform._transforms)
+        else:
+            yield transform
+
+
+class _Timer:
+    def __init__(self):
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+    def start(self):
+        return time.perf_counter(), time.thread_time()
+
+    def add(self, started, sign=1):
+        wall, cpu = started
+        self.wall_time += sign * (time.perf_counter() - wall)
+        self.cpu_time += sign * (time.thread_time() - cpu)
+
+
+class TransformProfile:
+    """Measurements of each transform run while loading a kind.
+
+    Args:
+        kind (str): Name of the kind being loaded.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.stats = []
+
+    def wrap(self, transforms):
+        """Return a copy of a ``TransformSequence`` with each of its
+        transforms instrumented."""
+        from taskgraph.transforms.base import TransformSequence  # noqa: PLC0415
+
+        profiled = TransformSequence()
+        for transform in _flatten(transforms._transforms):
+            profiled.add(self._wrap_transform(transform))
+        return profiled
+
+    def _wrap_transform(self, transform):
+        stats = {"transform": _name(transform), "items_in": 0, "items_out": 0}
+        timer = _Timer()
+        self.stats.append((stats, timer))
+
+        def count_inputs(items):
+            items = iter(items)
+            while True:
+                # Time spent producing inputs belongs to earlier transforms.
+                started = timer.start()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+                finally:
+                    timer.add(started, sign=-1)
+                stats["items_in"] += 1
+                yield item
+
+        def wrapper(config, items):
+            started = timer.start()
+            try:
+                outputs = transform(config, count_inputs(items))
+            finally:
+                timer.add(started)
+            if outputs is None:
+                return None
+            return count_outputs(iter(outputs))
+
+        def count_outputs(outputs):
+            while True:
+                started = timer.start()
+                try:
+                    item = next(outputs)
+                except StopIteration:
+                    return
+                finally:
+                    timer.add(started)
+                stats["items_out"] += 1
+                yield item
+
+        return wrapper
+
+    def to_json(self):
+        return [
+            dict(stats, wall_time=timer.wall_time, cpu_time=timer.cpu_time)
+            for stats, timer in self.stats
+        ]
+
+    def save(self, path):
+        """Append this kind's measurements to the records of the profile at
+        `path`."""
+        record = json.dumps({"kind": self.kind, "transforms": self.to_json()})
+        # A single append is atomic, so processes loading other kinds
+        # concurrently won't interleave their records.
+        with open(_records_path(path), "a") as fh:
+            fh.write(record + "\n")
+
+
+def start_profile(path):
+    """Discard measurements left over from a previous profile at `path`."""
+    for p in (path, _records_path(path)):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def finish_profile(path):
+    """Merge the recorded measurements into the profile at `path`.
+
+    Kinds loaded in several parts (e.g. shards) have the measurements of
+    each part summed.
+
+    Returns:
+        dict: The profile, mapping kind names to a list of the measurements of
+        each of their transforms, in order.
+    """
+    profile = {}
+    records = _records_path(path)
+    if os.path.exists(records):
+        with open(records) as fh:
+            for line in fh:
+                record = json.loads(line)
+                transforms = profile.setdefault(record["kind"], [])
+                for i, stats in enumerate(record["transforms"]):
+                    if i == len(transforms):
+                        transforms.append(dict.fromkeys(FIELDS, 0))
+                        transforms[i]["transform"] = stats["transform"]
+                    for field in FIELDS:
+                        transforms[i][field] += stats[field]
+        os.remove(records)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as fh:
+        json.dump({"kinds": profile}, fh, sort_keys=True, indent=2)
+    return profile
+
+
+def format_profile(profile, sort_by="wall_time", limit=None):
+    """Format a profile as a table, slowest transforms first.
+
+    Args:
+        profile (dict): A profile, as returned by ``finish_profile``.
+        sort_by (str): The field to sort by, one of ``FIELDS``.
+        limit (int): Only include this many rows.
+
+    Returns:
+        str: The formatted table.
+    """
+    rows = [
+        dict(stats, kind=kind)
+        for kind, transforms in profile.items()
+        for stats in transforms
+    ]
+    rows.sort(key=lambda row: (-row[sort_by], row["kind"], row["transform"]))
+    if limit:
+        rows = rows[:limit]
+
+    header = ("Wall (s)", "CPU (s)", "In", "Out", "Kind", "Transform")
+    table = [header] + [
+        (
+            f"{row['wall_time']:.3f}",
+            f"{row['cpu_time']:.3f}",
+            str(row["items_in"]),
+            str(row["items_out"]),
+            row["kind"],
+            row["transform"],
+        )
+        for row in rows
+    ]
+    widths = [max(len(row[i]) for row in table) for i in range(len(header))]
+    lines = []
+    for row in table:
+        # Right align the numeric columns.
+        cells = [cell.rjust(width) for cell, width in zip(row[:4], widths)]
+        cells += [cell.ljust(width) for cell, width in zip(row[4:], widths[4:])]
+        lines.append("  ".join(cells).rstrip())
+    return "\n".join(lines)
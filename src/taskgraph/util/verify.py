@@ -17,6 +17,7 @@ from taskgraph.config import GraphConfig
 from taskgraph.parameters import Parameters
 from taskgraph.taskgraph import TaskGraph
 from taskgraph.transforms.task import run_task_suffix
+from taskgraph.util import trace
 from taskgraph.util.attributes import match_run_on_projects
 from taskgraph.util.treeherder import join_symbol
 
@@ -113,7 +114,8 @@ class VerificationSequence:
 
     def __call__(self, name, *args, **kwargs):
         for verification in self._verifications.get(name, []):
-            verification.verify(*args, **kwargs)
+            with trace.span(verification.func.__name__, cat="verifications"):
+                verification.verify(*args, **kwargs)
 
     def add(self, name, **kwargs):
         cls = self._verification_types.get(name, GraphVerification)
@@ -128,6 +130,21 @@ class VerificationSequence:
 verifications = VerificationSequence()
 
 
+@verifications.add("kinds")
+def verify_stream_from(kinds):
+    """
+    This function ensures that a kind's ``stream-from`` kind is also one of its
+    ``kind-dependencies``.
+    """
+    for name, kind in kinds.items():
+        stream_from = kind.config.get("stream-from")
+        if stream_from and stream_from not in kind.config.get("kind-dependencies", []):
+            raise Exception(
+                f"Kind '{name}' streams from '{stream_from}' which is not in "
+                "its kind-dependencies"
+            )
+
+
 @verifications.add("full_task_graph")
 def verify_task_graph_symbol(task, taskgraph, scratch_pad, graph_config, parameters):
     """
@@ -66,6 +66,14 @@ def patch_taskcluster_root_url(session_mocker):
     )
 
 
+@pytest.fixture(scope="session", autouse=True)
+def kind_timings_file(session_mocker, tmp_path_factory):
+    # Avoid persisting kind timings to the user's cache directory.
+    path = tmp_path_factory.mktemp("kind-timings") / "kind-timings.json"
+    session_mocker.patch.dict(os.environ, {"TASKGRAPH_KIND_TIMINGS_FILE": str(path)})
+    return path
+
+
 @pytest.fixture(scope="session")
 def datadir():
     return here / "data"
@@ -0,0 +1,84 @@
+"""
+Tests for the helpers shared by actions.
+"""
+
+import io
+
+from pytest_taskgraph import make_graph, make_task
+
+from taskgraph.actions import util
+from taskgraph.graph import CompactGraph
+from taskgraph.util.indexed_graph import IndexedTaskGraph, write_indexed_graph
+
+
+def test_fetch_full_task_graph_indexed(mocker):
+    graph = make_graph(
+        make_task("a"),
+        make_task("b"),
+        make_task("c"),
+        make_task("d"),
+        ("b", "a", "a"),
+        ("c", "b", "b"),
+    )
+    fh = io.BytesIO()
+    index = write_indexed_graph(graph, fh)
+    data = fh.getvalue()
+    mocker.patch.object(
+        IndexedTaskGraph,
+        "from_artifact",
+        return_value=IndexedTaskGraph(index, lambda start, end: data[start:end]),
+    )
+    get_artifact = mocker.patch.object(util, "get_artifact")
+
+    loaded = util.fetch_full_task_graph("decision", labels=["b"])
+    assert set(loaded.tasks) == {"a", "b"}
+    loaded = util.fetch_full_task_graph("decision", labels=["b"], downstream=True)
+    assert set(loaded.tasks) == {"a", "b", "c"}
+    get_artifact.assert_not_called()
+
+
+def test_fetch_full_task_graph_fallback(mocker):
+    graph = make_graph(make_task("a"), make_task("b"))
+    mocker.patch.object(
+        IndexedTaskGraph,
+        "from_artifact",
+        side_effect=util.HTTPError("404 Not Found"),
+    )
+    get_artifact = mocker.patch.object(
+        util, "get_artifact", return_value=graph.to_json()
+    )
+    loaded = util.fetch_full_task_graph("decision", labels=["a"])
+    assert set(loaded.tasks) == {"a", "b"}
+    get_artifact.assert_called_once_with("decision", "public/full-task-graph.json")
+
+
+def test_create_tasks_compact(mocker, monkeypatch):
+    "the compact graph of an action never builds its sets of nodes and edges"
+    graph = make_graph(
+        make_task("a"),
+        make_task("b"),
+        make_task("c"),
+        ("b", "a", "a"),
+        ("c", "b", "b"),
+    )
+    mocker.patch.object(util, "get_artifact", return_value=graph.to_json())
+    mocker.patch.object(util, "write_artifact")
+    create_tasks = mocker.patch.object(util.create, "create_tasks")
+
+    getattr_ = CompactGraph.__getattr__
+
+    def no_sets(self, name):
+        assert name not in ("nodes", "edges"), f"built CompactGraph.{name}"
+        return getattr_(self, name)
+
+    monkeypatch.setattr(CompactGraph, "__getattr__", no_sets)
+
+    full_task_graph = util.fetch_full_task_graph("decision")
+    assert isinstance(full_task_graph.graph, CompactGraph)
+    hash(full_task_graph.graph)
+    label_to_taskid = util.create_tasks(
+        {}, ["b"], full_task_graph, {}, {"level": "1"}, decision_task_id="decision"
+    )
+    assert set(label_to_taskid) == {"a", "b"}
+    optimized = create_tasks.call_args[0][1]
+    assert set(optimized.tasks) == set(label_to_taskid.values())
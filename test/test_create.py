@@ -3,7 +3,9 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import json
+import os
 import re
+import tempfile
 import unittest
 from unittest import mock
 
@@ -16,14 +18,30 @@ from taskgraph.graph import Graph
 from taskgraph.task import Task
 from taskgraph.taskgraph import TaskGraph
 from taskgraph.util import taskcluster as tc_util
+from taskgraph.util.journal import TaskJournal
 
 GRAPH_CONFIG = GraphConfig({"trust-domain": "domain"}, "/var/empty")
 
 
 def mock_taskcluster_api(
-    created_tasks=None, error_status=None, error_message=None, error_task_ids=None
+    created_tasks=None,
+    error_status=None,
+    error_message=None,
+    error_task_ids=None,
+    existing_tasks=None,
 ):
-    """Mock the Taskcluster Queue API for create task calls."""
+    """Mock the Taskcluster Queue API for create task calls.
+
+    Tasks in `existing_tasks` (a dict mapping task ids to definitions) are
+    returned when fetched.
+    """
+    existing_tasks = existing_tasks or {}
+
+    def task_callback(request):
+        task_id = request.url.split("/")[-1]
+        if task_id in existing_tasks:
+            return (200, {}, json.dumps(existing_tasks[task_id]))
+        return (404, {}, '{"message": "not found"}')
 
     def request_callback(request):
         task_id = request.url.split("/")[-1]
@@ -51,6 +69,12 @@ def mock_taskcluster_api(
         callback=request_callback,
         content_type="application/json",
     )
+    responses.add_callback(
+        responses.GET,
+        re.compile(r"https://tc\.example\.com/api/queue/v1/task/.*"),
+        callback=task_callback,
+        content_type="application/json",
+    )
 
 
 class TestCreate(unittest.TestCase):
@@ -202,3 +226,184 @@ class TestCreate(unittest.TestCase):
         exception_message = str(cm.exception)
         self.assertIn("Could not create 'a'", exception_message)
         self.assertIn("Could not create 'b'", exception_message)
+
+    @responses.activate
+    @mock.patch.dict(
+        "os.environ",
+        {"TASKCLUSTER_ROOT_URL": "https://tc.example.com"},
+        clear=True,
+    )
+    def test_create_tasks_skips_dependents_of_failed_tasks(self):
+        "tasks depending on a task that couldn't be created aren't created"
+        created_tasks = {}
+        mock_taskcluster_api(
+            created_tasks=created_tasks,
+            error_status=403,
+            error_task_ids={"tid-a"},
+        )
+
+        tasks = {
+            tid: Task(
+                kind="test",
+                label=tid[4:],
+                attributes={},
+                task={"payload": "hello world", "dependencies": deps},
+            )
+            for tid, deps in (
+                ("tid-a", []),
+                ("tid-b", ["tid-a"]),
+                ("tid-c", ["tid-b"]),
+                ("tid-d", []),
+            )
+        }
+        label_to_taskid = {t.label: tid for tid, t in tasks.items()}
+        graph = Graph(
+            nodes=set(tasks),
+            edges={("tid-b", "tid-a", "edge"), ("tid-c", "tid-b", "edge")},
+        )
+        taskgraph = TaskGraph(tasks, graph)
+
+        with self.assertRaises(CreateTasksException) as cm:
+            create.create_tasks(
+                GRAPH_CONFIG,
+                taskgraph,
+                label_to_taskid,
+                {"level": "4"},
+                decision_task_id="decisiontask",
+            )
+
+        self.assertEqual(set(created_tasks), {"tid-d"})
+        self.assertIn("Could not create 'a'", str(cm.exception))
+        self.assertNotIn("Could not create 'b'", str(cm.exception))
+
+    def test_create_tasks_order(self):
+        "tasks are only created once all their dependencies are created"
+        created = []
+
+        def create_task(session, task_id, label, task_def):
+            for dep in task_def["dependencies"]:
+                assert dep == "decisiontask" or dep in created
+            created.append(task_id)
+
+        # A diamond of width 10: a -> b0..b9 -> c
+        deps = {"tid-a": []}
+        deps.update({f"tid-b{i}": ["tid-a"] for i in range(10)})
+        deps["tid-c"] = [f"tid-b{i}" for i in range(10)]
+        tasks = {
+            tid: Task(
+                kind="test",
+                label=tid[4:],
+                attributes={"task_duplicates": 2} if tid == "tid-c" else {},
+                task={"dependencies": list(task_deps)},
+            )
+            for tid, task_deps in deps.items()
+        }
+        label_to_taskid = {t.label: tid for tid, t in tasks.items()}
+        graph = Graph(
+            nodes=set(tasks),
+            edges={
+                (tid, dep, dep) for tid, task_deps in deps.items() for dep in task_deps
+            },
+        )
+
+        with (
+            mock.patch.object(create, "create_task", create_task),
+            mock.patch.object(create, "get_session"),
+        ):
+            create.create_tasks(
+                GRAPH_CONFIG,
+                TaskGraph(tasks, graph),
+                label_to_taskid,
+                {"level": "4"},
+                decision_task_id="decisiontask",
+            )
+
+        self.assertEqual(created[0], "tid-a")
+        self.assertEqual(len(created), 13)
+        self.assertEqual(created.count("tid-c"), 1)
+        assert set(created[1:11]) == {f"tid-b{i}" for i in range(10)}
+
+    @responses.activate
+    @mock.patch.dict(
+        "os.environ",
+        {"TASKCLUSTER_ROOT_URL": "https://tc.example.com"},
+        clear=True,
+    )
+    def test_create_tasks_journal(self):
+        "tasks in the journal aren't created again, and created tasks are recorded"
+        created_tasks = {}
+        mock_taskcluster_api(created_tasks=created_tasks)
+
+        tasks = {
+            "tid-a": Task(kind="test", label="a", attributes={}, task={}),
+            "tid-b": Task(
+                kind="test", label="b", attributes={}, task={"dependencies": ["tid-a"]}
+            ),
+        }
+        label_to_taskid = {"a": "tid-a", "b": "tid-b"}
+        graph = Graph(nodes={"tid-a", "tid-b"}, edges={("tid-b", "tid-a", "edge")})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "journal.jsonl")
+            journal = TaskJournal(path, "decisiontask")
+            journal.record("tid-a", "a")
+            create.create_tasks(
+                GRAPH_CONFIG,
+                TaskGraph(tasks, graph),
+                label_to_taskid,
+                {"level": "4"},
+                decision_task_id="decisiontask",
+                journal=journal,
+            )
+            journal.close()
+
+            self.assertEqual(set(created_tasks), {"tid-b"})
+            self.assertEqual(
+                TaskJournal(path, "decisiontask").tasks, {"a": "tid-a", "b": "tid-b"}
+            )
+
+    @responses.activate
+    @mock.patch.dict(
+        "os.environ",
+        {"TASKCLUSTER_ROOT_URL": "https://tc.example.com"},
+        clear=True,
+    )
+    def test_create_tasks_already_exists(self):
+        "a task that already exists with the same definition was created"
+        mock_taskcluster_api(
+            error_status=409,
+            error_message="conflict",
+            existing_tasks={
+                "tid-a": {
+                    "payload": "hello world",
+                    "dependencies": ["decisiontask"],
+                    "taskGroupId": "decisiontask",
+                    "schedulerId": "domain-level-4",
+                    "priority": "lowest",
+                },
+                "tid-b": {"payload": "something else"},
+            },
+        )
+
+        tasks = {
+            tid: Task(
+                kind="test",
+                label=tid[4:],
+                attributes={},
+                task={"payload": "hello world"},
+            )
+            for tid in ("tid-a", "tid-b")
+        }
+        label_to_taskid = {"a": "tid-a", "b": "tid-b"}
+        graph = Graph(nodes={"tid-a", "tid-b"}, edges=set())
+
+        with self.assertRaises(CreateTasksException) as cm:
+            create.create_tasks(
+                GRAPH_CONFIG,
+                TaskGraph(tasks, graph),
+                label_to_taskid,
+                {"level": "4"},
+                decision_task_id="decisiontask",
+            )
+        self.assertNotIn("Could not create 'a'", str(cm.exception))
+        self.assertIn("Could not create 'b'", str(cm.exception))
@@ -3,6 +3,7 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import gzip
 import json
 import os
 import shutil
@@ -13,6 +14,11 @@ from pathlib import Path
 import pytest
 
 from taskgraph import decision
+from taskgraph.graph import Graph
+from taskgraph.task import Task
+from taskgraph.taskgraph import TaskGraph
+from taskgraph.util import json as taskgraph_json
+from taskgraph.util.indexed_graph import IndexedTaskGraph
 from taskgraph.util.vcs import GitRepository, HgRepository
 from taskgraph.util.yaml import load_yaml
 
@@ -45,6 +51,70 @@ class TestDecision(unittest.TestCase):
                 shutil.rmtree(tmpdir)
             decision.ARTIFACTS_DIR = Path("artifacts")
 
+    def test_write_artifact_taskgraph(self):
+        graph = TaskGraph(
+            tasks={"a": Task(kind="test", label="a", attributes={}, task={"b": "é"})},
+            graph=Graph(nodes={"a"}, edges=set()),
+        )
+        tmpdir = tempfile.mkdtemp()
+        try:
+            decision.ARTIFACTS_DIR = Path(tmpdir) / "artifacts"
+            decision.write_artifact("graph.json", graph)
+            decision.write_artifact("graph.json.gz", graph)
+            with open(decision.ARTIFACTS_DIR / "graph.json", encoding="utf-8") as f:
+                data = f.read()
+            with gzip.open(
+                decision.ARTIFACTS_DIR / "graph.json.gz", "rt", encoding="utf-8"
+            ) as f:
+                self.assertEqual(f.read(), data)
+            self.assertEqual(
+                data,
+                taskgraph_json.dumps(graph.to_json(), sort_keys=True, indent=2),
+            )
+            self.assertEqual(decision.read_artifact("graph.json.gz"), graph.to_json())
+
+            decision.write_artifact("graph.msgpack.zst", graph)
+            self.assertEqual(
+                decision.read_artifact("graph.msgpack.zst"), graph.to_json()
+            )
+
+            decision.write_artifact("graph.jsonl", graph)
+            indexed = IndexedTaskGraph.from_path(decision.ARTIFACTS_DIR / "graph.jsonl")
+            self.assertEqual(indexed.load(), graph)
+        finally:
+            if os.path.exists(tmpdir):
+                shutil.rmtree(tmpdir)
+            decision.ARTIFACTS_DIR = Path("artifacts")
+
+
+def test_full_task_graph_to_runnable_tasks():
+    treeherder = {
+        "symbol": "B",
+        "groupSymbol": "G",
+        "collection": {"opt": True},
+        "machine": {"platform": "linux"},
+    }
+    graph = TaskGraph(
+        tasks={
+            "a": Task(
+                kind="test",
+                label="a",
+                attributes={},
+                task={"extra": {"treeherder": treeherder}},
+            ),
+            "b": Task(kind="test", label="b", attributes={}, task={"extra": {}}),
+        },
+        graph=Graph(nodes={"a", "b"}, edges=set()),
+    )
+    assert decision.full_task_graph_to_runnable_tasks(graph) == {
+        "a": {
+            "symbol": "B",
+            "groupSymbol": "G",
+            "collection": {"opt": True},
+            "platform": "linux",
+        }
+    }
+
 
 @unittest.mock.patch.object(
     GitRepository,
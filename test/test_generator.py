@@ -5,7 +5,7 @@
 
 import os
 import platform
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import pytest
 from pytest_taskgraph import WithFakeKind, fake_load_graph_config
@@ -13,6 +13,8 @@ from pytest_taskgraph import WithFakeKind, fake_load_graph_config
 from taskgraph import generator, graph
 from taskgraph.generator import Kind, load_tasks_for_kind, load_tasks_for_kinds
 from taskgraph.loader.default import loader as default_loader
+from taskgraph.util.intern import INTERN_ENV, CowDict
+from taskgraph.util.kind_timings import KindTimings
 from taskgraph.util.schema import SchemaValidationError
 
 linuxonly = pytest.mark.skipif(
@@ -27,20 +29,28 @@ threadsonly = pytest.mark.skipif(
 )
 
 
-class FakePPE(ProcessPoolExecutor):
+class RecordingExecutor:
+    """Records the kinds submitted to it in `loaded_kinds`, which each new
+    executor resets. It is set on the class, so it can be read when the
+    executor is created by the generator."""
+
     loaded_kinds = []
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        type(self).loaded_kinds = []
+
     def submit(self, kind_load_tasks, *args):
         self.loaded_kinds.append(kind_load_tasks.__self__.name)
         return super().submit(kind_load_tasks, *args)
 
 
-class FakeTPE(ProcessPoolExecutor):
-    loaded_kinds = []
+class FakePPE(RecordingExecutor, ProcessPoolExecutor):
+    pass
 
-    def submit(self, kind_load_tasks, *args):
-        self.loaded_kinds.append(kind_load_tasks.__self__.name)
-        return super().submit(kind_load_tasks, *args)
+
+class FakeTPE(RecordingExecutor, ThreadPoolExecutor):
+    pass
 
 
 @linuxonly
@@ -139,6 +149,39 @@ def test_full_task_graph(maketgg):
     )
 
 
+def test_metrics(maketgg):
+    "Each phase of generation is measured"
+    tgg = maketgg()
+    tgg.full_task_graph
+    phases = tgg.metrics.to_json()["phases"]
+    assert list(phases) == [
+        "graph_config",
+        "parameters",
+        "kind_graph",
+        "full_task_set",
+        "full_task_graph",
+    ]
+    for metrics in phases.values():
+        assert metrics["wall_time"] >= 0
+        assert metrics["cpu_time"] >= 0
+    assert phases["kind_graph"]["nodes"] == 1
+    assert phases["full_task_graph"]["nodes"] == 3
+    assert phases["full_task_graph"]["edges"] == 2
+    assert phases["full_task_graph"]["critical_path"] == 3
+    assert "nodes" not in phases["parameters"]
+
+
+def test_intern_tasks(maketgg, monkeypatch):
+    "Tasks are interned when enabled"
+    monkeypatch.setenv(INTERN_ENV, "1")
+    tgg = maketgg()
+    for task in tgg.full_task_set:
+        assert isinstance(task.task, CowDict)
+        assert isinstance(task.attributes, CowDict)
+    # Later phases can still modify tasks.
+    assert set(tgg.morphed_task_graph.tasks) == set(tgg.target_task_set.tasks)
+
+
 def test_target_task_set(maketgg):
     "The target_task_set property has the targeted tasks"
     tgg = maketgg(["_fake-t-1"])
@@ -249,6 +292,18 @@ def test_optimized_task_graph(maketgg):
     )
 
 
+def test_optimized_task_graph_created_tasks(maketgg):
+    "Tasks created by an earlier run are replaced even if not optimized"
+    created = {f"_fake-t-{i}": f"tid-{i}" for i in range(3)}
+    params = {"optimize_target_tasks": False, "existing_tasks": created}
+    tgg = maketgg(["_fake-t-2"], params=params)
+    assert tgg.label_to_taskid["_fake-t-2"] != "tid-2"
+
+    tgg = maketgg(["_fake-t-2"], params=params, created_tasks=created)
+    assert tgg.label_to_taskid == created
+    assert not tgg.optimized_task_graph.tasks
+
+
 def test_verifications(mocker, maketgg):
     m = mocker.patch.object(generator, "verifications")
     tgg = maketgg(["_fake-t-2"], enable_verifications=True)
@@ -457,3 +512,81 @@ def test_kind_graph_with_target_kinds(maketgg):
     # _fake3 and _other should not be included
     assert "_fake3" not in kind_graph.nodes
     assert "_other" not in kind_graph.nodes
+
+
+def test_kind_ordering_critical_path(maketgg):
+    "Ready kinds on the slowest remaining chain of kinds are loaded first"
+    tgg = maketgg(
+        kinds=[
+            ("_leaf", {}),
+            ("_head", {}),
+            ("_tail", {"kind-dependencies": ["_head"]}),
+        ]
+    )
+    kind_graph = tgg.kind_graph
+    kinds = {kind.name: kind for kind in tgg._load_kinds(tgg.graph_config)}
+
+    timings = KindTimings.load(tgg.root_dir)
+    timings.timings = {"_leaf": 1.0, "_head": 10.0, "_tail": 10.0}
+    timings.save()
+
+    executor = FakeTPE(max_workers=1)
+    tgg._load_tasks_parallel(kinds, kind_graph, tgg.parameters, executor, 1)
+    assert executor.loaded_kinds == ["_head", "_tail", "_leaf"]
+
+    # Timings were updated with the durations of this run.
+    timings = KindTimings.load(tgg.root_dir).timings
+    assert all(timings[kind] < 10.0 for kind in ("_head", "_tail"))
+
+
+def per_dep_loader(kind, path, config, parameters, loaded_tasks, write_artifacts):
+    for dep in loaded_tasks:
+        yield {
+            "label": f"{kind}-{dep.label}",
+            "description": "",
+            "attributes": {},
+            "task": {},
+            "dependencies": {"dep": dep.label},
+        }
+
+
+class PerDepKind(Kind):
+    def _get_loader(self):
+        return per_dep_loader
+
+
+@pytest.mark.parametrize(
+    "executor_cls", [pytest.param(FakePPE, marks=linuxonly), FakeTPE]
+)
+def test_kind_stream_from(monkeypatch, maketgg, executor_cls):
+    "Kinds with stream-from are loaded one chunk of their upstream kind at a time"
+    monkeypatch.setattr(generator, "STREAM_CHUNK_SIZE", 1)
+    down_config = {
+        "transforms": [],
+        "kind-dependencies": ["_up"],
+        "stream-from": "_up",
+    }
+    tgg = maketgg(kinds=[("_up", {}), ("_down", down_config)])
+    kinds = {kind.name: kind for kind in tgg._load_kinds(tgg.graph_config)}
+    kinds["_down"] = PerDepKind("_down", "/fake", down_config, tgg.graph_config)
+
+    executor = executor_cls(max_workers=2)
+    tasks = tgg._load_tasks_parallel(kinds, tgg.kind_graph, tgg.parameters, executor, 2)
+    assert executor.loaded_kinds == ["_up", "_down", "_down", "_down"]
+    assert sorted(label for label in tasks if label.startswith("_down")) == [
+        "_down-_up-t-0",
+        "_down-_up-t-1",
+        "_down-_up-t-2",
+    ]
+
+
+@linuxonly
+def test_kind_shard_safe(maketgg):
+    "Shard-safe kinds are split between workers, keeping the label order"
+    tgg = maketgg(kinds=[("_fake", {"shard-safe": True})])
+    kinds = {kind.name: kind for kind in tgg._load_kinds(tgg.graph_config)}
+
+    executor = FakePPE(max_workers=2)
+    tasks = tgg._load_tasks_parallel(kinds, tgg.kind_graph, tgg.parameters, executor, 2)
+    assert executor.loaded_kinds == ["_fake", "_fake"]
+    assert list(tasks) == ["_fake-t-0", "_fake-t-1", "_fake-t-2"]
@@ -3,11 +3,14 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import gc
+import pickle
 import unittest
+import weakref
 
 import pytest
 
-from taskgraph.graph import Graph
+from taskgraph.graph import CompactGraph, Graph, GraphBuilder
 
 
 class TestGraph(unittest.TestCase):
@@ -200,6 +203,71 @@ class TestGraph(unittest.TestCase):
             list(self.loopy.visit_preorder())
         assert "Dependency loop detected" in str(excinfo.value)
 
+    def test_levels_empty(self):
+        "levels of an empty graph are empty"
+        self.assertEqual(Graph(set(), set()).levels(), ())
+        self.assertEqual(Graph(set(), set()).critical_path_length(), 0)
+
+    def test_levels_tree(self):
+        "levels of a tree group nodes by their depth"
+        self.assertEqual(
+            self.tree.levels(),
+            ({"d", "e", "f", "g"}, {"b", "c"}, {"a"}),
+        )
+        self.assertEqual(
+            self.tree.levels(reverse=True),
+            ({"a"}, {"b", "c"}, {"d", "e", "f", "g"}),
+        )
+
+    def test_levels_diamonds(self):
+        "levels of a graph full of diamonds satisfy invariant"
+        levels = self.diamonds.levels()
+        self.assertEqual(set().union(*levels), self.diamonds.nodes)
+        depth = {node: i for i, level in enumerate(levels) for node in level}
+        for left, right, _ in self.diamonds.edges:
+            self.assertGreater(depth[left], depth[right])
+        self.assertEqual(self.diamonds.critical_path_length(), 4)
+
+    def test_levels_multi_edges(self):
+        "levels of a graph with multiple edges between nodes are correct"
+        self.assertEqual(self.multi_edges.levels(), ({"1"}, {"2"}, {"3"}, {"4"}))
+        self.assertEqual(self.linear.critical_path_length(), 4)
+
+    def test_levels_loopy(self):
+        with pytest.raises(Exception) as excinfo:
+            self.loopy.levels()
+        assert "Dependency loop detected" in str(excinfo.value)
+
+    def test_levels_cached_per_graph(self):
+        "levels are cached on the graph without keeping it alive"
+        graph = type(self.tree)(self.tree.nodes, self.tree.edges)
+        levels = graph.levels()
+        self.assertIs(graph.levels(), levels)
+        ref = weakref.ref(graph)
+        del graph
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_builder(self):
+        "a built graph has the nodes and edges added to the builder"
+        builder = GraphBuilder()
+        for left, right, name in self.tree.edges:
+            builder.add_node(left)
+            builder.add_node(right)
+            builder.add_edge(left, right, name)
+        self.assertEqual(builder.freeze(), self.tree)
+        self.assertIsInstance(builder.freeze(compact=True), CompactGraph)
+
+    def test_builder_extend(self):
+        "a graph built from another graph has the nodes and edges of both"
+        builder = GraphBuilder(self.linear)
+        builder.add_node("5")
+        builder.add_edge("4", "5", "L")
+        graph = builder.freeze()
+        self.assertEqual(graph.nodes, {"1", "2", "3", "4", "5"})
+        self.assertEqual(graph.edges, self.linear.edges | {("4", "5", "L")})
+        self.assertNotIn("5", self.linear.nodes)
+
     def test_links_dict(self):
         "link dict for a graph with multiple edges is correct"
         self.assertEqual(
@@ -232,3 +300,55 @@ class TestGraph(unittest.TestCase):
                 "3": {"4"},
             },
         )
+
+
+class TestCompactGraph(TestGraph):
+    "Run the `Graph` tests against `CompactGraph`"
+
+    tree = CompactGraph(TestGraph.tree.nodes, TestGraph.tree.edges)
+    linear = CompactGraph(TestGraph.linear.nodes, TestGraph.linear.edges)
+    diamonds = CompactGraph(TestGraph.diamonds.nodes, TestGraph.diamonds.edges)
+    multi_edges = CompactGraph(TestGraph.multi_edges.nodes, TestGraph.multi_edges.edges)
+    disjoint = CompactGraph(TestGraph.disjoint.nodes, TestGraph.disjoint.edges)
+    loopy = CompactGraph(TestGraph.loopy.nodes, TestGraph.loopy.edges)
+
+    def test_views_built_lazily(self):
+        g = CompactGraph(TestGraph.tree.nodes, TestGraph.tree.edges)
+        assert "edges" not in g.__dict__
+        assert set(g.transitive_closure({"c"}).visit_postorder()) == {"c", "f", "g"}
+        assert set(g.iter_nodes()) == TestGraph.tree.nodes
+        assert set(g.iter_edges()) == TestGraph.tree.edges
+        assert hash(g) == hash(TestGraph.tree)
+        assert "nodes" not in g.__dict__
+        assert "edges" not in g.__dict__
+
+        assert g.edges == TestGraph.tree.edges
+        assert g == TestGraph.tree
+        assert TestGraph.tree == g
+        assert hash(g) == hash(TestGraph.tree)
+
+    def test_links_and_reverse_links_dict(self):
+        assert (
+            self.multi_edges.links_and_reverse_links_dict()
+            == TestGraph.multi_edges.links_and_reverse_links_dict()
+        )
+
+    def test_transitive_closure_reverse(self):
+        for graph in (self.disjoint, TestGraph.disjoint):
+            assert graph.transitive_closure({"1", "γ"}, reverse=True) == Graph(
+                {"1", "2", "3", "4", "α", "β", "γ"}, TestGraph.disjoint.edges
+            )
+            assert graph.transitive_closure({"2"}, reverse=True) == Graph(
+                {"2", "3", "4"}, {("3", "2", "green"), ("4", "3", "green")}
+            )
+
+    def test_pickle(self):
+        g = CompactGraph(TestGraph.tree.nodes, TestGraph.tree.edges)
+        g.edges  # noqa: B018
+        data = pickle.dumps(g)
+        assert b"edges" not in data
+
+        loaded = pickle.loads(data)
+        assert isinstance(loaded, CompactGraph)
+        assert loaded == g
+        assert list(loaded.transitive_closure({"b"}).visit_preorder())[0] == "b"
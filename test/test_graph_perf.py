@@ -5,13 +5,20 @@
 """Benchmarks for taskgraph core operations on graphs with ~1000 tasks."""
 
 import copy
+import sys
+import tracemalloc
 
 import pytest
 
-from taskgraph.graph import Graph
+from taskgraph import create
+from taskgraph.graph import CompactGraph, Graph
+from taskgraph.morph import amend_taskgraph
 from taskgraph.task import Task
 from taskgraph.taskgraph import TaskGraph
 from taskgraph.transforms.base import TransformSequence
+from taskgraph.util import json, packed
+from taskgraph.util.copy import deepcopy as taskgraph_deepcopy
+from taskgraph.util.intern import intern_tasks
 
 # ---------------------------------------------------------------------------
 # Graph builders – each returns (tasks_dict, Graph, TaskGraph) for 1000 nodes
@@ -115,6 +122,185 @@ def test_transitive_closure(geometry):
     assert len(result.nodes) > 0
 
 
+LARGE_LAYERS = 1000
+LARGE_LAYER_SIZE = 100
+
+
+def _large_edges(nodes):
+    """Every node of a layer depends on two nodes of the previous layer."""
+    for layer in range(1, len(nodes) // LARGE_LAYER_SIZE):
+        for i in range(LARGE_LAYER_SIZE):
+            node = nodes[layer * LARGE_LAYER_SIZE + i]
+            for j in (i, (i + 1) % LARGE_LAYER_SIZE):
+                dep = nodes[(layer - 1) * LARGE_LAYER_SIZE + j]
+                yield (node, dep, f"dep-{j}")
+
+
+@pytest.fixture(scope="module", params=[Graph, CompactGraph], ids=["graph", "compact"])
+def large_graph(request):
+    """1000 layers of 100 nodes (100 000 nodes and ~200 000 edges)."""
+    nodes = [f"task-{i}" for i in range(LARGE_LAYERS * LARGE_LAYER_SIZE)]
+    graph = request.param(nodes, set(_large_edges(nodes)))
+    # Build the cached adjacency up front, as the generator would have.
+    graph.links_and_reverse_links_dict()
+    return graph
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("reverse", [False, True], ids=["forward", "reverse"])
+def test_transitive_closure_large(large_graph, reverse):
+    # A node in the middle reaches about half of the graph in either direction
+    node = f"task-{LARGE_LAYERS // 2 * LARGE_LAYER_SIZE}"
+    result = large_graph.transitive_closure({node}, reverse=reverse)
+    assert len(result.nodes) > LARGE_LAYERS // 2
+
+
+@pytest.mark.benchmark
+def test_transitive_closure_large_all_targets(large_graph):
+    # Like the target graph of a push that targets every leaf task
+    last = (LARGE_LAYERS - 1) * LARGE_LAYER_SIZE
+    targets = {f"task-{last + i}" for i in range(LARGE_LAYER_SIZE)}
+    result = large_graph.transitive_closure(targets)
+    assert result == large_graph
+
+
+@pytest.mark.benchmark
+def test_levels_large(large_graph):
+    # Clear the cached levels to measure actual computation each time
+    large_graph.__dict__.pop("_levels_False", None)
+    levels = large_graph.levels()
+    assert len(levels) == LARGE_LAYERS
+    assert all(len(level) == LARGE_LAYER_SIZE for level in levels)
+
+
+@pytest.mark.benchmark
+def test_compact_graph_memory():
+    # Tracing allocations is slow, so only use the first tenth of the layers.
+    nodes = [f"task-{i}" for i in range(LARGE_LAYERS * LARGE_LAYER_SIZE // 10)]
+
+    def retained(cls):
+        tracemalloc.start()
+        try:
+            graph = cls(nodes, set(_large_edges(nodes)))
+            return graph, tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+    graph, graph_size = retained(Graph)
+    compact, compact_size = retained(CompactGraph)
+    assert compact_size * 3 < graph_size
+    assert compact.nodes == graph.nodes
+
+
+def _make_full_task(i):
+    platform = f"platform-{i % 10}"
+    # Transforms produce a separate copy of every value of each task, which
+    # parsing JSON mimics.
+    task = json.loads(
+        json.dumps(
+            {
+                "metadata": {"name": f"test-{platform}-{i}", "owner": "a@example.com"},
+                "payload": {
+                    "command": ["/usr/local/bin/run-task", "--", "bash", "-cx", "make"],
+                    "env": {"MOZ_AUTOMATION": "1", "PLATFORM": platform},
+                    "cache": {"checkouts": "/builds/worker/checkouts"},
+                    "maxRunTime": 3600,
+                },
+                "scopes": ["docker-worker:cache:checkouts"],
+                "extra": {"treeherder": {"symbol": f"T({i % 100})", "tier": 1}},
+            }
+        )
+    )
+    return Task(
+        kind="test",
+        label=f"test-{platform}-{i}",
+        attributes=json.loads(
+            json.dumps({"build_platform": platform, "run_on_projects": ["all"]})
+        ),
+        task=task,
+    )
+
+
+@pytest.mark.benchmark
+def test_intern_tasks_memory():
+    # Tracing allocations is slow, so only use a tenth of 100k tasks.
+    tracemalloc.start()
+    try:
+        tasks = [_make_full_task(i) for i in range(10_000)]
+        before = tracemalloc.get_traced_memory()[0]
+        intern_tasks(tasks)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert after * 2 < before
+
+
+class _UnslottedTask:
+    """A task laid out as before tasks were slotted."""
+
+    def __init__(
+        self,
+        kind,
+        label,
+        attributes,
+        task,
+        dependencies=None,
+        soft_dependencies=None,
+        if_dependencies=None,
+    ):
+        self.kind = kind
+        self.label = label
+        self.attributes = attributes
+        self.task = task
+        self.description = ""
+        self.task_id = None
+        self.optimization = None
+        self.dependencies = dependencies
+        self.soft_dependencies = soft_dependencies
+        self.if_dependencies = if_dependencies
+
+
+def _tasks_size(cls, n):
+    args = [(f"task-{i}", {"kind": "test"}, {}, {}, [], []) for i in range(n)]
+    tracemalloc.start()
+    try:
+        tasks = [
+            cls(
+                "test",
+                label,
+                attributes,
+                task,
+                dependencies=deps,
+                soft_dependencies=soft,
+                if_dependencies=if_deps,
+            )
+            for label, attributes, task, deps, soft, if_deps in args
+        ]
+        return tracemalloc.get_traced_memory()[0], tasks[0]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.benchmark
+def test_task_memory():
+    n = 10_000
+    size, task = _tasks_size(Task, n)
+    unslotted_size, _ = _tasks_size(_UnslottedTask, n)
+    assert not hasattr(task, "__dict__")
+    # Only the tasks themselves are allocated, as their values already exist,
+    # so each task takes its own fixed size plus its pointer in the list.
+    assert size < n * (sys.getsizeof(task) + 16)
+    # Without slots each task's instance dict is the only difference.
+    assert size < unslotted_size
+
+
+@pytest.mark.benchmark
+def test_task_deepcopy():
+    tasks = [_make_full_task(i) for i in range(1_000)]
+    copies = [taskgraph_deepcopy(task) for task in tasks]
+    assert copies == tasks
+
+
 # ---------------------------------------------------------------------------
 # Benchmarks – Graph.visit_postorder / visit_preorder
 # ---------------------------------------------------------------------------
@@ -145,8 +331,8 @@ def test_visit_preorder(geometry):
 @pytest.mark.parametrize("geometry", ["linear", "fan", "btree", "diamond"])
 def test_links_dict(geometry):
     _, graph, _ = GEOMETRIES[geometry]
-    # Clear the functools.cache to measure actual computation each time
-    graph.links_and_reverse_links_dict.cache_clear()
+    # Clear the cached links to measure actual computation each time
+    graph.__dict__.pop("_links_and_reverse_links", None)
     fwd, rev = graph.links_and_reverse_links_dict()
     assert len(fwd) == N
     assert len(rev) == N
@@ -179,6 +365,78 @@ def test_taskgraph_to_json(geometry):
     assert len(data) == N
 
 
+@pytest.mark.benchmark
+@pytest.mark.parametrize("geometry", ["linear", "fan", "btree"])
+def test_taskgraph_from_json(geometry):
+    _, _, tg = GEOMETRIES[geometry]
+    data = tg.to_json()
+    tasks, _ = TaskGraph.from_json(data)
+    assert len(tasks) == N
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("geometry", ["linear", "fan", "btree"])
+def test_taskgraph_write_json(geometry, tmp_path):
+    _, _, tg = GEOMETRIES[geometry]
+    path = tmp_path / "task-graph.json"
+
+    def peak(write):
+        tracemalloc.start()
+        try:
+            with open(path, "w") as fh:
+                write(fh)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    streamed = peak(tg.write_json)
+    expected = path.read_text()
+    whole = peak(lambda fh: json.dump(tg.to_json(), fh, sort_keys=True, indent=2))
+    assert path.read_text() == expected
+    assert streamed * 10 < whole
+
+
+def _encode(tg, fmt):
+    if fmt == "json":
+        return json.dumps(tg.to_json(), sort_keys=True, indent=2).encode("utf-8")
+    return packed.dumps(tg)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("fmt", ["json", "packed"])
+def test_taskgraph_artifact_encode(fmt):
+    pytest.importorskip("zstandard")
+    _, _, tg = GEOMETRIES["btree"]
+    assert _encode(tg, fmt)
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("fmt", ["json", "packed"])
+def test_taskgraph_artifact_decode(fmt):
+    pytest.importorskip("zstandard")
+    _, _, tg = GEOMETRIES["btree"]
+    _, loaded = TaskGraph.from_json(_encode(tg, fmt))
+    assert len(loaded.tasks) == N
+
+
+def test_taskgraph_artifact_size():
+    pytest.importorskip("zstandard")
+    _, _, tg = GEOMETRIES["btree"]
+    json_size = len(json.dumps(tg.to_json(), sort_keys=True, indent=2))
+    assert len(packed.dumps(tg)) * 10 < json_size
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("geometry", ["linear", "fan", "btree", "diamond"])
+def test_amend_taskgraph(geometry):
+    _, _, tg = GEOMETRIES[geometry]
+    task = _make_task(N)
+    task.task_id = task.label
+    task.dependencies = {"dep": "task-0"}
+    new_tg, _ = amend_taskgraph(tg, {}, [task])
+    assert len(new_tg.tasks) == N + 1
+
+
 # ---------------------------------------------------------------------------
 # Benchmarks – TransformSequence with a simple transform
 # ---------------------------------------------------------------------------
@@ -216,3 +474,53 @@ def test_transform_sequence():
     assert len(result) == N
     assert "worker-type" in result[0]
     assert "env" in result[0]
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks – create_tasks against a mock queue
+# ---------------------------------------------------------------------------
+
+CREATE_TASKS = 50_000
+
+
+def _build_create_graph():
+    """Layers of LARGE_LAYER_SIZE tasks, each depending on two tasks of the
+    previous layer, with the dependencies in their definitions."""
+    nodes = [f"tid-{i}" for i in range(CREATE_TASKS)]
+    edges = set(_large_edges(nodes))
+    deps = {node: [] for node in nodes}
+    for left, right, _ in edges:
+        deps[left].append(right)
+    tasks = {
+        node: Task(
+            kind="test",
+            label=f"task-{i}",
+            attributes={},
+            task={"dependencies": deps[node]},
+        )
+        for i, node in enumerate(nodes)
+    }
+    return TaskGraph(tasks, Graph(frozenset(nodes), frozenset(edges)))
+
+
+@pytest.mark.benchmark
+def test_create_tasks(mocker):
+    taskgraph = _build_create_graph()
+    label_to_taskid = {t.label: tid for tid, t in taskgraph.tasks.items()}
+    created = set()
+
+    def create_task(session, task_id, label, task_def):
+        # A queue that rejects tasks whose dependencies don't exist yet.
+        assert all(d in created for d in task_def["dependencies"] if d != "decision")
+        created.add(task_id)
+
+    mocker.patch.object(create, "create_task", create_task)
+    mocker.patch.object(create, "get_session")
+    create.create_tasks(
+        {"trust-domain": "test"},
+        taskgraph,
+        label_to_taskid,
+        {"level": "1"},
+        decision_task_id="decision",
+    )
+    assert len(created) == CREATE_TASKS
@@ -3,6 +3,7 @@
 
 import json
 import os
+import subprocess
 import sys
 from pathlib import Path
 from textwrap import dedent
@@ -13,11 +14,16 @@ import taskgraph
 from taskgraph.actions import registry
 from taskgraph.generator import Kind
 from taskgraph.graph import Graph
-from taskgraph.main import format_kind_graph_mermaid, get_filtered_taskgraph
+from taskgraph.main import (
+    diff_taskgraph_files,
+    format_kind_graph_mermaid,
+    get_filtered_taskgraph,
+)
 from taskgraph.main import main as taskgraph_main
 from taskgraph.task import Task
 from taskgraph.taskgraph import TaskGraph
 from taskgraph.util.schema import SchemaValidationError
+from taskgraph.util.transform_profile import PROFILE_ENV
 from taskgraph.util.vcs import GitRepository, HgRepository
 from taskgraph.util.yaml import load_yaml
 
@@ -169,6 +175,36 @@ def test_output_file(run_taskgraph, tmpdir):
     )
 
 
+def test_profile_transforms(monkeypatch, run_taskgraph, capsys, tmp_path):
+    monkeypatch.setenv(PROFILE_ENV, "")
+    profile = tmp_path / "profile.json"
+    kinds = [("_fake", {"transforms": ["taskgraph.transforms.chunking"]})]
+
+    assert run_taskgraph(["full", f"--profile-transforms={profile}"], kinds=kinds) == 0
+    # Later runs in the same process aren't profiled.
+    assert os.environ[PROFILE_ENV] == ""
+    with open(profile) as fh:
+        data = json.load(fh)
+    transforms = [s["transform"] for s in data["kinds"]["_fake"]]
+    assert "taskgraph.transforms.chunking:chunk_tasks" in transforms
+
+    capsys.readouterr()
+    assert run_taskgraph(["profile", str(profile), "--kind", "_fake"]) == 0
+    out, _ = capsys.readouterr()
+    assert out.splitlines()[0].split()[-2:] == ["Kind", "Transform"]
+    assert "taskgraph.transforms.chunking:chunk_tasks" in out
+
+
+def test_trace(run_taskgraph, tmp_path):
+    path = tmp_path / "trace.json"
+    assert run_taskgraph(["full", f"--trace={path}"]) == 0
+
+    with open(path) as fh:
+        names = {e["name"] for e in json.load(fh)["traceEvents"]}
+    assert {"full_task_set", "full_task_graph", "load _fake"} <= names
+    assert "verify_task_graph_symbol" in names
+
+
 @pytest.mark.parametrize(
     "regex,exclude,expected",
     (
@@ -793,3 +829,121 @@ def test_show_kinds_with_target_kinds(run_taskgraph, capsys):
     # Should not include _fake3 or _other
     assert "_fake3" not in out
     assert "_other" not in out
+
+
+def import_module(module):
+    """Import `module` in a new interpreter.
+
+    Returns:
+        set: The modules imported by `module`.
+    """
+    code = dedent(
+        f"""
+        import sys
+        before = set(sys.modules)
+        import {module}
+        print(*(set(sys.modules) - before))
+        """
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    return set(proc.stdout.split())
+
+
+# The CLI is run often from tooling, so commands that don't need them shouldn't
+# pay for importing Taskcluster clients, schemas or transforms.
+@pytest.mark.parametrize(
+    "module,deferred",
+    (
+        pytest.param(
+            "taskgraph.main",
+            {
+                "concurrent.futures.process",
+                "importlib.metadata",
+                "msgspec",
+                "requests",
+                "taskcluster",
+                "taskgraph.generator",
+                "taskgraph.transforms.base",
+                "taskgraph.util.schema",
+                "voluptuous",
+                "yaml",
+            },
+            id="main",
+        ),
+        pytest.param(
+            "taskgraph.util.taskcluster",
+            {"requests", "taskcluster"},
+            id="util.taskcluster",
+        ),
+    ),
+)
+def test_deferred_imports(module, deferred):
+    assert not deferred & import_module(module)
+
+
+# The standard library modules `taskgraph.main` imports itself, as a baseline
+# for how fast the interpreter imports modules on this machine.
+IMPORT_TIME_BASELINE = (
+    "argparse",
+    "logging",
+    "pathlib",
+    "shutil",
+    "subprocess",
+    "textwrap",
+    "traceback",
+    "typing",
+    "urllib.parse",
+)
+
+# How many times the baseline importing `taskgraph.main` may take.
+IMPORT_TIME_RATIO = 4
+
+
+def import_time(modules, runs=3):
+    """Return how long importing `modules` takes in a new interpreter.
+
+    Returns:
+        int: The lowest total cumulative time (in microseconds) of `modules`
+        over `runs` runs, as reported by ``-X importtime``.
+    """
+    times = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        # Lines look like: "import time: <self us> | <cumulative us> | <module>",
+        # with the names of nested imports indented.
+        total = 0
+        for line in proc.stderr.splitlines()[1:]:
+            _, us, name = line.split("|")
+            if name[1] != " " and name.strip() in modules:
+                total += int(us)
+        times.append(total)
+    return min(times)
+
+
+@pytest.mark.benchmark
+def test_import_time():
+    baseline = import_time(IMPORT_TIME_BASELINE)
+    assert import_time(("taskgraph.main",)) < baseline * IMPORT_TIME_RATIO
+
+
+def test_diff_taskgraph_files(tmp_path):
+    paths = []
+    for rev, env in (("base", {"FOO": "1"}), ("cur", {"FOO": "2"})):
+        tasks = {
+            "a": Task(
+                kind="test", label="a", attributes={}, task={"env": env}
+            ).to_json()
+        }
+        path = tmp_path / rev
+        path.write_text(json.dumps(tasks))
+        paths.append(str(path))
+
+    diff = diff_taskgraph_files(*paths)
+    assert diff.changed == {"a": {"/task/env/FOO": ("1", "2")}}
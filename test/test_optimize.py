@@ -487,3 +487,38 @@ def test_register_strategy(mocker):
     func = register_strategy("foo", args=("one", "two"), kwargs={"n": 1})
     func(m)
     m.assert_called_with("one", "two", n=1)
+
+
+def test_lookup_indexes(monkeypatch):
+    "_lookup_indexes looks up indexes in chunks, and the statuses of each chunk"
+    monkeypatch.setattr(optimize_mod, "INDEX_CHUNK_SIZE", 2)
+    index_calls = []
+    status_calls = []
+
+    def find_task_id_batched(index_paths):
+        index_calls.append(index_paths)
+        return {i: f"tid-{i[-1]}" for i in index_paths if i != "index.c"}
+
+    def status_task_batched(task_ids):
+        status_calls.append(task_ids)
+        return {t: {"state": "completed"} for t in task_ids}
+
+    monkeypatch.setattr(optimize_mod, "find_task_id_batched", find_task_id_batched)
+    monkeypatch.setattr(optimize_mod, "status_task_batched", status_task_batched)
+
+    index_to_taskid, taskid_to_status = optimize_mod._lookup_indexes(
+        {"index.e", "index.a", "index.b", "index.c", "index.d"}
+    )
+    assert sorted(index_calls) == [
+        ["index.a", "index.b"],
+        ["index.c", "index.d"],
+        ["index.e"],
+    ]
+    assert sorted(status_calls) == [["tid-a", "tid-b"], ["tid-d"], ["tid-e"]]
+    assert index_to_taskid == {
+        "index.a": "tid-a",
+        "index.b": "tid-b",
+        "index.d": "tid-d",
+        "index.e": "tid-e",
+    }
+    assert set(taskid_to_status) == {"tid-a", "tid-b", "tid-d", "tid-e"}
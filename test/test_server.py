@@ -0,0 +1,164 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import socket
+import threading
+
+import pytest
+
+from taskgraph import main, server
+from taskgraph.main import main as taskgraph_main
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="requires Unix sockets"
+)
+
+
+@pytest.fixture
+def run_server(monkeypatch, tmp_path, maketgg):
+    root = tmp_path / "taskcluster"
+    root.mkdir()
+    (root / "config.yml").write_text("trust-domain: test\n")
+    path = str(tmp_path / "server.sock")
+    monkeypatch.setattr(server, "socket_path", lambda root: path)
+
+    generators = []
+
+    def get_taskgraph_generator(root, parameters):
+        generators.append(maketgg(target_tasks=["_fake-t-0"]))
+        return generators[-1]
+
+    monkeypatch.setattr(main, "get_taskgraph_generator", get_taskgraph_generator)
+
+    srv = server.TaskGraphServer(str(root), path)
+    thread = threading.Thread(target=srv.serve_forever, kwargs={"poll_interval": 0.01})
+    thread.start()
+    yield root, generators
+    srv.shutdown()
+    srv.server_close()
+    thread.join()
+
+
+def test_request_graph(run_server):
+    root, generators = run_server
+    options = {"graph_attr": "full_task_graph", "parameters": None}
+
+    response = server.request_graph(str(root), options)
+    assert response == {
+        "returncode": 0,
+        "output": "_fake-t-0\n_fake-t-1\n_fake-t-2",
+    }
+
+    # Nothing changed, so the same generator is re-used for other phases.
+    response = server.request_graph(
+        str(root), dict(options, graph_attr="target_task_set", format="json")
+    )
+    assert '"label": "_fake-t-0"' in response["output"]
+    assert len(generators) == 1
+
+    # Changing a file under the root regenerates the graph.
+    config = root / "config.yml"
+    config.write_text("trust-domain: changed\n")
+    os.utime(config, ns=(0, 0))
+    server.request_graph(str(root), options)
+    assert len(generators) == 2
+
+
+def test_request_graph_error(run_server):
+    root, generators = run_server
+    response = server.request_graph(str(root), {"graph_attr": "missing"})
+    assert response["returncode"] == 1
+    assert "AttributeError" in response["error"]
+
+    # The failed generator isn't re-used.
+    response = server.request_graph(str(root), {"graph_attr": "full_task_graph"})
+    assert response["returncode"] == 0
+    assert len(generators) == 2
+
+
+def test_request_graph_vcs_changed(monkeypatch, run_server):
+    root, generators = run_server
+    options = {"graph_attr": "full_task_graph", "parameters": None}
+    paths = []
+
+    def vcs_state(path):
+        paths.append(path)
+        return ("main", head_rev, {})
+
+    head_rev = "abc"
+    monkeypatch.setattr(server, "_vcs_changes", lambda path, old, new: set())
+    monkeypatch.setattr(server, "vcs_state", vcs_state)
+    server.request_graph(str(root), options)
+    server.request_graph(str(root), options)
+    assert len(generators) == 1
+    # The repository is found from the client's working directory.
+    assert paths == [os.getcwd()] * 2
+
+    # A new commit changes default parameters such as `head_rev`.
+    head_rev = "def"
+    server.request_graph(str(root), options)
+    assert len(generators) == 2
+
+
+def test_watch_backs_off(monkeypatch, tmp_path):
+    root = tmp_path / "taskcluster"
+    root.mkdir()
+    config = root / "config.yml"
+    config.write_text("trust-domain: test\n")
+    monkeypatch.setattr(server, "vcs_state", lambda path: pytest.fail("VCS checked"))
+
+    srv = server.TaskGraphServer(str(root), str(tmp_path / "server.sock"))
+    regenerated = []
+    monkeypatch.setattr(srv, "generate", regenerated.append)
+    with srv:
+        srv._last_request = {"graph_attr": "full_task_graph"}
+        for _ in range(10):
+            srv.handle_timeout()
+        assert srv.timeout == server.MAX_WATCH_INTERVAL
+        assert regenerated == []
+
+        # A change is picked up without checking the repository.
+        config.write_text("trust-domain: changed\n")
+        os.utime(config, ns=(0, 0))
+        srv.handle_timeout()
+        assert regenerated == [srv._last_request]
+
+
+def test_unregister(monkeypatch):
+    from taskgraph import morph  # noqa: PLC0415
+    from taskgraph.transforms import task  # noqa: PLC0415
+
+    def add_morph(*args):
+        pass
+
+    def build_payload(*args):
+        pass
+
+    add_morph.__module__ = build_payload.__module__ = "project.morphs"
+    monkeypatch.setattr(morph, "registered_morphs", list(morph.registered_morphs))
+    monkeypatch.setattr(task, "payload_builders", dict(task.payload_builders))
+    morph.register_morph(add_morph)
+    task.payload_builder("project-worker", schema={})(build_payload)
+
+    server._unregister({"project.morphs"})
+    assert add_morph not in morph.registered_morphs
+    assert "project-worker" not in task.payload_builders
+    assert "docker-worker" in task.payload_builders
+
+    # Registering them again doesn't fail as a duplicate.
+    task.payload_builder("project-worker", schema={})(build_payload)
+
+
+def test_request_graph_no_server(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, "socket_path", lambda root: str(tmp_path / "s.sock"))
+    assert server.request_graph(None, {}) is None
+
+
+def test_show_taskgraph_uses_server(run_server, capsys):
+    root, generators = run_server
+    assert taskgraph_main(["full", "--root", str(root)]) == 0
+    out, _ = capsys.readouterr()
+    assert out.strip() == "_fake-t-0\n_fake-t-1\n_fake-t-2"
+    assert len(generators) == 1
@@ -0,0 +1,150 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""
+Benchmarks of the parts of Taskgraph talking to Taskcluster, against the
+local stand-in served by the `fake_taskcluster` fixture.
+"""
+
+import pytest
+
+from taskgraph import create
+from taskgraph.actions.cancel_all import cancel_all_action
+from taskgraph.config import GraphConfig
+from taskgraph.graph import Graph
+from taskgraph.optimize import base as optimize_base
+from taskgraph.optimize.base import optimize_task_graph
+from taskgraph.task import Task
+from taskgraph.taskgraph import TaskGraph
+from taskgraph.util import taskcluster as tc
+from taskgraph.util.limiter import AdaptiveLimiter
+
+GRAPH_CONFIG = GraphConfig({"trust-domain": "test"}, "/var/empty")
+LAYERS = 10
+LAYER_SIZE = 100
+TASKS = LAYERS * LAYER_SIZE
+# Creating tasks is slower, as each task is a separate call.
+CREATE_LAYERS = 3
+DECISION_TASK_ID = "decision"
+
+
+def _layered_graph(layers=LAYERS, optimization=None):
+    """Layers of tasks, each depending on two tasks of the previous layer,
+    keyed by label."""
+    tasks = {}
+    edges = set()
+    for i in range(layers * LAYER_SIZE):
+        layer, pos = divmod(i, LAYER_SIZE)
+        label = f"task-{i}"
+        deps = {}
+        if layer:
+            for j in (pos, (pos + 1) % LAYER_SIZE):
+                dep = f"task-{(layer - 1) * LAYER_SIZE + j}"
+                deps[dep] = dep
+                edges.add((label, dep, dep))
+        tasks[label] = Task(
+            kind="test",
+            label=label,
+            attributes={},
+            task={
+                "metadata": {"name": label},
+                "deadline": {"relative-datestamp": "1 day"},
+            },
+            dependencies=deps,
+            optimization=optimization(i) if optimization else None,
+        )
+    return TaskGraph(tasks, Graph(frozenset(tasks), frozenset(edges)))
+
+
+def _by_task_id(taskgraph):
+    """Key the tasks of `taskgraph` by task id, with their dependencies in
+    their definition, as `create_tasks` expects."""
+    label_to_taskid = {label: f"tid-{label}" for label in taskgraph.tasks}
+    tasks = {}
+    for label, task in taskgraph.tasks.items():
+        task.task_id = label_to_taskid[label]
+        task.task["dependencies"] = [
+            label_to_taskid[dep] for dep in task.dependencies.values()
+        ]
+        tasks[task.task_id] = task
+    edges = {
+        (label_to_taskid[left], label_to_taskid[right], name)
+        for left, right, name in taskgraph.graph.edges
+    }
+    graph = Graph(frozenset(tasks), frozenset(edges))
+    return TaskGraph(tasks, graph), label_to_taskid
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("latency", [0, 0.005])
+@pytest.mark.parametrize("chunk_size", [100, 1000])
+def test_optimize_task_graph(fake_taskcluster, monkeypatch, latency, chunk_size):
+    fake_taskcluster.latency = latency
+    monkeypatch.setattr(optimize_base, "INDEX_CHUNK_SIZE", chunk_size)
+    # Tasks of the first layers were already built, half of them failed.
+    for i in range(3 * LAYER_SIZE):
+        fake_taskcluster.add_task(
+            f"cached-{i}", state="failed" if i % 2 else "completed"
+        )
+        fake_taskcluster.index_task(f"cache.task-{i}", f"cached-{i}")
+
+    taskgraph = _layered_graph(
+        optimization=lambda i: {"index-search": [f"cache.task-{i}"]}
+    )
+    optimized, label_to_taskid = optimize_task_graph(
+        taskgraph,
+        requested_tasks=set(taskgraph.tasks),
+        params={"optimize_target_tasks": True},
+        do_not_optimize=set(),
+        decision_task_id=DECISION_TASK_ID,
+    )
+    replaced = {t for t in label_to_taskid.values() if t.startswith("cached-")}
+    assert replaced == {f"cached-{i}" for i in range(0, LAYER_SIZE, 2)}
+    assert len(optimized.tasks) == TASKS - len(replaced)
+    assert fake_taskcluster.calls["findTasksAtIndex"] == TASKS // chunk_size
+
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize(
+    "latency,max_rate",
+    [(0, None), (0.005, None), (0.005, 100)],
+    ids=["fast", "slow", "throttled"],
+)
+def test_create_tasks(fake_taskcluster, monkeypatch, latency, max_rate):
+    fake_taskcluster.latency = latency
+    fake_taskcluster.max_rate = max_rate
+    fake_taskcluster.add_task(DECISION_TASK_ID)
+    limiter = AdaptiveLimiter(maximum=tc.CONCURRENCY, backoff=0.01, retries=20)
+    monkeypatch.setattr(create, "get_limiter", lambda: limiter)
+
+    taskgraph, label_to_taskid = _by_task_id(_layered_graph(CREATE_LAYERS))
+    create.create_tasks(
+        GRAPH_CONFIG,
+        taskgraph,
+        label_to_taskid,
+        {"level": "1"},
+        decision_task_id=DECISION_TASK_ID,
+    )
+    # The stand-in rejects tasks whose dependencies don't exist yet.
+    assert fake_taskcluster.responses[400] == 0
+    assert set(label_to_taskid.values()) <= fake_taskcluster.tasks.keys()
+    if max_rate:
+        assert limiter.counters["decreases"] > 0
+
+
+@pytest.mark.benchmark
+def test_cancel_all_action(fake_taskcluster, monkeypatch):
+    fake_taskcluster.latency = 0.002
+    fake_taskcluster.page_size = 100
+    for i in range(TASKS):
+        fake_taskcluster.add_task(
+            f"tid-{i}",
+            {"taskGroupId": DECISION_TASK_ID},
+            state="completed" if i % 4 else "pending",
+        )
+    monkeypatch.delenv("TASK_ID", raising=False)
+
+    cancel_all_action({}, GRAPH_CONFIG, {}, DECISION_TASK_ID, None)
+    assert fake_taskcluster.calls["cancelTask"] == TASKS // 4
+    assert not tc.list_task_group_incomplete_tasks(DECISION_TASK_ID)
@@ -0,0 +1,152 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import io
+
+import pytest
+from pytest_taskgraph import make_graph, make_task
+from taskcluster.exceptions import TaskclusterRestFailure
+
+from taskgraph.util import taskcluster as tc
+from taskgraph.util.indexed_graph import IndexedTaskGraph, write_indexed_graph
+
+
+def test_index(fake_taskcluster):
+    fake_taskcluster.page_size = 2
+    for i in range(5):
+        fake_taskcluster.index_task(f"project.foo.{i}", f"tid-{i}")
+    fake_taskcluster.index_task("project.foo.sub.latest", "tid-sub")
+
+    assert tc.find_task_id("project.foo.3") == "tid-3"
+    with pytest.raises(TaskclusterRestFailure):
+        tc.find_task_id("project.foo.missing")
+
+    indexes = [f"project.foo.{i}" for i in range(5)] + ["project.foo.missing"]
+    assert tc.find_task_id_batched(indexes) == {
+        f"project.foo.{i}": f"tid-{i}" for i in range(5)
+    }
+    assert fake_taskcluster.calls["findTasksAtIndex"] == 3
+
+    assert tc.list_tasks("project.foo") == [f"tid-{i}" for i in range(5)]
+
+
+def test_queue(fake_taskcluster):
+    fake_taskcluster.page_size = 1
+    fake_taskcluster.add_task(
+        "tid-a",
+        {"metadata": {"name": "a"}},
+        artifacts={"public/foo.json": {"foo": "bar"}, "public/bar.txt": b"0123456789"},
+    )
+    fake_taskcluster.add_task("tid-b", {"metadata": {"name": "b"}}, state="failed")
+
+    assert tc.status_task("tid-b")["state"] == "failed"
+    assert tc.status_task_batched(["tid-a", "tid-b", "tid-c"]) == {
+        "tid-a": fake_taskcluster.statuses["tid-a"],
+        "tid-b": fake_taskcluster.statuses["tid-b"],
+    }
+    assert tc.get_task_definitions(["tid-a", "tid-b"]) == {
+        "tid-a": {"metadata": {"name": "a"}},
+        "tid-b": {"metadata": {"name": "b"}},
+    }
+
+    # Only the first page of artifacts is listed.
+    fake_taskcluster.page_size = 1000
+    assert [a["name"] for a in tc.list_artifacts("tid-a")] == [
+        "public/bar.txt",
+        "public/foo.json",
+    ]
+    assert tc.get_artifact("tid-a", "public/foo.json") == {"foo": "bar"}
+    assert tc.get_artifact("tid-a", "public/foo.json", run_id=0) == {"foo": "bar"}
+    assert tc.get_artifact_range("tid-a", "public/bar.txt", 2, 5) == b"234"
+
+    fake_taskcluster.index_task("project.a", "tid-a")
+    assert tc.get_artifact_from_index("project.a", "public/foo.json") == {"foo": "bar"}
+
+
+@pytest.mark.parametrize("content_encoding", (None, "gzip"))
+def test_indexed_graph_artifact(fake_taskcluster, content_encoding):
+    graph = make_graph(
+        make_task("a"),
+        make_task("b"),
+        make_task("c"),
+        ("b", "a", "a"),
+    )
+    fh = io.BytesIO()
+    index = write_indexed_graph(graph, fh)
+    fake_taskcluster.add_task("tid-a", artifacts={"public/graph.index.json": index})
+    fake_taskcluster.add_artifact(
+        "tid-a", "public/graph.jsonl", fh.getvalue(), content_encoding=content_encoding
+    )
+
+    offset, length = index["tasks"]["b"]
+    assert (
+        tc.get_artifact_range("tid-a", "public/graph.jsonl", offset, offset + length)
+        == fh.getvalue()[offset : offset + length]
+    )
+
+    indexed = IndexedTaskGraph.from_artifact("tid-a", "public/graph.jsonl")
+    fake_taskcluster.responses.clear()
+    loaded = indexed.load(indexed.closure({"b"}) | {"c"})
+    assert set(loaded.tasks) == {"a", "b", "c"}
+    assert loaded["b"] == graph["b"]
+    if content_encoding:
+        # The compressed artifact is downloaded whole, once.
+        assert fake_taskcluster.responses == {303: 1, 206: 1, 200: 1}
+    else:
+        assert fake_taskcluster.responses == {303: 1, 206: 1}
+
+
+def test_create_and_cancel(fake_taskcluster):
+    queue = tc.get_taskcluster_client("queue")
+    queue.createTask("tid-a", {"taskGroupId": "group"})
+    # Creating the same task again is idempotent.
+    queue.createTask("tid-a", {"taskGroupId": "group"})
+    with pytest.raises(TaskclusterRestFailure) as e:
+        queue.createTask("tid-a", {"taskGroupId": "other"})
+    assert e.value.status_code == 409
+    with pytest.raises(TaskclusterRestFailure) as e:
+        queue.createTask("tid-b", {"dependencies": ["tid-missing"]})
+    assert e.value.status_code == 400
+
+    assert tc.list_task_group_incomplete_tasks("group") == ["tid-a"]
+    tc.cancel_task("tid-a")
+    assert tc.state_task("tid-a") == "exception"
+    assert tc.list_task_group_incomplete_tasks("group") == []
+
+
+def test_notify(fake_taskcluster):
+    tc.send_email("a@example.com", "subject", "content", "link")
+    assert fake_taskcluster.emails == [
+        {
+            "address": "a@example.com",
+            "subject": "subject",
+            "content": "content",
+            "link": "link",
+        }
+    ]
+
+
+def test_throttling(fake_taskcluster):
+    fake_taskcluster.max_concurrent = 0
+    with pytest.raises(TaskclusterRestFailure) as e:
+        tc.get_taskcluster_client("queue").status("tid-a")
+    assert e.value.status_code == 429
+    assert fake_taskcluster.responses[429] == 1
+
+
+def test_errors(fake_taskcluster):
+    fake_taskcluster.add_task("tid-a")
+    fake_taskcluster.error_rate = 0.5
+    # The client retries server errors.
+    for _ in range(3):
+        assert tc.status_task("tid-a")["state"] == "completed"
+    assert fake_taskcluster.responses[500] > 0
+
+
+def test_fixture_without_limiter(monkeypatch, request):
+    # The fixture supports versions of Taskgraph without `get_limiter`.
+    monkeypatch.delattr(tc, "get_limiter")
+    fake = request.getfixturevalue("fake_taskcluster")
+    fake.index_task("project.foo", "tid")
+    assert tc.find_task_id("project.foo") == "tid"
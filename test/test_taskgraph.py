@@ -3,11 +3,16 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 
+import copy
+import pickle
+import sys
 import unittest
+from io import StringIO
 
-from taskgraph.graph import Graph
+from taskgraph.graph import CompactGraph, Graph
 from taskgraph.task import Task
-from taskgraph.taskgraph import TaskGraph
+from taskgraph.taskgraph import TaskGraph, TaskGraphBuilder
+from taskgraph.util import json
 
 
 class TestTaskGraph(unittest.TestCase):
@@ -90,6 +95,29 @@ class TestTaskGraph(unittest.TestCase):
         tasks, new_graph = TaskGraph.from_json(graph.to_json())
         self.assertEqual(graph, new_graph)
 
+        tasks, new_graph = TaskGraph.from_json(graph.to_json(), compact=True)
+        self.assertIsInstance(new_graph.graph, CompactGraph)
+        self.assertEqual(graph, new_graph)
+
+    def test_write_json(self):
+        graph = TaskGraph(
+            tasks={
+                label: Task(
+                    kind="test",
+                    label=label,
+                    attributes={"x": [1, {"y": None}]},
+                    task={"task": label},
+                )
+                for label in "ba"
+            },
+            graph=Graph(nodes={"a", "b"}, edges=set()),
+        )
+        fh = StringIO()
+        graph.write_json(fh)
+        self.assertEqual(
+            fh.getvalue(), json.dumps(graph.to_json(), sort_keys=True, indent=2)
+        )
+
     def test_from_json_skips_external_dep_references(self):
         # Optimized/morphed graphs may carry Task.dependencies entries
         # pointing at taskIds of replaced or cached tasks that aren't part
@@ -151,3 +179,77 @@ class TestTaskGraph(unittest.TestCase):
     def test_contains(self):
         assert "a" in self.simple_graph
         assert "c" not in self.simple_graph
+
+    def test_builder(self):
+        builder = TaskGraphBuilder()
+        for label in ("a", "b"):
+            builder.add_task(self.simple_graph[label])
+        builder.add_edge("a", "b", "prereq")
+        self.assertEqual(builder.freeze(), self.simple_graph)
+
+    def test_builder_unchanged(self):
+        "freezing a builder that added nothing reuses the original graph"
+        taskgraph = TaskGraphBuilder(self.simple_graph).freeze()
+        assert taskgraph.tasks is self.simple_graph.tasks
+        assert taskgraph.graph.nodes is self.simple_graph.graph.nodes
+        assert taskgraph.graph.edges is self.simple_graph.graph.edges
+
+    def test_builder_amend(self):
+        "adding to a task graph doesn't modify it"
+        task = Task(kind="post", label="c", attributes={}, task={})
+        builder = TaskGraphBuilder(self.simple_graph)
+        builder.add_task(task)
+        builder.add_edge("c", "a", "prereq")
+        taskgraph = builder.freeze()
+
+        assert "c" not in self.simple_graph
+        self.assertEqual(
+            taskgraph.graph,
+            Graph({"a", "b", "c"}, {("a", "b", "prereq"), ("c", "a", "prereq")}),
+        )
+        assert taskgraph["c"] is task
+
+    def test_task_slots(self):
+        "tasks have no instance dict, and share their kind and attribute keys"
+        kind = "".join(["te", "st"])
+        key = "".join(["at", "tr"])
+        task = Task(kind=kind, label="a", attributes={key: 1}, task={})
+        assert not hasattr(task, "__dict__")
+        assert task.kind is sys.intern("test")
+        assert [k for k in task.attributes if k == "attr"][0] is sys.intern("attr")
+        self.assertEqual(task.attributes, {"attr": 1, "kind": "test"})
+
+    def test_task_copy_pickle(self):
+        task = Task(
+            kind="test",
+            label="a",
+            attributes={"attr": "a-task"},
+            task={"taskdef": True},
+            dependencies={"edgelabel": "b"},
+        )
+        task.task_id = "abc"
+        for other in (copy.deepcopy(task), pickle.loads(pickle.dumps(task))):
+            self.assertEqual(other, task)
+            assert other.task is not task.task
+            self.assertEqual(other.task_id, "abc")
+        self.assertEqual(Task.from_json(task.to_json()), task)
+        assert task != Task(kind="test", label="b", attributes={}, task={})
+
+    def test_task_unpickle_dict_state(self):
+        "tasks pickled before they were slotted can still be loaded"
+        task = Task.__new__(Task)
+        task.__setstate__(
+            {
+                "kind": "test",
+                "label": "a",
+                "attributes": {"kind": "test"},
+                "task": {},
+                "description": "",
+                "task_id": None,
+                "optimization": None,
+                "dependencies": {},
+                "soft_dependencies": [],
+                "if_dependencies": [],
+            }
+        )
+        self.assertEqual(task, Task(kind="test", label="a", attributes={}, task={}))
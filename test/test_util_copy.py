@@ -2,6 +2,7 @@ import pytest
 
 from taskgraph.task import Task
 from taskgraph.util.copy import deepcopy, immutable_types
+from taskgraph.util.intern import CowDict, CowList, SharedDict, SharedList
 from taskgraph.util.readonlydict import ReadOnlyDict
 
 
@@ -12,6 +13,10 @@ from taskgraph.util.readonlydict import ReadOnlyDict
         False,
         "foo",
         ReadOnlyDict(a=1, b="foo"),
+        SharedDict(a=1),
+        SharedList([1]),
+        CowDict(a=SharedDict(b=1), c=[1]),
+        CowList([SharedList([1])]),
         ["foo", "bar"],
         {
             "foo": Task(
@@ -28,6 +33,7 @@ def test_deepcopy(input):
     result = deepcopy(input)
     assert result == input
 
+    assert type(result) is type(input)
     if type(result) in immutable_types:
         assert id(result) == id(input)
     else:
@@ -0,0 +1,113 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from taskgraph.task import Task
+from taskgraph.taskgraph import TaskGraph
+from taskgraph.util.diff import MISSING, diff_taskgraphs
+
+
+def make_graph(tasks):
+    tasks_dict = {}
+    for label, task in tasks.items():
+        deps = task.pop("dependencies", {})
+        tasks_dict[label] = Task(
+            kind="test", label=label, attributes={}, dependencies=deps, **task
+        ).to_json()
+    return TaskGraph.from_json(tasks_dict)[1]
+
+
+@pytest.fixture
+def base():
+    return make_graph(
+        {
+            "a": {"task": {"payload": {"env": {"FOO": "1", "a/b": "x"}}}},
+            "b": {"task": {"payload": {"args": [1, 2]}}, "dependencies": {"dep": "a"}},
+            "c": {"task": {}},
+        }
+    )
+
+
+def test_diff_identical(base):
+    diff = diff_taskgraphs(base, base)
+    assert not diff
+    assert diff.unchanged == 3
+    assert diff.changed == {}
+
+
+def test_diff(base):
+    cur = make_graph(
+        {
+            "a": {"task": {"payload": {"env": {"FOO": "2", "a/b": "x"}}}},
+            "b": {"task": {"payload": {"args": [1]}}, "dependencies": {"dep": "d"}},
+            "d": {"task": {}},
+        }
+    )
+    diff = diff_taskgraphs(base, cur)
+    assert diff
+    assert diff.added == ["d"]
+    assert diff.removed == ["c"]
+    assert diff.added_edges == [("b", "d", "dep")]
+    assert diff.removed_edges == [("b", "a", "dep")]
+    assert diff.unchanged == 0
+    assert diff.changed == {
+        "a": {"/task/payload/env/FOO": ("1", "2")},
+        "b": {
+            "/dependencies/dep": ("a", "d"),
+            "/task/payload/args/1": (2, MISSING),
+        },
+    }
+
+    data = diff.to_json()
+    assert data["edges"] == {
+        "added": [["b", "d", "dep"]],
+        "removed": [["b", "a", "dep"]],
+    }
+    assert data["changed"]["a"] == {
+        "/task/payload/env/FOO": {"base": "1", "current": "2"}
+    }
+    assert data["changed"]["b"]["/task/payload/args/1"] == {"base": 2}
+
+    assert diff.summary().splitlines() == [
+        "1 added, 1 removed, 2 changed, 0 unchanged tasks; 1 added, 1 removed edges",
+        "+ d",
+        "- c",
+        "~ a",
+        "    /task/payload/env/FOO",
+        "~ b",
+        "    /dependencies/dep",
+        "    /task/payload/args/1",
+        "+ b -> d (dep)",
+        "- b -> a (dep)",
+    ]
+
+
+def test_diff_escapes_pointers(base):
+    cur = make_graph(
+        {
+            "a": {"task": {"payload": {"env": {"FOO": "1", "a/b": "y", "c~": 1}}}},
+            "b": {"task": {"payload": {"args": [1, 2]}}, "dependencies": {"dep": "a"}},
+            "c": {"task": {}},
+        }
+    )
+    diff = diff_taskgraphs(base, cur)
+    assert diff.unchanged == 2
+    assert list(diff.changed["a"]) == [
+        "/task/payload/env/a~1b",
+        "/task/payload/env/c~0",
+    ]
+
+
+def test_diff_missing_versus_null(base):
+    cur = make_graph(
+        {
+            "a": {"task": {"payload": {"env": {"FOO": "1", "a/b": "x"}}}},
+            "b": {"task": {"payload": {"args": [1, 2]}}, "dependencies": {"dep": "a"}},
+            "c": {"task": {"extra": None}},
+        }
+    )
+    diff = diff_taskgraphs(base, cur)
+    assert diff.changed == {"c": {"/task/extra": (MISSING, None)}}
+    assert diff.to_json()["changed"]["c"] == {"/task/extra": {"current": None}}
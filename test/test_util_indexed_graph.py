@@ -0,0 +1,117 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import io
+
+import pytest
+
+from taskgraph.graph import Graph
+from taskgraph.task import Task
+from taskgraph.taskgraph import TaskGraph
+from taskgraph.util import indexed_graph, json
+from taskgraph.util.indexed_graph import (
+    IndexedTaskGraph,
+    index_path,
+    write_indexed_graph,
+)
+
+
+@pytest.fixture
+def taskgraph():
+    # a <- b <- c, a <- d, and e on its own.
+    deps = {"a": {}, "b": {"a": "a"}, "c": {"b": "b"}, "d": {"a": "a"}, "e": {}}
+    tasks = {
+        label: Task(
+            kind="test",
+            label=label,
+            attributes={},
+            task={"name": label},
+            dependencies=dependencies,
+        )
+        for label, dependencies in deps.items()
+    }
+    edges = {
+        (label, dep, name)
+        for label, dependencies in deps.items()
+        for name, dep in dependencies.items()
+    }
+    return TaskGraph(tasks, Graph(set(tasks), edges))
+
+
+def make_indexed(taskgraph):
+    fh = io.BytesIO()
+    index = write_indexed_graph(taskgraph, fh)
+    data = fh.getvalue()
+    reads = []
+
+    def read_range(start, end):
+        reads.append((start, end))
+        return data[start:end]
+
+    return IndexedTaskGraph(index, read_range), reads
+
+
+def test_index_path():
+    assert index_path("public/full-task-graph.jsonl") == (
+        "public/full-task-graph.index.json"
+    )
+
+
+def test_load_all(taskgraph):
+    indexed, reads = make_indexed(taskgraph)
+    assert len(indexed) == 5
+    assert "a" in indexed and "x" not in indexed
+    assert indexed.load() == taskgraph
+    # Neighbouring tasks are read with a single request.
+    assert len(reads) == 1
+
+
+def test_closure(taskgraph):
+    indexed, _ = make_indexed(taskgraph)
+    assert indexed.closure({"c"}) == {"a", "b", "c"}
+    assert indexed.closure({"a"}, reverse=True) == {"a", "b", "c", "d"}
+    assert indexed.closure({"b", "x"}, reverse=True) == {"b", "c"}
+    assert indexed.closure([]) == set()
+
+
+def test_load_closure(taskgraph):
+    indexed, _ = make_indexed(taskgraph)
+    loaded = indexed.load(indexed.closure({"c"}))
+    assert set(loaded.tasks) == {"a", "b", "c"}
+    assert loaded.graph.edges == {("b", "a", "a"), ("c", "b", "b")}
+    assert loaded["c"].to_json() == taskgraph["c"].to_json()
+
+
+def test_load_coalesces_ranges(taskgraph, monkeypatch):
+    monkeypatch.setattr(indexed_graph, "COALESCE_GAP", 0)
+    indexed, reads = make_indexed(taskgraph)
+    offsets = indexed.index["tasks"]
+
+    # The first and last tasks aren't adjacent, so are read separately.
+    order = sorted(offsets, key=offsets.get)
+    first, last = order[0], order[-1]
+    assert set(indexed.load({first, last}).tasks) == {first, last}
+    assert reads == [(0, offsets[first][1]), (offsets[last][0], sum(offsets[last]))]
+
+    # Adjacent tasks are read together.
+    reads.clear()
+    indexed.load(order[:2])
+    assert reads == [(0, sum(offsets[order[1]]))]
+
+
+def test_from_path(taskgraph, tmp_path):
+    path = tmp_path / "graph.jsonl"
+    with open(path, "wb") as fh:
+        index = write_indexed_graph(taskgraph, fh)
+    with open(index_path(path), "w") as fh:
+        json.dump(index, fh)
+
+    indexed = IndexedTaskGraph.from_path(path)
+    assert indexed.load() == taskgraph
+    assert set(indexed.load(["d"]).tasks) == {"d"}
+
+
+def test_unsupported_version():
+    with pytest.raises(ValueError):
+        IndexedTaskGraph({"version": 0}, None)
@@ -0,0 +1,117 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import copy
+import pickle
+
+import pytest
+import yaml
+
+from taskgraph.task import Task
+from taskgraph.util import json
+from taskgraph.util.intern import (
+    CowDict,
+    CowList,
+    Interner,
+    SharedDict,
+    SharedList,
+    intern_tasks,
+)
+
+
+def make_task(label):
+    return Task(
+        kind="test",
+        label=label,
+        attributes={"platform": "linux"},
+        task={
+            "metadata": {"name": label},
+            "payload": {
+                "env": {"FOO": "1"},
+                "mounts": [{"cache": "checkouts"}],
+            },
+            "scopes": ["a", "b"],
+        },
+    )
+
+
+def test_interner():
+    interner = Interner()
+    a = interner.intern({"env": {"A": "1"}, "l": [1, 1.0, True, None]})
+    b = interner.intern({"env": {"A": "1"}, "l": [1, 1.0, True, None]})
+    assert a is b
+    assert type(a) is SharedDict
+    assert type(a["l"]) is SharedList
+    assert a == {"env": {"A": "1"}, "l": [1, 1.0, True, None]}
+    assert [type(v) for v in a["l"]] == [int, float, bool, type(None)]
+
+    # Equal values of different types aren't shared.
+    assert interner.intern([1]) is not interner.intern([True])
+    # Neither are dicts with a different key order.
+    assert interner.intern({"a": 1, "b": 2}) is not interner.intern({"b": 2, "a": 1})
+
+
+def test_intern_tasks():
+    tasks = [make_task("a"), make_task("b")]
+    expected = [t.to_json() for t in copy.deepcopy(tasks)]
+    intern_tasks(tasks)
+    assert [t.to_json() for t in tasks] == expected
+
+    a, b = tasks
+    assert a.task is not b.task
+    assert dict.__getitem__(a.task, "payload") is dict.__getitem__(b.task, "payload")
+    assert a.task["metadata"] is not b.task["metadata"]
+
+
+def test_copy_on_write():
+    tasks = [make_task("a"), make_task("b")]
+    intern_tasks(tasks)
+    a, b = tasks
+
+    a.task["payload"]["env"]["BAR"] = "2"
+    a.task["payload"]["mounts"][0]["cache"] = "other"
+    a.task.setdefault("extra", {})["parent"] = "abc"
+    a.task["scopes"].append("c")
+    a.attributes["kind"] = "other"
+    assert type(a.task["payload"]) is CowDict
+    assert type(a.task["scopes"]) is CowList
+
+    assert a.task["payload"] == {
+        "env": {"FOO": "1", "BAR": "2"},
+        "mounts": [{"cache": "other"}],
+    }
+    assert a.task["extra"] == {"parent": "abc"}
+    assert a.task["scopes"] == ["a", "b", "c"]
+    assert b.to_json() == make_task("b").to_json()
+
+
+def test_shared_is_read_only():
+    tasks = [make_task("a"), make_task("b")]
+    intern_tasks(tasks)
+    payload = dict.__getitem__(tasks[0].task, "payload")
+    with pytest.raises(TypeError):
+        payload["env"] = {}
+    with pytest.raises(TypeError):
+        payload.setdefault("x", 1)
+    with pytest.raises(TypeError):
+        payload["mounts"].append({})
+
+    # Copies are private.
+    private = copy.copy(payload)
+    private["env"] = {}
+    assert type(private) is CowDict
+    assert copy.deepcopy(payload) is payload
+
+
+def test_serialization():
+    task = make_task("a")
+    expected = task.to_json()
+    intern_tasks([task])
+
+    assert json.loads(json.dumps(task.to_json())) == expected
+    assert yaml.safe_load(yaml.safe_dump(task.to_json())) == expected
+
+    loaded = pickle.loads(pickle.dumps(task))
+    assert loaded.to_json() == expected
+    assert type(dict.__getitem__(loaded.task, "payload")) is SharedDict
@@ -0,0 +1,86 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import io
+
+from taskgraph.util import json
+from taskgraph.util import taskcluster as tc
+from taskgraph.util.journal import TaskJournal, load_journal
+
+
+def test_journal_roundtrip(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = TaskJournal(path, "decision")
+    assert len(journal) == 0
+    journal.record("tid-a", "a")
+    journal.record("tid-b", "b")
+    journal.close()
+
+    journal = TaskJournal(path, "decision")
+    assert journal.tasks == {"a": "tid-a", "b": "tid-b"}
+    assert "tid-a" in journal
+    assert "tid-c" not in journal
+
+    # Recording more tasks keeps the existing ones.
+    journal.record("tid-c", "c")
+    journal.close()
+    assert TaskJournal(path, "decision").tasks == {
+        "a": "tid-a",
+        "b": "tid-b",
+        "c": "tid-c",
+    }
+
+
+def test_journal_partial_line(tmp_path):
+    "a line left incomplete by a killed task is dropped"
+    path = tmp_path / "journal.jsonl"
+    path.write_text(
+        '{"taskId": "decision"}\n{"label": "a", "taskId": "tid-a"}\n{"label": "b", "ta'
+    )
+    journal = TaskJournal(path, "decision")
+    assert journal.tasks == {"a": "tid-a"}
+    journal.record("tid-c", "c")
+    journal.close()
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [
+        {"taskId": "decision"},
+        {"label": "a", "taskId": "tid-a"},
+        {"label": "c", "taskId": "tid-c"},
+    ]
+
+
+def test_journal_other_task(tmp_path):
+    "journals of other tasks are ignored and overwritten"
+    path = tmp_path / "journal.jsonl"
+    journal = TaskJournal(path, "other")
+    journal.record("tid-a", "a")
+    journal.close()
+
+    journal = TaskJournal(path, "decision")
+    assert journal.tasks == {}
+    journal.record("tid-b", "b")
+    journal.close()
+    assert TaskJournal(path, "decision").tasks == {"b": "tid-b"}
+    assert TaskJournal(path, "other").tasks == {}
+
+
+def test_load_journal_previous_run(tmp_path, monkeypatch):
+    calls = []
+
+    def get_artifact(task_id, path, run_id=None):
+        calls.append((task_id, path, run_id))
+        return io.BytesIO(
+            b'{"taskId": "decision"}\n{"label": "a", "taskId": "tid-a"}\n'
+        )
+
+    monkeypatch.setattr(tc, "get_artifact", get_artifact)
+
+    monkeypatch.setenv("RUN_ID", "0")
+    assert load_journal(tmp_path, "decision").tasks == {}
+    assert calls == []
+
+    monkeypatch.setenv("RUN_ID", "2")
+    journal = load_journal(tmp_path, "decision", suffix="-1")
+    assert journal.tasks == {"a": "tid-a"}
+    assert calls == [("decision", "public/task-creation-journal-1.jsonl", 1)]
+    assert (tmp_path / "task-creation-journal-1.jsonl").exists()
@@ -1,10 +1,11 @@
+from io import StringIO
 from itertools import count
 from textwrap import dedent
 from unittest.mock import Mock
 
 import pytest
 
-from taskgraph.util.json import dump, dumps, load, loads
+from taskgraph.util.json import dump, dump_items, dumps, load, loads
 
 
 @pytest.fixture(autouse=True, params=["json", "orjson"])
@@ -74,3 +75,18 @@ def test_dump(input_data, json_args, expected):
     dump(input_data, mock_file, **json_args)
 
     mock_file.write.assert_called_once_with(expected)
+
+
+@pytest.mark.parametrize(
+    "input_data",
+    [
+        {},
+        {"a": 1},
+        {"a": {"c": [1, {"e": None}], "b": {}}, "b": "x/y", "c": []},
+    ],
+    ids=count(),
+)
+def test_dump_items(input_data):
+    fh = StringIO()
+    dump_items(sorted(input_data.items()), fh)
+    assert fh.getvalue() == dumps(input_data, sort_keys=True, indent=2)
@@ -0,0 +1,221 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import textwrap
+
+import pytest
+
+from taskgraph.config import GraphConfig
+from taskgraph.generator import Kind
+from taskgraph.task import Task
+from taskgraph.util.kind_cache import (
+    CACHE_DIR_ENV,
+    CACHE_ENV,
+    KindCache,
+    RecordingParameters,
+    cacheable_loader,
+    cached_input,
+)
+from taskgraph.util.transform_profile import PROFILE_ENV
+
+loader_calls = []
+read_paths = []
+
+
+@cached_input
+def read_file(path):
+    with open(path) as fh:
+        return fh.read()
+
+
+def uncacheable_loader(kind, path, config, params, loaded_tasks, write_artifacts):
+    loader_calls.append(kind)
+    yield {"label": kind, "description": "", "attributes": {}, "task": {}}
+
+
+@cacheable_loader
+def counting_loader(kind, path, config, params, loaded_tasks, write_artifacts):
+    loader_calls.append(kind)
+    for read_path in read_paths:
+        read_file(read_path)
+    for dep in loaded_tasks or [None]:
+        yield {
+            "label": f"{kind}-{params['project']}-{dep.label if dep else 'none'}",
+            "description": "",
+            "attributes": {},
+            "task": {},
+        }
+
+
+class CountingKind(Kind):
+    def _get_loader(self):
+        return counting_loader
+
+
+@pytest.fixture
+def kind_cache(monkeypatch, tmp_path):
+    monkeypatch.setenv(CACHE_ENV, "1")
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    loader_calls.clear()
+    read_paths.clear()
+    return tmp_path
+
+
+@pytest.fixture
+def make_kind(graph_config):
+    def inner(name="fake", config=None):
+        config = config or {"transforms": []}
+        return CountingKind(name, "/fake", config, graph_config)
+
+    return inner
+
+
+def test_from_environment(monkeypatch, tmp_path):
+    monkeypatch.delenv(CACHE_ENV, raising=False)
+    assert KindCache.from_environment() is None
+
+    monkeypatch.setenv(CACHE_ENV, "1")
+    monkeypatch.setenv(CACHE_DIR_ENV, str(tmp_path))
+    cache = KindCache.from_environment()
+    assert cache is not None
+    assert cache.path == str(tmp_path)
+
+
+def test_cache_hit(kind_cache, make_kind, parameters):
+    kind = make_kind()
+    first = kind.load_tasks(parameters, {}, False)
+    second = kind.load_tasks(parameters, {}, False)
+    assert loader_calls == ["fake"]
+    assert [t.to_json() for t in first] == [t.to_json() for t in second]
+
+
+def test_cache_disabled_for_uncacheable_loader(
+    kind_cache, make_kind, parameters, monkeypatch
+):
+    kind = make_kind()
+    monkeypatch.setattr(kind, "_get_loader", lambda: uncacheable_loader)
+    kind.load_tasks(parameters, {}, False)
+    kind.load_tasks(parameters, {}, False)
+    assert loader_calls == ["fake", "fake"]
+    assert not any(kind_cache.iterdir())
+
+
+def test_cache_disabled_when_profiling(
+    kind_cache, make_kind, parameters, monkeypatch, tmp_path
+):
+    monkeypatch.setenv(PROFILE_ENV, str(tmp_path / "profile.json"))
+    kind = make_kind()
+    kind.load_tasks(parameters, {}, False)
+    kind.load_tasks(parameters, {}, False)
+    assert loader_calls == ["fake", "fake"]
+    # Both runs profiled the kind's transforms.
+    records = (tmp_path / "profile.json.records").read_text().splitlines()
+    assert len(records) == 2
+
+
+def test_cache_disabled_when_writing_artifacts(kind_cache, make_kind, parameters):
+    kind = make_kind()
+    kind.load_tasks(parameters, {}, True)
+    kind.load_tasks(parameters, {}, True)
+    assert loader_calls == ["fake", "fake"]
+    assert not any(kind_cache.iterdir())
+
+
+def test_cache_invalidated_by_read_parameter(kind_cache, make_kind, parameters):
+    kind = make_kind()
+    kind.load_tasks(parameters, {}, False)
+
+    # `owner` is never read by the kind, so the cache is still valid.
+    kind.load_tasks(dict(parameters, owner="someone-else"), {}, False)
+    assert loader_calls == ["fake"]
+
+    tasks = kind.load_tasks(dict(parameters, project="other"), {}, False)
+    assert loader_calls == ["fake", "fake"]
+    assert tasks[0].label == "fake-other-none"
+
+
+def test_cache_invalidated_by_config(kind_cache, make_kind, parameters):
+    make_kind().load_tasks(parameters, {}, False)
+    make_kind(config={"transforms": [], "foo": "bar"}).load_tasks(parameters, {}, False)
+    assert loader_calls == ["fake", "fake"]
+
+
+def test_cache_invalidated_by_upstream_tasks(kind_cache, make_kind, parameters):
+    kind = make_kind()
+    dep = Task(kind="up", label="up-1", attributes={}, task={})
+    kind.load_tasks(parameters, {dep.label: dep}, False)
+    kind.load_tasks(parameters, {dep.label: dep}, False)
+    assert loader_calls == ["fake"]
+
+    dep = Task(kind="up", label="up-1", attributes={}, task={"changed": True})
+    kind.load_tasks(parameters, {dep.label: dep}, False)
+    assert loader_calls == ["fake", "fake"]
+
+
+def test_cache_invalidated_by_cached_input(kind_cache, make_kind, parameters):
+    path = kind_cache / "input.txt"
+    path.write_text("one")
+    read_paths.append(str(path))
+
+    kind = make_kind()
+    kind.load_tasks(parameters, {}, False)
+    kind.load_tasks(parameters, {}, False)
+    assert loader_calls == ["fake"]
+
+    path.write_text("two")
+    kind.load_tasks(parameters, {}, False)
+    assert loader_calls == ["fake", "fake"]
+
+
+def test_cache_invalidated_by_imported_module(
+    kind_cache, graph_config, parameters, tmp_path, monkeypatch
+):
+    root = tmp_path / "project" / "taskcluster"
+    package = root / "cache_test_transforms"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text("")
+    (package / "helper.py").write_text("VALUE = 1\n")
+    (package / "kind.py").write_text(
+        textwrap.dedent(
+            """
+            from taskgraph.transforms.base import TransformSequence
+
+            from .helper import VALUE
+
+            transforms = TransformSequence()
+            """
+        )
+    )
+    monkeypatch.syspath_prepend(str(root))
+    config = GraphConfig(graph_config._config, root_dir=str(root))
+    kind = CountingKind(
+        "fake", "/fake", {"transforms": ["cache_test_transforms.kind"]}, config
+    )
+
+    kind.load_tasks(parameters, {}, False)
+    kind.load_tasks(parameters, {}, False)
+    assert loader_calls == ["fake"]
+
+    # Only imported by the transforms' module.
+    (package / "helper.py").write_text("VALUE = 123\n")
+    kind.load_tasks(parameters, {}, False)
+    assert loader_calls == ["fake", "fake"]
+
+
+def test_unstable_config_not_cached(kind_cache, make_kind, parameters):
+    kind = make_kind(config={"transforms": [], "foo": object()})
+    kind.load_tasks(parameters, {}, False)
+    kind.load_tasks(parameters, {}, False)
+    assert loader_calls == ["fake", "fake"]
+    assert not any(kind_cache.iterdir())
+
+
+def test_recording_parameters():
+    params = RecordingParameters(a=1, b=2)
+    params["a"]
+    params.get("c")
+    assert params.read_values().keys() == {"a", "c"}
+
+    dict(params)
+    assert params.read_values() == {"a": 1, "b": 2}
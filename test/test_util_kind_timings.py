@@ -0,0 +1,83 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import pytest
+
+from taskgraph.graph import Graph
+from taskgraph.util.kind_timings import KindTimings
+
+
+@pytest.fixture
+def kind_graph():
+    # build <- signing <- beetmover, with an unrelated `lint` kind
+    return Graph(
+        {"build", "signing", "beetmover", "lint"},
+        {
+            ("signing", "build", "kind-dependency"),
+            ("beetmover", "signing", "kind-dependency"),
+        },
+    )
+
+
+def test_priorities(tmp_path, kind_graph):
+    timings = KindTimings("/root", tmp_path / "timings.json")
+    timings.timings = {"build": 5.0, "signing": 2.0, "beetmover": 1.0, "lint": 6.0}
+    assert timings.priorities(kind_graph) == {
+        "build": 8.0,
+        "signing": 3.0,
+        "beetmover": 1.0,
+        "lint": 6.0,
+    }
+
+
+def test_priorities_unknown_kinds(tmp_path, kind_graph):
+    timings = KindTimings("/root", tmp_path / "timings.json")
+    assert timings.priorities(kind_graph) == {
+        "build": 3.0,
+        "signing": 2.0,
+        "beetmover": 1.0,
+        "lint": 1.0,
+    }
+
+    # Untimed kinds are assumed to take the average time of the known kinds.
+    timings.timings = {"lint": 4.0, "build": 2.0}
+    assert timings.priorities(kind_graph)["build"] == 8.0
+
+
+def test_record_save_load(tmp_path):
+    path = tmp_path / "timings.json"
+    timings = KindTimings.load("/root", path)
+    assert timings.timings == {}
+
+    timings.record("build", 4.0)
+    timings.record("build", 2.0)
+    timings.save()
+
+    other = KindTimings.load("/other", path)
+    other.record("build", 10.0)
+    other.save()
+
+    assert KindTimings.load("/root", path).timings == {"build": 3.0}
+    assert KindTimings.load("/other", path).timings == {"build": 10.0}
+
+
+def test_save_merges(tmp_path):
+    path = tmp_path / "timings.json"
+    first = KindTimings.load("/root", path)
+    second = KindTimings.load("/root", path)
+    first.record("build", 4.0)
+    first.save()
+    second.record("lint", 1.0)
+    second.save()
+
+    assert KindTimings.load("/root", path).timings == {"build": 4.0, "lint": 1.0}
+
+
+def test_save_in_task(monkeypatch, tmp_path):
+    monkeypatch.setenv("TASK_ID", "abc")
+    path = tmp_path / "timings.json"
+    timings = KindTimings.load("/root", path)
+    timings.record("build", 4.0)
+    timings.save()
+    assert not path.exists()
@@ -0,0 +1,144 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import threading
+import time
+
+import pytest
+
+from taskgraph.util.limiter import AdaptiveLimiter, is_throttled
+
+
+class Failure(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def fail(status_code):
+    raise Failure(status_code)
+
+
+@pytest.mark.parametrize(
+    "exc,expected",
+    (
+        (Failure(429), True),
+        (Failure(503), True),
+        (Failure(404), False),
+        (ValueError(), False),
+    ),
+)
+def test_is_throttled(exc, expected):
+    assert is_throttled(exc) == expected
+
+
+def test_starts_at_maximum():
+    limiter = AdaptiveLimiter(maximum=8)
+    assert limiter.limit == 8
+    for _ in range(20):
+        limiter.call("a", lambda: None)
+    assert limiter.limit == 8
+    assert limiter.decisions == []
+
+
+def test_additive_increase():
+    limiter = AdaptiveLimiter(maximum=8, initial=4)
+    for _ in range(4 + 5):
+        limiter.call("a", lambda: None)
+    # One slot is added per full window of calls.
+    assert limiter.limit == 6
+    assert limiter.counters["increases"] == 2
+    assert [d["limit"] for d in limiter.decisions] == [5, 6]
+
+    for _ in range(100):
+        limiter.call("a", lambda: None)
+    assert limiter.limit == 8
+
+
+def test_unhealthy_latency():
+    "the limit doesn't grow while latency is higher than usual"
+    limiter = AdaptiveLimiter(maximum=8, initial=4, latency_tolerance=1.5)
+    limiter._latency["a"] = limiter._baseline["a"] = 0.001
+    for _ in range(10):
+        limiter.call("a", time.sleep, 0.01)
+    assert limiter.limit == 4
+
+
+def test_multiplicative_decrease():
+    limiter = AdaptiveLimiter(maximum=8, initial=8, backoff=0)
+    with pytest.raises(Failure):
+        limiter.call("a", fail, 503)
+    assert limiter.limit == 4
+    with pytest.raises(Failure):
+        limiter.call("a", fail, 404)
+    assert limiter.limit == 4
+    assert limiter.counters == {
+        "calls": 2,
+        "throttled": 1,
+        "errors": 1,
+        "retries": 0,
+        "increases": 0,
+        "decreases": 1,
+        "max_in_flight": 1,
+    }
+    assert limiter.to_json()["decisions"][0]["reason"] == "throttled"
+
+
+def test_decrease_once_per_window():
+    "calls started before the last decrease don't decrease the limit again"
+    limiter = AdaptiveLimiter(maximum=8, initial=8, backoff=0)
+    slots = [limiter.slot("a") for _ in range(3)]
+    for slot in slots:
+        slot.__enter__()
+    for slot in slots:
+        slot.__exit__(Failure, Failure(429), None)
+    assert limiter.limit == 4
+    assert limiter.counters["throttled"] == 3
+
+
+def test_retry_throttled():
+    limiter = AdaptiveLimiter(maximum=8, backoff=0.01, retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) < 3:
+            fail(429)
+        return "ok"
+
+    assert limiter.call("a", flaky) == "ok"
+    assert limiter.counters["retries"] == 2
+    # Each retry waited for the pause, which doubled.
+    assert attempts[2] - attempts[1] >= 0.02
+
+    attempts.clear()
+    with pytest.raises(Failure):
+        limiter.call("a", fail, 500)
+    assert not attempts
+
+
+def test_concurrency_is_limited():
+    limiter = AdaptiveLimiter(maximum=3, initial=3)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def work():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.005)
+        with lock:
+            running.pop()
+
+    threads = [
+        threading.Thread(target=limiter.call, args=("a", work)) for _ in range(12)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) <= 3
+    assert limiter.counters["max_in_flight"] <= 3
+    assert limiter.counters["calls"] == 12
@@ -0,0 +1,65 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import io
+
+import pytest
+
+from taskgraph.graph import Graph
+from taskgraph.task import Task
+from taskgraph.taskgraph import TaskGraph
+from taskgraph.util import json, packed
+
+pytest.importorskip("zstandard")
+
+
+@pytest.fixture
+def taskgraph():
+    tasks = {
+        "a": Task(
+            kind="test",
+            label="a",
+            attributes={"x": [1, {"y": None}]},
+            task={"payload": {"env": {"FOO": "bar"}}},
+            optimization={"skip-unless-changed": ["src/**"]},
+        ),
+        "b": Task(
+            kind="test",
+            label="b",
+            attributes={},
+            task={},
+            dependencies={"a": "a"},
+            soft_dependencies=["c"],
+        ),
+    }
+    tasks["b"].task_id = "abc"
+    return TaskGraph(tasks, Graph({"a", "b"}, {("b", "a", "a")}))
+
+
+def test_taskgraph_round_trip(taskgraph):
+    data = packed.dumps(taskgraph)
+    assert packed.is_packed(data)
+    assert packed.loads(data) == taskgraph.to_json()
+    assert "task_id" not in packed.loads(data)["a"]
+
+    _, loaded = TaskGraph.from_json(data)
+    assert loaded == taskgraph
+    assert loaded["b"].task_id == "abc"
+
+
+@pytest.mark.parametrize(
+    "data", [{"a": "abc"}, [1, "2", None], "string"], ids=["dict", "list", "str"]
+)
+def test_data_round_trip(data):
+    fh = io.BytesIO()
+    packed.dump(data, fh)
+    fh.seek(0)
+    assert packed.load(fh) == data
+
+
+def test_from_json_bytes(taskgraph):
+    data = json.dumps(taskgraph.to_json()).encode("utf-8")
+    assert not packed.is_packed(data)
+    _, loaded = TaskGraph.from_json(data)
+    assert loaded == taskgraph
@@ -0,0 +1,69 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import pickle
+
+from taskgraph.task import Task
+from taskgraph.util.task_store import StoredTasks, TaskStore
+
+
+def make_tasks(kind, count):
+    return [
+        Task(
+            kind=kind,
+            label=f"{kind}-{i}",
+            attributes={},
+            task={"payload": "x" * 1000},
+        )
+        for i in range(count)
+    ]
+
+
+def test_write_read(tmp_path):
+    store = TaskStore(str(tmp_path))
+    tasks = make_tasks("build", 3)
+    store.write("build", tasks)
+    assert [t.to_json() for t in store.read("build")] == [t.to_json() for t in tasks]
+
+
+def test_chunks(tmp_path):
+    store = TaskStore(str(tmp_path))
+    tasks = make_tasks("build", 4)
+    store.write("build", tasks[2:], chunk=1)
+    store.write("build", tasks[:2], chunk=0)
+    store.write("test", [])
+
+    assert store.chunks() == {"build": {0, 1}, "test": {0}}
+    assert [t.label for t in store.read("build", 1)] == ["build-2", "build-3"]
+    assert [t.label for t in store.read("build")] == [t.label for t in tasks]
+
+    loaded = pickle.loads(pickle.dumps(store.view([("build", 1)], {})))
+    assert sorted(loaded) == ["build-2", "build-3"]
+
+
+def test_stored_tasks_pickle_by_reference(tmp_path):
+    store = TaskStore(str(tmp_path))
+    tasks = {}
+    for kind in ("build", "test"):
+        store.write(kind, make_tasks(kind, 100))
+        tasks.update({t.label: t for t in store.read(kind)})
+
+    view = store.view([("test", None), ("build", None)], tasks)
+    assert isinstance(view, StoredTasks)
+    assert view == tasks
+
+    data = pickle.dumps(view)
+    assert len(data) < 1000
+
+    loaded = pickle.loads(data)
+    assert type(loaded) is dict
+    assert sorted(loaded) == sorted(tasks)
+    assert loaded["build-1"].to_json() == tasks["build-1"].to_json()
+
+
+def test_cleanup():
+    with TaskStore() as store:
+        store.write("build", make_tasks("build", 1))
+    assert not os.path.exists(store.path)
@@ -7,9 +7,12 @@ import json
 from unittest.mock import MagicMock
 
 import pytest
+from responses import matchers
 
 from taskgraph.task import Task
+from taskgraph.util import packed
 from taskgraph.util import taskcluster as tc
+from taskgraph.util.limiter import AdaptiveLimiter
 
 
 @pytest.fixture
@@ -152,6 +155,92 @@ def test_get_artifact(responses, root_url):
     assert result == expected_result
 
 
+def test_get_artifact_packed(responses, root_url):
+    pytest.importorskip("zstandard")
+    tid = "abc123"
+    tc.get_taskcluster_client.cache_clear()
+    responses.get(
+        f"{root_url}/api/queue/v1/task/{tid}/artifacts/artifact.msgpack.zst",
+        body=b'{"type": "s3", "url": "http://foo.bar/artifact.msgpack.zst"}',
+        status=303,
+        headers={"Location": "http://foo.bar/artifact.msgpack.zst"},
+    )
+    responses.get(
+        "http://foo.bar/artifact.msgpack.zst", body=packed.dumps({"foo": "bar"})
+    )
+    assert tc.get_artifact(tid, "artifact.msgpack.zst") == {"foo": "bar"}
+
+
+def test_get_artifact_run_id(responses, root_url):
+    tid = "abc123"
+    tc.get_taskcluster_client.cache_clear()
+
+    responses.get("http://foo.bar/artifact.json", json={"foo": "bar"})
+    responses.get(
+        f"{root_url}/api/queue/v1/task/{tid}/runs/1/artifacts/artifact.json",
+        body=b'{"type": "s3", "url": "http://foo.bar/artifact.json"}',
+        status=303,
+        headers={"Location": "http://foo.bar/artifact.json"},
+    )
+    result = tc.get_artifact(tid, "artifact.json", run_id=1)
+    assert result == {"foo": "bar"}
+
+
+def test_get_artifact_range(responses, root_url):
+    tid = "abc123"
+    tc.get_taskcluster_client.cache_clear()
+    responses.get(
+        f"{root_url}/api/queue/v1/task/{tid}/artifacts/artifact.jsonl",
+        body=b'{"type": "s3", "url": "http://foo.bar/artifact.jsonl"}',
+        status=303,
+        headers={"Location": "http://foo.bar/artifact.jsonl"},
+    )
+    responses.get(
+        "http://foo.bar/artifact.jsonl",
+        body=b"bar",
+        status=206,
+        match=[matchers.header_matcher({"Range": "bytes=3-5"})],
+    )
+    assert tc.get_artifact_range(tid, "artifact.jsonl", 3, 6) == b"bar"
+
+    # Servers that don't support ranges send the whole artifact.
+    responses.get(
+        "http://foo.bar/artifact.jsonl",
+        body=b"foobarbaz",
+        match=[matchers.header_matcher({"Range": "bytes=6-8"})],
+    )
+    assert tc.get_artifact_range(tid, "artifact.jsonl", 6, 9) == b"baz"
+
+
+def test_get_artifact_range_mismatch(responses, root_url):
+    "ranges that don't match the requested one are downloaded whole"
+    tid = "abc123"
+    tc.get_taskcluster_client.cache_clear()
+    responses.get(
+        f"{root_url}/api/queue/v1/task/{tid}/artifacts/artifact.jsonl",
+        body=b'{"type": "s3", "url": "http://foo.bar/artifact.jsonl"}',
+        status=303,
+        headers={"Location": "http://foo.bar/artifact.jsonl"},
+    )
+    responses.get(
+        "http://foo.bar/artifact.jsonl",
+        body=b"foo",
+        status=206,
+        headers={"Content-Range": "bytes 0-2/9"},
+        match=[
+            matchers.header_matcher(
+                {"Range": "bytes=3-5", "Accept-Encoding": "identity"}
+            )
+        ],
+    )
+    responses.get("http://foo.bar/artifact.jsonl", body=b"foobarbaz")
+    assert tc.get_artifact_range(tid, "artifact.jsonl", 3, 6) == b"bar"
+    assert tc.get_artifact_range_or_whole(tid, "artifact.jsonl", 3, 6) == (
+        b"foobarbaz",
+        False,
+    )
+
+
 def test_list_artifact(responses, root_url):
     tid = "abc123"
     tc.get_taskcluster_client.cache_clear()
@@ -372,6 +461,20 @@ def test_cancel_task(responses, root_url):
     tc.cancel_task(tid)
 
 
+def test_cancel_task_throttled(responses, root_url, monkeypatch):
+    tid = "abc123"
+    tc.get_taskcluster_client.cache_clear()
+    limiter = AdaptiveLimiter(maximum=10, backoff=0)
+    monkeypatch.setattr(tc, "get_limiter", lambda: limiter)
+
+    url = f"{root_url}/api/queue/v1/task/{tid}/cancel"
+    responses.post(url, status=429, json={"message": "slow down"})
+    responses.post(url, json={"status": {"taskId": tid, "state": "cancelled"}})
+    tc.cancel_task(tid)
+    assert limiter.counters["retries"] == 1
+    assert limiter.limit == 5
+
+
 def test_status_task(responses, root_url):
     tid = "abc123"
     tc.get_taskcluster_client.cache_clear()
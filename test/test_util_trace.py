@@ -0,0 +1,67 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import multiprocessing
+import os
+import platform
+
+import pytest
+
+from taskgraph.util import json, trace
+
+
+def load_trace(path):
+    with open(path) as fh:
+        return json.load(fh)["traceEvents"]
+
+
+def test_span_disabled(monkeypatch):
+    monkeypatch.delenv(trace.TRACE_ENV, raising=False)
+    with trace.span("foo") as event:
+        assert event is None
+
+
+def test_tracing(tmp_path):
+    path = tmp_path / "trace.json"
+    with trace.tracing(str(path)):
+        with trace.span("outer", cat="test", foo="bar") as event:
+            with trace.span("inner"):
+                pass
+            event["args"]["count"] = 2
+    assert trace.TRACE_ENV not in os.environ
+    assert not os.path.exists(f"{path}.events")
+
+    events = {e["name"]: e for e in load_trace(path)}
+    assert set(events) == {"outer", "inner", "process_name"}
+
+    outer, inner = events["outer"], events["inner"]
+    assert outer["ph"] == "X"
+    assert outer["cat"] == "test"
+    assert outer["args"] == {"foo": "bar", "count": 2}
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert events["process_name"]["args"] == {"name": "taskgraph"}
+
+
+def record_in_worker():
+    with trace.span("worker"):
+        pass
+    trace.flush()
+
+
+@pytest.mark.skipif(platform.system() != "Linux", reason="requires fork")
+def test_tracing_worker_process(tmp_path):
+    path = tmp_path / "trace.json"
+    with trace.tracing(str(path)):
+        # The span recorded by the parent before forking isn't written twice.
+        with trace.span("parent"):
+            pass
+        proc = multiprocessing.get_context("fork").Process(target=record_in_worker)
+        proc.start()
+        proc.join()
+
+    events = load_trace(path)
+    assert sorted(e["name"] for e in events if e["ph"] == "X") == ["parent", "worker"]
+    names = {e["pid"]: e["args"]["name"] for e in events if e["ph"] == "M"}
+    assert names == {os.getpid(): "taskgraph", proc.pid: "worker"}
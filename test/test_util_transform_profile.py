@@ -0,0 +1,106 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import time
+
+from taskgraph.transforms.base import TransformSequence
+from taskgraph.util import json
+from taskgraph.util.transform_profile import (
+    TransformProfile,
+    finish_profile,
+    format_profile,
+    start_profile,
+)
+
+transforms = TransformSequence()
+
+
+@transforms.add
+def slow(config, tasks):
+    for task in tasks:
+        time.sleep(0.01)
+        yield task
+
+
+@transforms.add
+def drop_odd(config, tasks):
+    for task in tasks:
+        if task % 2 == 0:
+            yield task
+
+
+def test_wrap():
+    sequence = TransformSequence()
+    sequence.add(transforms)
+
+    profile = TransformProfile("fake")
+    assert list(profile.wrap(sequence)(None, range(5))) == [0, 2, 4]
+
+    stats = profile.to_json()
+    assert [s["transform"] for s in stats] == [
+        f"{__name__}:slow",
+        f"{__name__}:drop_odd",
+    ]
+    assert [(s["items_in"], s["items_out"]) for s in stats] == [(5, 5), (5, 3)]
+    # The time spent sleeping is only attributed to `slow`.
+    assert stats[0]["wall_time"] >= 0.05
+    assert stats[1]["wall_time"] < 0.05
+
+
+def test_finish_profile(tmp_path):
+    path = str(tmp_path / "profile.json")
+    start_profile(path)
+
+    for items_in in (1, 2):
+        profile = TransformProfile("fake")
+        list(profile.wrap(transforms)(None, range(items_in)))
+        profile.save(path)
+
+    result = finish_profile(path)
+    assert [(s["items_in"], s["items_out"]) for s in result["fake"]] == [
+        (3, 3),
+        (3, 2),
+    ]
+    with open(path) as fh:
+        assert json.load(fh) == {"kinds": result}
+
+
+def test_format_profile():
+    profile = {
+        "a": [
+            {
+                "transform": "mod:fast",
+                "wall_time": 0.1,
+                "cpu_time": 0.1,
+                "items_in": 1,
+                "items_out": 1,
+            }
+        ],
+        "b": [
+            {
+                "transform": "mod:slow",
+                "wall_time": 2.0,
+                "cpu_time": 1.5,
+                "items_in": 10,
+                "items_out": 20,
+            }
+        ],
+    }
+    lines = format_profile(profile).splitlines()
+    assert lines[0].split() == [
+        "Wall",
+        "(s)",
+        "CPU",
+        "(s)",
+        "In",
+        "Out",
+        "Kind",
+        "Transform",
+    ]
+    assert lines[1].split() == ["2.000", "1.500", "10", "20", "b", "mod:slow"]
+    assert lines[2].split() == ["0.100", "0.100", "1", "1", "a", "mod:fast"]
+
+    lines = format_profile(profile, sort_by="items_in", limit=1).splitlines()
+    assert len(lines) == 2
+    assert "mod:slow" in lines[1]
@@ -10,6 +10,7 @@ import pytest
 from pytest_taskgraph import make_graph, make_task
 
 from taskgraph import MAX_DEPENDENCIES
+from taskgraph.generator import Kind
 from taskgraph.task import Task
 from taskgraph.util.treeherder import split_symbol
 from taskgraph.util.verify import (
@@ -18,6 +19,7 @@ from taskgraph.util.verify import (
     ParametersVerification,
     VerificationSequence,
     verifications,
+    verify_stream_from,
 )
 
 
@@ -358,3 +360,15 @@ def test_verification(run_verification, name, graph, expectation):
     func = partial(run_verification, name, graph=graph)
     with expectation:
         func()
+
+
+def test_verify_stream_from(graph_config):
+    def make_kind(config):
+        return Kind("down", "/fake", config, graph_config)
+
+    verify_stream_from({"down": make_kind({"kind-dependencies": ["up"]})})
+    verify_stream_from(
+        {"down": make_kind({"kind-dependencies": ["up"], "stream-from": "up"})}
+    )
+    with pytest.raises(Exception, match="not in its kind-dependencies"):
+        verify_stream_from({"down": make_kind({"stream-from": "up"})})